@@ -1,5 +1,11 @@
-from fastapi import APIRouter, Depends, HTTPException, status, UploadFile, File
-from typing import List, Optional
+from fastapi import APIRouter, Body, Depends, Header, HTTPException, status, UploadFile, File
+from fastapi.responses import StreamingResponse
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+from dataclasses import dataclass
+from concurrent.futures import ThreadPoolExecutor
+import json
+import time
+import uuid
 from fastapi.security import OAuth2PasswordRequestForm
 from sqlalchemy.orm import Session
 from datetime import datetime, date, timedelta
@@ -7,8 +13,11 @@ import logging
 from app.db import models
 from app.schemas import user as user_schema, document as doc_schema, token as token_schema
 from app.security import hashing, auth
-from app.core.config import ACCESS_TOKEN_EXPIRE_MINUTES
-from app.services import document_processor
+from app.core.config import (ACCESS_TOKEN_EXPIRE_MINUTES, BATCH_QUERY_MAX_QUESTIONS, BULK_UPLOAD_DAILY_LIMIT,
+                             BULK_UPLOAD_MAX_FILES, LLM_MAX_CONCURRENCY)
+from app.services import (answer_cache, bulk_intake, context_packer, corpus_profile, document_processor, llm_client,
+                          ingestion, pattern_registry, question_router, retrieval, single_flight,
+                          upload_intake, upload_sessions)
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 DAILY_UPLOAD_LIMIT = 5
@@ -22,6 +31,7 @@ def _check_and_reset_daily_limits(user: models.User, db: Session):
     if user.last_activity_date and user.last_activity_date.date() < today:
         user.query_count = 0
         user.pdf_upload_count = 0
+        user.bulk_upload_count = 0
 
 @router.post("/register", response_model=user_schema.User)
 def register_new_user(user: user_schema.UserCreate, db: Session = Depends(auth.get_db)):
@@ -70,100 +80,262 @@ def read_users_me(current_user: models.User = Depends(auth.get_current_user), db
     db.commit()
     db.refresh(current_user)
     return current_user
-@router.post("/documents/upload", response_model=doc_schema.Document)
+def _check_upload_limit(user: models.User, db: Session):
+    _check_and_reset_daily_limits(user, db)
+    if user.pdf_upload_count >= DAILY_UPLOAD_LIMIT:
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail="Daily upload limit reached."
+        )
+
+
+def _queue_spooled_upload(upload: upload_intake.SpooledUpload, user: models.User, db: Session,
+                          upload_session: Optional[models.UploadSession] = None) -> models.IngestionJob:
+    try:
+        job = ingestion.enqueue_upload(db, user, upload)
+        if upload_session is not None:
+            upload_session.job_id = job.id
+        user.pdf_upload_count += 1
+        user.last_activity_date = datetime.utcnow()
+        db.add(user)
+        db.commit()
+    except Exception:
+        upload.discard()
+        raise
+    db.refresh(job)
+    ingestion.notify()
+
+    logger.info(f"Queued {upload.file_type} file {upload.filename} ({upload.size} bytes) "
+                f"as job {job.id} for user {user.username}")
+    return job
+
+
+@router.post("/documents/upload", response_model=doc_schema.IngestionJob, status_code=status.HTTP_202_ACCEPTED)
 def upload_document(
         file: UploadFile = File(...),
         db: Session = Depends(auth.get_db),
         current_user: models.User = Depends(auth.get_current_user)
 ):
+    """Queue an upload for ingestion; poll ``/documents/jobs/{job_id}`` for progress."""
+    try:
+        _check_upload_limit(current_user, db)
+        try:
+            upload = upload_intake.spool_upload(file.file, file.filename,
+                                                file.content_type or "application/octet-stream",
+                                                declared_size=file.size)
+        except upload_intake.UploadRejected as e:
+            raise HTTPException(status_code=e.status_code, detail=str(e))
+        return _queue_spooled_upload(upload, current_user, db)
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Unexpected error in upload_document: {str(e)}")
+        raise HTTPException(status_code=500, detail="An unexpected error occurred during file upload")
+
+
+@router.post("/documents/upload/bulk", response_model=doc_schema.BulkUploadResponse,
+             status_code=status.HTTP_202_ACCEPTED)
+def upload_documents_bulk(
+        files: List[UploadFile] = File(...),
+        db: Session = Depends(auth.get_db),
+        current_user: models.User = Depends(auth.get_current_user)
+):
+    """Queue many PDF/DOCX files, or ZIP archives of them, as one batch.
 
+    Files count against the bulk quota rather than the daily upload limit. Every file is
+    reported as queued, with its job id, or rejected, with the reason; follow the batch
+    with ``/documents/batches/{batch_id}``.
+    """
     try:
         _check_and_reset_daily_limits(current_user, db)
-        if current_user.pdf_upload_count >= DAILY_UPLOAD_LIMIT:
+        quota = current_user.bulk_upload_quota
+        if quota is None:
+            quota = BULK_UPLOAD_DAILY_LIMIT
+        allowance = max(0, quota - (current_user.bulk_upload_count or 0))
+        if allowance == 0:
             raise HTTPException(
                 status_code=status.HTTP_429_TOO_MANY_REQUESTS,
-                detail="Daily upload limit reached."
+                detail="Daily bulk upload quota reached."
             )
-        contents = file.file.read()
-        if not contents:
-            raise HTTPException(status_code=400, detail="File is empty")
-        validation_result = document_processor.validate_file_upload(contents, file.filename)
-        if not validation_result["is_valid"]:
-            raise HTTPException(status_code=400, detail=validation_result["error_message"])
-
-        logger.info(
-            f"Processing {validation_result['file_type']} file: {file.filename} ({validation_result['file_size']} bytes)")
-        upload_success = document_processor.upload_file_to_gcs(
-            file_contents=contents,
-            filename=file.filename,
-            content_type=file.content_type or "application/octet-stream"
-        )
 
-        if not upload_success:
-            logger.warning(f"GCS upload failed for {file.filename}, continuing with local processing")
+        entries = bulk_intake.spool_bulk_uploads(
+            [bulk_intake.BulkFile(filename=file.filename, content_type=file.content_type, stream=file.file,
+                                  size=file.size) for file in files],
+            allowance
+        )
+        accepted = [entry for entry in entries if entry.upload is not None]
+        batch_id = uuid.uuid4().hex if accepted else None
+        jobs = {}
         try:
-            if hasattr(document_processor, 'determine_file_type_and_extract_advanced'):
-                extracted_text, metadata, analysis = document_processor.determine_file_type_and_extract_advanced(
-                    contents, file.filename
-                )
-                logger.info(
-                    f"Advanced extraction successful: {metadata.word_count} words, {metadata.document_type.value}")
-                if hasattr(document_processor, 'upload_file_to_gcs_with_metadata'):
-                    document_processor.upload_file_to_gcs_with_metadata(
-                        contents, file.filename, file.content_type or "application/octet-stream", metadata
-                    )
-
-            else:
-                extracted_text = document_processor.determine_file_type_and_extract(contents, file.filename)
-                logger.info(f"Basic extraction successful: {len(extracted_text.split())} words")
-                metadata = None
-                analysis = None
-
-        except ValueError as e:
-            logger.error(f"Text extraction failed for {file.filename}: {str(e)}")
-            raise HTTPException(status_code=400, detail=str(e))
-        except Exception as e:
-            logger.error(f"Unexpected error during text extraction for {file.filename}: {str(e)}")
-            raise HTTPException(status_code=500,
-                                detail=f"An unexpected error occurred during text extraction: {str(e)}")
-
-        if hasattr(document_processor, 'preprocess_text'):
-            extracted_text = document_processor.preprocess_text(extracted_text)
-        new_document = models.Document(
-            filename=file.filename,
-            content=extracted_text,
-            owner=current_user
+            # All jobs of the batch are inserted in one transaction.
+            for entry in accepted:
+                jobs[entry.upload.path] = ingestion.enqueue_upload(db, current_user, entry.upload, batch_id=batch_id)
+            current_user.bulk_upload_count = (current_user.bulk_upload_count or 0) + len(accepted)
+            current_user.last_activity_date = datetime.utcnow()
+            db.add(current_user)
+            db.commit()
+        except Exception:
+            bulk_intake.discard_entries(entries)
+            raise
+        if accepted:
+            ingestion.notify()
+
+        results = [
+            doc_schema.BulkUploadItem(filename=entry.filename, status="queued", job_id=jobs[entry.upload.path].id)
+            if entry.upload is not None else
+            doc_schema.BulkUploadItem(filename=entry.filename, status="rejected", error=entry.error)
+            for entry in entries
+        ]
+        logger.info(f"Queued bulk upload {batch_id}: {len(accepted)} of {len(entries)} files "
+                    f"for user {current_user.username}")
+        return doc_schema.BulkUploadResponse(
+            batch_id=batch_id,
+            accepted=len(accepted),
+            rejected=len(entries) - len(accepted),
+            quota_remaining=allowance - len(accepted),
+            results=results
         )
 
-        if metadata and hasattr(new_document, 'metadata'):
-            new_document.metadata = {
-                'file_type': metadata.file_type,
-                'word_count': metadata.word_count,
-                'language_primary': metadata.language_primary,
-                'document_type': metadata.document_type.value,
-                'complexity_level': metadata.complexity_level.value,
-                'confidence_score': metadata.confidence_score,
-                'processing_timestamp': datetime.utcnow().isoformat()
-            }
-
-        db.add(new_document)
-
-        current_user.pdf_upload_count += 1
-        current_user.last_activity_date = datetime.utcnow()
-        db.add(current_user)
-        db.commit()
-        db.refresh(new_document)
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Unexpected error in upload_documents_bulk: {str(e)}")
+        raise HTTPException(status_code=500, detail="An unexpected error occurred during bulk upload")
 
-        logger.info(f"Document uploaded successfully: {file.filename} for user {current_user.username}")
-        return new_document
+
+@router.get("/documents/batches/{batch_id}", response_model=doc_schema.BulkUploadStatus)
+def get_bulk_upload(
+        batch_id: str,
+        db: Session = Depends(auth.get_db),
+        current_user: models.User = Depends(auth.get_current_user)
+):
+    jobs = db.query(models.IngestionJob) \
+        .filter(models.IngestionJob.batch_id == batch_id, models.IngestionJob.user_id == current_user.id) \
+        .order_by(models.IngestionJob.created_at) \
+        .all()
+    if not jobs:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Bulk upload not found.")
+    counts: Dict[str, int] = {}
+    for job in jobs:
+        counts[job.status] = counts.get(job.status, 0) + 1
+    return doc_schema.BulkUploadStatus(batch_id=batch_id, counts=counts, jobs=jobs)
+
+
+def _get_upload_session(session_id: str, user: models.User, db: Session) -> models.UploadSession:
+    upload_session = db.get(models.UploadSession, session_id)
+    if upload_session is None or upload_session.user_id != user.id:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Upload session not found.")
+    return upload_session
+
+
+@router.post("/documents/upload-sessions", response_model=doc_schema.UploadSession,
+             status_code=status.HTTP_201_CREATED)
+def create_upload_session(
+        request: doc_schema.UploadSessionCreate,
+        db: Session = Depends(auth.get_db),
+        current_user: models.User = Depends(auth.get_current_user)
+):
+    """Start a resumable upload.
+
+    Send the file as ranges of at most ``chunk_size`` bytes with ``PUT
+    /documents/upload-sessions/{id}``, then call ``.../finalize``. After an interruption,
+    ``GET`` the session and send only the ranges missing from ``received``.
+    """
+    _check_upload_limit(current_user, db)
+    try:
+        upload_session = upload_sessions.create_session(db, current_user, request.filename, request.size,
+                                                        request.content_type, request.sha256)
+    except upload_intake.UploadRejected as e:
+        raise HTTPException(status_code=e.status_code, detail=str(e))
+    db.commit()
+    db.refresh(upload_session)
+    logger.info(f"Opened upload session {upload_session.id} for {upload_session.filename} "
+                f"({upload_session.total_size} bytes) for user {current_user.username}")
+    return upload_session
+
+
+@router.get("/documents/upload-sessions/{session_id}", response_model=doc_schema.UploadSession)
+def get_upload_session(
+        session_id: str,
+        db: Session = Depends(auth.get_db),
+        current_user: models.User = Depends(auth.get_current_user)
+):
+    return _get_upload_session(session_id, current_user, db)
+
+
+@router.put("/documents/upload-sessions/{session_id}", response_model=doc_schema.UploadSession)
+def upload_session_range(
+        session_id: str,
+        data: bytes = Body(..., media_type="application/octet-stream"),
+        content_range: str = Header(...),
+        x_chunk_sha256: str = Header(...),
+        db: Session = Depends(auth.get_db),
+        current_user: models.User = Depends(auth.get_current_user)
+):
+    """Store one range of the file; ``X-Chunk-SHA256`` is the hex SHA-256 of the body."""
+    upload_session = _get_upload_session(session_id, current_user, db)
+    try:
+        return upload_sessions.write_range(db, upload_session, content_range, data, x_chunk_sha256)
+    except upload_intake.UploadRejected as e:
+        raise HTTPException(status_code=e.status_code, detail=str(e))
+
+
+@router.post("/documents/upload-sessions/{session_id}/finalize", response_model=doc_schema.IngestionJob,
+             status_code=status.HTTP_202_ACCEPTED)
+def finalize_upload_session(
+        session_id: str,
+        db: Session = Depends(auth.get_db),
+        current_user: models.User = Depends(auth.get_current_user)
+):
+    """Queue the assembled file for ingestion, like ``/documents/upload``; safe to retry."""
+    upload_session = _get_upload_session(session_id, current_user, db)
+    if upload_session.job_id is not None:
+        return db.get(models.IngestionJob, upload_session.job_id)
+    try:
+        _check_upload_limit(current_user, db)
+        try:
+            upload = upload_sessions.finalize_session(db, upload_session)
+        except upload_intake.UploadRejected as e:
+            db.commit()
+            if upload_session.job_id is not None:
+                # A concurrent finalize of the same session queued it first.
+                return db.get(models.IngestionJob, upload_session.job_id)
+            raise HTTPException(status_code=e.status_code, detail=str(e))
+        return _queue_spooled_upload(upload, current_user, db, upload_session)
 
     except HTTPException:
         raise
     except Exception as e:
-        logger.error(f"Unexpected error in upload_document: {str(e)}")
+        logger.error(f"Unexpected error in finalize_upload_session: {str(e)}")
         raise HTTPException(status_code=500, detail="An unexpected error occurred during file upload")
 
 
+@router.delete("/documents/upload-sessions/{session_id}", status_code=status.HTTP_204_NO_CONTENT)
+def cancel_upload_session(
+        session_id: str,
+        db: Session = Depends(auth.get_db),
+        current_user: models.User = Depends(auth.get_current_user)
+):
+    upload_session = _get_upload_session(session_id, current_user, db)
+    if upload_session.status == upload_sessions.SessionStatus.OPEN.value:
+        upload_sessions.abort_session(upload_session)
+        db.commit()
+    return
+
+
+@router.get("/documents/jobs/{job_id}", response_model=doc_schema.IngestionJob)
+def get_ingestion_job(
+        job_id: str,
+        db: Session = Depends(auth.get_db),
+        current_user: models.User = Depends(auth.get_current_user)
+):
+    job = db.get(models.IngestionJob, job_id)
+    if job is None or job.user_id != current_user.id:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Upload job not found.")
+    return job
+
+
 @router.get("/documents", response_model=List[doc_schema.Document])
 def list_user_documents(current_user: models.User = Depends(auth.get_current_user)):
     return current_user.documents
@@ -184,15 +356,101 @@ def delete_document(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="Not authorized to delete this document."
         )
-    deletion_success = document_processor.delete_file_from_gcs(doc_to_delete.filename)
-    if not deletion_success:
-        logger.warning(f"Failed to delete {doc_to_delete.filename} from GCS, continuing with database deletion")
-
+    ingestion.release_content(db, doc_to_delete)
+    corpus_profile.remove_document_stats(db, current_user.id, doc_to_delete)
+    answer_cache.bump_corpus_version(current_user)
+    db.add(current_user)
     db.delete(doc_to_delete)
     db.commit()
+    retrieval.remove_document_from_index(current_user.id, doc_id)
 
     logger.info(f"Document deleted: {doc_to_delete.filename} by user {current_user.username}")
     return
+@dataclass
+class PreparedQuery:
+    route: question_router.QuestionRoute
+    corpus_version: int
+    passages: List[document_processor.RetrievedPassage]
+    source_filenames: List[str]
+    latest_filename: Optional[str]
+    corpus_metadata: Optional[document_processor.DocumentMetadata]
+    corpus_analysis: Optional[Dict[str, Any]]
+    retrieval_report: Dict[str, Any]
+
+
+def _count_query(current_user: models.User, db: Session):
+    current_user.query_count += 1
+    current_user.last_activity_date = datetime.utcnow()
+    db.add(current_user)
+    db.commit()
+
+
+def _prepare_rag_query(query: doc_schema.QueryRequest, db: Session, current_user: models.User
+                       ) -> Tuple[Optional[doc_schema.QueryResponse], Optional[PreparedQuery]]:
+    """Quota and input checks, routing, cache lookup and retrieval shared by /query and /query/stream.
+
+    Returns a finished response for routed and cached questions, otherwise the retrieved context.
+    """
+    _check_and_reset_daily_limits(current_user, db)
+    if current_user.query_count >= DAILY_QUERY_LIMIT:
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail="Daily query limit reached."
+        )
+    if not query.question or not query.question.strip():
+        raise HTTPException(status_code=400, detail="Query question cannot be empty")
+    route = question_router.route_question(query.question)
+    routed_answer = document_processor.generate_routed_response(route, query.question)
+    if routed_answer is not None:
+        _count_query(current_user, db)
+        logger.info(f"Answered {route.value} query for user {current_user.username} without retrieval")
+        return doc_schema.QueryResponse(answer=routed_answer, source_documents=[], route=route.value), None
+    corpus_version = current_user.corpus_version
+    cached, cache_match = answer_cache.answer_cache.get(current_user.id, corpus_version, query.question)
+    if cached is not None:
+        logger.info(f"Answered query for user {current_user.username} from cache ({cache_match})")
+        return doc_schema.QueryResponse(
+            answer=cached.answer,
+            source_documents=cached.source_documents,
+            retrieval={"strategy": "answer_cache", "cache_match": cache_match},
+            route=route.value
+        ), None
+    user_documents = current_user.documents
+    if not user_documents:
+        raise HTTPException(
+            status_code=404,
+            detail="No documents found. Please upload a document first."
+        )
+    retrieval.ensure_document_chunks(db, user_documents)
+    retrieval_result = retrieval.hybrid_retrieve(db, current_user.id, query.question)
+    packed_context = context_packer.pack_context(
+        retrieval_result.passages, corpus_tokens=retrieval.get_corpus_tokens(db, current_user.id)
+    )
+    passages = packed_context.passages
+    source_filenames = list(dict.fromkeys(passage.source for passage in passages))
+    corpus_metadata, corpus_analysis = corpus_profile.load_profile_view(db, current_user.id)
+    if not source_filenames:
+        source_filenames = [doc.filename for doc in user_documents]
+
+    logger.info(f"Processing query from user {current_user.username}: '{query.question[:50]}...' "
+                f"({len(passages)} passages via {retrieval_result.strategy}, {retrieval_result.timings_ms}, "
+                f"{packed_context.used_tokens} context tokens, {packed_context.saved_tokens} saved)")
+    return None, PreparedQuery(
+        route=route,
+        corpus_version=corpus_version,
+        passages=passages,
+        source_filenames=source_filenames,
+        latest_filename=source_filenames[0] if source_filenames else None,
+        corpus_metadata=corpus_metadata,
+        corpus_analysis=corpus_analysis,
+        retrieval_report={
+            "strategy": retrieval_result.strategy,
+            "timings_ms": retrieval_result.timings_ms,
+            "context": packed_context.report()
+        }
+    )
+
+
 @router.post("/query", response_model=doc_schema.QueryResponse)
 def perform_rag_query(
         query: doc_schema.QueryRequest,
@@ -201,50 +459,41 @@ def perform_rag_query(
 ):
  
     try:
-        _check_and_reset_daily_limits(current_user, db)
-        if current_user.query_count >= DAILY_QUERY_LIMIT:
-            raise HTTPException(
-                status_code=status.HTTP_429_TOO_MANY_REQUESTS,
-                detail="Daily query limit reached."
-            )
-        if not query.question or not query.question.strip():
-            raise HTTPException(status_code=400, detail="Query question cannot be empty")
-        user_documents = current_user.documents
-        if not user_documents:
-            raise HTTPException(
-                status_code=404,
-                detail="No documents found. Please upload a document first."
-            )
-        context = "\n\n".join([doc.content for doc in user_documents])
-        source_filenames = [doc.filename for doc in user_documents]
-        latest_filename = source_filenames[0] if source_filenames else None
-
-        logger.info(f"Processing query from user {current_user.username}: '{query.question[:50]}...'")
-        try:
-            if hasattr(document_processor, 'generate_answer_with_ultra_rag'):
-                answer = document_processor.generate_answer_with_ultra_rag(
-                    question=query.question,
-                    context=context,
-                    filename=latest_filename
-                )
-                logger.info("Used ultra-advanced RAG processing")
+        immediate_response, prepared = _prepare_rag_query(query, db, current_user)
+        if immediate_response is not None:
+            return immediate_response
+        source_filenames = prepared.source_filenames
+
+        def generate_answer() -> Tuple[str, bool]:
+            """Return the answer and whether it may be cached."""
+            try:
+                if hasattr(document_processor, 'generate_answer_with_ultra_rag'):
+                    answer = document_processor.generate_answer_with_ultra_rag(
+                        question=query.question,
+                        passages=prepared.passages,
+                        filename=prepared.latest_filename,
+                        metadata=prepared.corpus_metadata,
+                        analysis=prepared.corpus_analysis
+                    )
+                    logger.info("Used ultra-advanced RAG processing")
 
-            elif hasattr(document_processor, 'generate_answer_with_rag'):
-                answer = document_processor.generate_answer_with_rag(
-                    question=query.question,
-                    context=context
-                )
-                logger.info("Used standard RAG processing")
+                elif hasattr(document_processor, 'generate_answer_with_rag'):
+                    answer = document_processor.generate_answer_with_rag(
+                        question=query.question,
+                        passages=prepared.passages
+                    )
+                    logger.info("Used standard RAG processing")
 
-            else:
-                raise HTTPException(
-                    status_code=500,
-                    detail="RAG processing functionality not available"
-                )
+                else:
+                    raise HTTPException(
+                        status_code=500,
+                        detail="RAG processing functionality not available"
+                    )
+                return answer, True
 
-        except Exception as e:
-            logger.error(f"RAG processing error: {str(e)}")
-            answer = f"""
+            except Exception as e:
+                logger.error(f"RAG processing error: {str(e)}")
+                answer = f"""
 I apologize, but I encountered an error while processing your question: "{query.question}"
 
 This might be due to:
@@ -261,16 +510,26 @@ Your uploaded documents contain information about: {', '.join(source_filenames)}
 
 I'm here to help once the issue is resolved! 😊
 """
-        current_user.query_count += 1
-        current_user.last_activity_date = datetime.utcnow()
-        db.add(current_user)
-        db.commit()
+                return answer, False
+
+        # Identical questions against the same corpus version that arrive while one is still
+        # being answered wait for that answer instead of starting their own LLM call.
+        flight_key = (current_user.id, prepared.corpus_version, answer_cache.normalize_question(query.question))
+        (answer, answer_cacheable), shared = single_flight.answer_flights.do(flight_key, generate_answer)
+        if shared:
+            logger.info(f"Reused in-flight answer for user {current_user.username}")
+        _count_query(current_user, db)
+        if answer_cacheable and not shared and not document_processor.is_fallback_response(answer):
+            answer_cache.answer_cache.put(current_user.id, prepared.corpus_version, query.question, answer,
+                                          source_filenames)
 
         logger.info(f"Query processed successfully for user {current_user.username}")
 
         return doc_schema.QueryResponse(
             answer=answer,
-            source_documents=source_filenames
+            source_documents=source_filenames,
+            retrieval=prepared.retrieval_report,
+            route=prepared.route.value
         )
 
     except HTTPException:
@@ -282,6 +541,207 @@ I'm here to help once the issue is resolved! 😊
             detail="An unexpected error occurred while processing your query"
         )
 
+
+@router.post("/query/batch", response_model=doc_schema.BatchQueryResponse)
+def perform_batch_rag_query(
+        batch: doc_schema.BatchQueryRequest,
+        db: Session = Depends(auth.get_db),
+        current_user: models.User = Depends(auth.get_current_user)
+):
+    """Answer several questions about the same documents in one request.
+
+    The corpus profile is loaded once, retrieval runs for all questions together and the
+    answers are generated concurrently under the LLM client's concurrency limit. Each
+    answered question counts toward the daily limit, as on /query; cached answers are free.
+    """
+    started = time.perf_counter()
+    try:
+        _check_and_reset_daily_limits(current_user, db)
+        questions = [question.strip() for question in batch.questions]
+        if not questions or not all(questions):
+            raise HTTPException(status_code=400, detail="Batch must contain non-empty questions")
+        if len(questions) > BATCH_QUERY_MAX_QUESTIONS:
+            raise HTTPException(status_code=400,
+                                detail=f"A batch can contain at most {BATCH_QUERY_MAX_QUESTIONS} questions")
+        remaining = DAILY_QUERY_LIMIT - current_user.query_count
+        if len(questions) > remaining:
+            raise HTTPException(
+                status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                detail=f"Daily query limit reached: {max(remaining, 0)} queries left for {len(questions)} questions."
+            )
+
+        corpus_version = current_user.corpus_version
+        results: List[Optional[doc_schema.BatchQueryItem]] = [None] * len(questions)
+        routes = [question_router.route_question(question) for question in questions]
+        pending: List[int] = []
+        queries_counted = 0
+        for i, (question, route) in enumerate(zip(questions, routes)):
+            routed_answer = document_processor.generate_routed_response(route, question)
+            if routed_answer is not None:
+                results[i] = doc_schema.BatchQueryItem(question=question, answer=routed_answer, source_documents=[],
+                                                       route=route.value)
+                queries_counted += 1
+                continue
+            cached, cache_match = answer_cache.answer_cache.get(current_user.id, corpus_version, question)
+            if cached is not None:
+                results[i] = doc_schema.BatchQueryItem(
+                    question=question, answer=cached.answer, source_documents=cached.source_documents,
+                    retrieval={"strategy": "answer_cache", "cache_match": cache_match}, route=route.value
+                )
+                continue
+            pending.append(i)
+
+        timings = {"retrieval": 0.0, "generation": 0.0}
+        if pending:
+            user_documents = current_user.documents
+            if not user_documents:
+                raise HTTPException(
+                    status_code=404,
+                    detail="No documents found. Please upload a document first."
+                )
+            stage_start = time.perf_counter()
+            retrieval.ensure_document_chunks(db, user_documents)
+            retrieval_results = retrieval.hybrid_retrieve_batch(db, current_user.id, [questions[i] for i in pending])
+            corpus_tokens = retrieval.get_corpus_tokens(db, current_user.id)
+            packed_contexts = [context_packer.pack_context(result.passages, corpus_tokens=corpus_tokens)
+                               for result in retrieval_results]
+            corpus_metadata, corpus_analysis = corpus_profile.load_profile_view(db, current_user.id)
+            all_filenames = [doc.filename for doc in user_documents]
+            timings["retrieval"] = (time.perf_counter() - stage_start) * 1000
+
+            def generate(question: str, passages: List[document_processor.RetrievedPassage]) -> Tuple[str, float]:
+                generation_start = time.perf_counter()
+                try:
+                    answer = document_processor.generate_answer_with_ultra_rag(
+                        question=question,
+                        passages=passages,
+                        filename=passages[0].source if passages else None,
+                        metadata=corpus_metadata,
+                        analysis=corpus_analysis
+                    )
+                except Exception as e:
+                    logger.error(f"RAG processing error in batch: {str(e)}")
+                    answer = document_processor.GENERIC_ERROR_RESPONSE
+                return answer, (time.perf_counter() - generation_start) * 1000
+
+            stage_start = time.perf_counter()
+            with ThreadPoolExecutor(max_workers=min(len(pending), LLM_MAX_CONCURRENCY)) as executor:
+                generated = list(executor.map(generate, [questions[i] for i in pending],
+                                              [packed.passages for packed in packed_contexts]))
+            timings["generation"] = (time.perf_counter() - stage_start) * 1000
+
+            for i, retrieval_result, packed, (answer, generation_ms) in zip(pending, retrieval_results,
+                                                                             packed_contexts, generated):
+                source_filenames = list(dict.fromkeys(passage.source for passage in packed.passages)) \
+                    or all_filenames
+                results[i] = doc_schema.BatchQueryItem(
+                    question=questions[i],
+                    answer=answer,
+                    source_documents=source_filenames,
+                    retrieval={
+                        "strategy": retrieval_result.strategy,
+                        "timings_ms": retrieval_result.timings_ms,
+                        "context": packed.report()
+                    },
+                    route=routes[i].value,
+                    timings_ms={**retrieval_result.timings_ms, "generation": round(generation_ms, 3)}
+                )
+            queries_counted += len(pending)
+
+        if queries_counted:
+            current_user.query_count += queries_counted
+            current_user.last_activity_date = datetime.utcnow()
+            db.add(current_user)
+            db.commit()
+        for i in pending:
+            item = results[i]
+            if not document_processor.is_fallback_response(item.answer):
+                answer_cache.answer_cache.put(current_user.id, corpus_version, item.question, item.answer,
+                                              item.source_documents)
+
+        timings["total"] = (time.perf_counter() - started) * 1000
+        logger.info(f"Batch of {len(questions)} questions processed for user {current_user.username} "
+                    f"({len(pending)} generated, {queries_counted} counted, {timings['total']:.0f}ms)")
+        return doc_schema.BatchQueryResponse(
+            results=results,
+            queries_counted=queries_counted,
+            timings_ms={stage: round(value, 3) for stage, value in timings.items()}
+        )
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Unexpected error in perform_batch_rag_query: {str(e)}")
+        raise HTTPException(
+            status_code=500,
+            detail="An unexpected error occurred while processing your queries"
+        )
+
+
+def _sse_event(event: str, data: Dict[str, Any]) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+def _stream_answer_events(question: str, user_id: int, prepared: PreparedQuery) -> Iterator[str]:
+    yield _sse_event("metadata", {
+        "source_documents": prepared.source_filenames,
+        "retrieval": prepared.retrieval_report,
+        "route": prepared.route.value
+    })
+    parts = []
+    for chunk in document_processor.stream_answer_with_ultra_rag(
+            question=question,
+            passages=prepared.passages,
+            filename=prepared.latest_filename,
+            metadata=prepared.corpus_metadata,
+            analysis=prepared.corpus_analysis
+    ):
+        parts.append(chunk)
+        yield _sse_event("token", {"text": chunk})
+    answer = ''.join(parts)
+    if not document_processor.is_fallback_response(answer):
+        answer_cache.answer_cache.put(user_id, prepared.corpus_version, question, answer, prepared.source_filenames)
+    yield _sse_event("done", {"length": len(answer)})
+
+
+def _stream_immediate_events(response: doc_schema.QueryResponse) -> Iterator[str]:
+    yield _sse_event("metadata", {
+        "source_documents": response.source_documents,
+        "retrieval": response.retrieval,
+        "route": response.route
+    })
+    yield _sse_event("token", {"text": response.answer})
+    yield _sse_event("done", {"length": len(response.answer)})
+
+
+@router.post("/query/stream")
+def stream_rag_query(
+        query: doc_schema.QueryRequest,
+        db: Session = Depends(auth.get_db),
+        current_user: models.User = Depends(auth.get_current_user)
+):
+    """Server-sent events: a ``metadata`` event with sources first, ``token`` events as the answer
+    is generated, then ``done``. Errors before streaming starts are returned as normal HTTP errors."""
+    try:
+        immediate_response, prepared = _prepare_rag_query(query, db, current_user)
+        if immediate_response is not None:
+            events = _stream_immediate_events(immediate_response)
+        else:
+            # The quota is charged before the body is streamed: the request's DB session is
+            # closed by then, and generation has already been paid for if the client disconnects.
+            _count_query(current_user, db)
+            events = _stream_answer_events(query.question, current_user.id, prepared)
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Unexpected error in stream_rag_query: {str(e)}")
+        raise HTTPException(
+            status_code=500,
+            detail="An unexpected error occurred while processing your query"
+        )
+    return StreamingResponse(events, media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
 @router.get("/documents/{doc_id}/info")
 def get_document_info(
         doc_id: int,
@@ -302,8 +762,13 @@ def get_document_info(
         "word_count": len(document.content.split()) if document.content else 0,
         "character_count": len(document.content) if document.content else 0,
     }
-    if hasattr(document, 'metadata') and document.metadata:
-        doc_info.update(document.metadata)
+    if document.analysis:
+        stored_metadata = document.analysis.get("metadata", {})
+        doc_info.update({
+            key: stored_metadata.get(key) for key in
+            ("file_type", "word_count", "language_primary", "document_type", "complexity_level", "confidence_score")
+        })
+        doc_info["processing_timestamp"] = document.analysis.get("processing_timestamp")
     if hasattr(document_processor, 'get_file_info_from_gcs'):
         gcs_info = document_processor.get_file_info_from_gcs(document.filename)
         if gcs_info:
@@ -313,7 +778,7 @@ def get_document_info(
 
 
 @router.get("/system/status")
-def get_system_status():
+def get_system_status(db: Session = Depends(auth.get_db)):
     """Get system status and available features."""
     available_features = {
         "basic_text_extraction": hasattr(document_processor, 'extract_text_from_pdf'),
@@ -333,6 +798,16 @@ def get_system_status():
         "supported_formats": ["PDF", "DOCX"],
         "daily_limits": {
             "uploads": DAILY_UPLOAD_LIMIT,
+            "bulk_uploads": BULK_UPLOAD_DAILY_LIMIT,
+            "bulk_upload_files_per_request": BULK_UPLOAD_MAX_FILES,
             "queries": DAILY_QUERY_LIMIT
-        }
+        },
+        "retrieval": retrieval.get_retrieval_stats(),
+        "context_packing": context_packer.get_packing_stats(),
+        "pattern_scanning": pattern_registry.get_pattern_stats(),
+        "answer_cache": answer_cache.get_cache_stats(),
+        "llm": llm_client.get_llm_stats(),
+        "single_flight": single_flight.get_single_flight_stats(),
+        "ingestion": ingestion.get_ingestion_stats(),
+        "dedup": ingestion.get_dedup_stats(db)
     }
@@ -15,4 +15,61 @@ DATABASE_URL = f"postgresql+psycopg2://{DATABASE_USER}:{DATABASE_PASSWORD}@{DB_H
 
 SECRET_KEY: str = os.getenv("SECRET_KEY", "a_very_bad_default_secret_key")
 ALGORITHM: str = "HS256"
-ACCESS_TOKEN_EXPIRE_MINUTES: int = 30
\ No newline at end of file
+ACCESS_TOKEN_EXPIRE_MINUTES: int = 30
+RAG_TOP_K: int = int(os.getenv("RAG_TOP_K", "12"))
+CHUNK_MAX_CHARS: int = int(os.getenv("CHUNK_MAX_CHARS", "2000"))
+
+EMBEDDING_BACKEND: str = os.getenv("EMBEDDING_BACKEND", "hashing")
+EMBEDDING_MODEL: str = os.getenv("EMBEDDING_MODEL", "text-embedding-004")
+EMBEDDING_DIMENSION: int = int(os.getenv("EMBEDDING_DIMENSION", "768"))
+EMBEDDING_BATCH_SIZE: int = int(os.getenv("EMBEDDING_BATCH_SIZE", "100"))
+
+RETRIEVAL_BUDGET_MS: float = float(os.getenv("RETRIEVAL_BUDGET_MS", "150"))
+RETRIEVAL_VECTOR_PROBE_INTERVAL: int = int(os.getenv("RETRIEVAL_VECTOR_PROBE_INTERVAL", "20"))
+RRF_K: int = int(os.getenv("RRF_K", "60"))
+RRF_CANDIDATE_MULTIPLIER: int = int(os.getenv("RRF_CANDIDATE_MULTIPLIER", "3"))
+CONTEXT_TOKEN_BUDGET: int = int(os.getenv("CONTEXT_TOKEN_BUDGET", "4000"))
+
+PATTERN_SAFE_MODE: bool = os.getenv("PATTERN_SAFE_MODE", "true").lower() == "true"
+PATTERN_WINDOW_CHARS: int = int(os.getenv("PATTERN_WINDOW_CHARS", "65536"))
+PATTERN_MATCH_CAP: int = int(os.getenv("PATTERN_MATCH_CAP", "50"))
+PATTERN_SCAN_BUDGET_MS: float = float(os.getenv("PATTERN_SCAN_BUDGET_MS", "500"))
+
+ANSWER_CACHE_MAX_ENTRIES: int = int(os.getenv("ANSWER_CACHE_MAX_ENTRIES", "1024"))
+ANSWER_CACHE_TTL_SECONDS: float = float(os.getenv("ANSWER_CACHE_TTL_SECONDS", "3600"))
+# Near-duplicate answer reuse stays off unless a word-pair similarity threshold (0-1) is set.
+ANSWER_CACHE_SIMILARITY: float = float(os.getenv("ANSWER_CACHE_SIMILARITY", "0"))
+
+LLM_BACKEND: str = os.getenv("LLM_BACKEND", "vertex")
+LLM_MODEL: str = os.getenv("LLM_MODEL", "gemini-2.0-flash-lite-001")
+LLM_TIMEOUT_SECONDS: float = float(os.getenv("LLM_TIMEOUT_SECONDS", "30"))
+LLM_MAX_CONCURRENCY: int = int(os.getenv("LLM_MAX_CONCURRENCY", "8"))
+LLM_FAKE_LATENCY_MS: float = float(os.getenv("LLM_FAKE_LATENCY_MS", "200"))
+
+BATCH_QUERY_MAX_QUESTIONS: int = int(os.getenv("BATCH_QUERY_MAX_QUESTIONS", "10"))
+
+INGESTION_PROCESS_WORKERS: int = int(os.getenv("INGESTION_PROCESS_WORKERS", "2"))
+INGESTION_POLL_SECONDS: float = float(os.getenv("INGESTION_POLL_SECONDS", "2"))
+INGESTION_STALE_SECONDS: float = float(os.getenv("INGESTION_STALE_SECONDS", "600"))
+INGESTION_MAX_ATTEMPTS: int = int(os.getenv("INGESTION_MAX_ATTEMPTS", "3"))
+INGESTION_CONCURRENT_JOBS: int = int(os.getenv("INGESTION_CONCURRENT_JOBS", str(max(1, INGESTION_PROCESS_WORKERS))))
+
+PDF_PARALLEL_MIN_PAGES: int = int(os.getenv("PDF_PARALLEL_MIN_PAGES", "64"))
+PDF_EXTRACTION_PROCESSES: int = int(os.getenv("PDF_EXTRACTION_PROCESSES", str(min(4, os.cpu_count() or 1))))
+PDF_PAGES_PER_TASK: int = int(os.getenv("PDF_PAGES_PER_TASK", "16"))
+
+EXTRACTION_TIMEOUT_SECONDS: float = float(os.getenv("EXTRACTION_TIMEOUT_SECONDS", "120"))
+EXTRACTION_MAX_RSS_BYTES: int = int(os.getenv("EXTRACTION_MAX_RSS_BYTES", str(1024 * 1024 * 1024)))
+DOCX_MAX_UNCOMPRESSED_BYTES: int = int(os.getenv("DOCX_MAX_UNCOMPRESSED_BYTES", str(200 * 1024 * 1024)))
+DOCX_MAX_COMPRESSION_RATIO: float = float(os.getenv("DOCX_MAX_COMPRESSION_RATIO", "100"))
+
+MAX_UPLOAD_BYTES: int = int(os.getenv("MAX_UPLOAD_BYTES", str(50 * 1024 * 1024)))
+UPLOAD_CHUNK_BYTES: int = int(os.getenv("UPLOAD_CHUNK_BYTES", str(1024 * 1024)))
+UPLOAD_SPOOL_DIR: str = os.getenv("UPLOAD_SPOOL_DIR", "/tmp/rag-uploads")
+UPLOAD_SESSION_CHUNK_BYTES: int = int(os.getenv("UPLOAD_SESSION_CHUNK_BYTES", str(4 * 1024 * 1024)))
+UPLOAD_SESSION_TTL_SECONDS: float = float(os.getenv("UPLOAD_SESSION_TTL_SECONDS", str(24 * 3600)))
+UPLOAD_SESSION_MAX_OPEN: int = int(os.getenv("UPLOAD_SESSION_MAX_OPEN", "3"))
+
+BULK_UPLOAD_MAX_FILES: int = int(os.getenv("BULK_UPLOAD_MAX_FILES", "200"))
+BULK_UPLOAD_DAILY_LIMIT: int = int(os.getenv("BULK_UPLOAD_DAILY_LIMIT", "200"))
+BULK_UPLOAD_MAX_ARCHIVE_BYTES: int = int(os.getenv("BULK_UPLOAD_MAX_ARCHIVE_BYTES", str(500 * 1024 * 1024)))
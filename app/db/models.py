@@ -1,5 +1,5 @@
 
-from sqlalchemy import Column, Integer, String, Text, DateTime, Boolean, ForeignKey
+from sqlalchemy import Column, Integer, String, Text, DateTime, Boolean, ForeignKey, Float, JSON, LargeBinary
 from sqlalchemy.orm import relationship
 from datetime import datetime
 
@@ -12,19 +12,115 @@ class User(Base):
     hashed_password = Column(String, nullable=False)
     query_count = Column(Integer, default=0)
     pdf_upload_count = Column(Integer, default=0)
+    bulk_upload_count = Column(Integer, default=0)
+    # Per-user override of BULK_UPLOAD_DAILY_LIMIT, set by an administrator.
+    bulk_upload_quota = Column(Integer)
     last_activity_date = Column(DateTime, default=datetime.utcnow)
+    corpus_version = Column(Integer, default=0, nullable=False)
     documents = relationship("Document", back_populates="owner", cascade="all, delete-orphan")
+    corpus_profile = relationship("CorpusProfile", uselist=False, cascade="all, delete-orphan")
 
 class Document(Base):
     __tablename__ = "documents"
     id = Column(Integer, primary_key=True, index=True)
     filename = Column(String, index=True)
     content = Column(Text)
+    analysis = Column(JSON)
+    content_sha256 = Column(String(64), index=True)
     user_id = Column(Integer, ForeignKey("users.id"))
     owner = relationship("User", back_populates="documents")
+    chunks = relationship("DocumentChunk", back_populates="document", cascade="all, delete-orphan",
+                          order_by="DocumentChunk.chunk_index")
+    segments = relationship("DocumentSegment", back_populates="document", cascade="all, delete-orphan",
+                            order_by="DocumentSegment.segment_index")
+
+class DocumentChunk(Base):
+    __tablename__ = "document_chunks"
+    id = Column(Integer, primary_key=True, index=True)
+    document_id = Column(Integer, ForeignKey("documents.id"), index=True, nullable=False)
+    user_id = Column(Integer, ForeignKey("users.id"), index=True, nullable=False)
+    chunk_index = Column(Integer, nullable=False)
+    segment_index = Column(Integer)
+    content = Column(Text, nullable=False)
+    chunk_type = Column(String, default="section")
+    importance_score = Column(Float, default=0.5)
+    topic_tags = Column(JSON, default=list)
+    context_window = Column(Text)
+    embedding = Column(LargeBinary)
+    embedding_model = Column(String)
+    document = relationship("Document", back_populates="chunks")
+
+class DocumentSegment(Base):
+    __tablename__ = "document_segments"
+    id = Column(Integer, primary_key=True, index=True)
+    document_id = Column(Integer, ForeignKey("documents.id"), index=True, nullable=False)
+    segment_index = Column(Integer, nullable=False)
+    fingerprint = Column(String(64), nullable=False)
+    content = Column(Text, nullable=False)
+    details = Column(JSON, default=dict)
+    document = relationship("Document", back_populates="segments")
+
+class CorpusProfile(Base):
+    __tablename__ = "corpus_profiles"
+    user_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    profile = Column(JSON, nullable=False)
+    updated_at = Column(DateTime, default=datetime.utcnow)
 
 class InviteCode(Base):
     __tablename__ = "invite_codes"
     id = Column(Integer, primary_key=True, index=True)
     code = Column(String, unique=True, index=True, nullable=False)
-    is_used = Column(Boolean, default=False)
\ No newline at end of file
+    is_used = Column(Boolean, default=False)
+
+class IngestionJob(Base):
+    __tablename__ = "ingestion_jobs"
+    id = Column(String, primary_key=True)
+    user_id = Column(Integer, ForeignKey("users.id"), index=True, nullable=False)
+    filename = Column(String, nullable=False)
+    content_type = Column(String)
+    file_size = Column(Integer, default=0)
+    content_sha256 = Column(String(64))
+    spool_path = Column(String)
+    spool_host = Column(String, index=True)
+    batch_id = Column(String, index=True)
+    payload = Column(LargeBinary)
+    status = Column(String, index=True, nullable=False, default="queued")
+    stage = Column(String)
+    stages = Column(JSON, default=dict)
+    attempts = Column(Integer, default=0)
+    error = Column(Text)
+    document_id = Column(Integer, ForeignKey("documents.id", ondelete="SET NULL"))
+    created_at = Column(DateTime, default=datetime.utcnow, index=True)
+    updated_at = Column(DateTime, default=datetime.utcnow)
+    finished_at = Column(DateTime)
+
+class UploadSession(Base):
+    __tablename__ = "upload_sessions"
+    id = Column(String, primary_key=True)
+    user_id = Column(Integer, ForeignKey("users.id"), index=True, nullable=False)
+    filename = Column(String, nullable=False)
+    content_type = Column(String)
+    file_type = Column(String)
+    total_size = Column(Integer, nullable=False)
+    chunk_size = Column(Integer, nullable=False)
+    sha256 = Column(String(64))
+    spool_path = Column(String)
+    spool_host = Column(String, index=True)
+    received = Column(JSON, default=list)
+    received_bytes = Column(Integer, default=0, nullable=False)
+    status = Column(String, index=True, nullable=False, default="open")
+    job_id = Column(String, ForeignKey("ingestion_jobs.id", ondelete="SET NULL"))
+    created_at = Column(DateTime, default=datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.utcnow)
+    expires_at = Column(DateTime, index=True)
+
+class ExtractedContent(Base):
+    __tablename__ = "extracted_contents"
+    sha256 = Column(String(64), primary_key=True)
+    file_type = Column(String)
+    file_size = Column(Integer, default=0)
+    storage_path = Column(String)
+    content = Column(Text, nullable=False)
+    analysis = Column(JSON)
+    reuse_count = Column(Integer, default=0, nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow)
@@ -1,14 +1,26 @@
 
 
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 
 from app.api import endpoints
 from app.core.config import PROJECT_NAME, API_V1_STR
 from app.db.base import Base
-from app.db.session import engine
+from app.db.session import engine, SessionLocal
+from app.services import ingestion
 Base.metadata.create_all(bind=engine)
-app = FastAPI(title=PROJECT_NAME)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    ingestion.start_worker(SessionLocal)
+    yield
+    ingestion.stop_worker()
+
+
+app = FastAPI(title=PROJECT_NAME, lifespan=lifespan)
 origins = [
     "http://localhost:5173",
     "http://localhost:5174",
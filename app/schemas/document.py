@@ -1,3 +1,5 @@
+from datetime import datetime
+from typing import Any, Dict, Optional
 
 from pydantic import BaseModel, ConfigDict
 
@@ -12,4 +14,70 @@ class QueryRequest(BaseModel):
 
 class QueryResponse(BaseModel):
     answer: str
-    source_documents: list[str]
\ No newline at end of file
+    source_documents: list[str]
+    retrieval: Optional[Dict[str, Any]] = None
+    route: Optional[str] = None
+class BatchQueryRequest(BaseModel):
+    questions: list[str]
+
+class BatchQueryItem(QueryResponse):
+    question: str
+    timings_ms: Dict[str, float] = {}
+
+class BatchQueryResponse(BaseModel):
+    results: list[BatchQueryItem]
+    queries_counted: int
+    timings_ms: Dict[str, float]
+
+class IngestionJob(BaseModel):
+    id: str
+    filename: str
+    file_size: int
+    status: str
+    stage: Optional[str] = None
+    stages: Dict[str, Dict[str, Any]] = {}
+    document_id: Optional[int] = None
+    error: Optional[str] = None
+    created_at: datetime
+    updated_at: datetime
+    finished_at: Optional[datetime] = None
+
+    model_config = ConfigDict(from_attributes=True)
+
+class UploadSessionCreate(BaseModel):
+    filename: str
+    size: int
+    content_type: Optional[str] = None
+    sha256: Optional[str] = None
+
+class UploadSession(BaseModel):
+    id: str
+    filename: str
+    total_size: int
+    chunk_size: int
+    received: list[list[int]] = []
+    received_bytes: int
+    status: str
+    job_id: Optional[str] = None
+    created_at: datetime
+    expires_at: datetime
+
+    model_config = ConfigDict(from_attributes=True)
+
+class BulkUploadItem(BaseModel):
+    filename: str
+    status: str
+    job_id: Optional[str] = None
+    error: Optional[str] = None
+
+class BulkUploadResponse(BaseModel):
+    batch_id: Optional[str] = None
+    accepted: int
+    rejected: int
+    quota_remaining: int
+    results: list[BulkUploadItem]
+
+class BulkUploadStatus(BaseModel):
+    batch_id: str
+    counts: Dict[str, int]
+    jobs: list[IngestionJob]
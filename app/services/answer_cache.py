@@ -0,0 +1,156 @@
+import re
+import time
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Any, Dict, FrozenSet, List, Optional, Tuple
+
+from app.db import models
+from app.core.config import ANSWER_CACHE_MAX_ENTRIES, ANSWER_CACHE_TTL_SECONDS, ANSWER_CACHE_SIMILARITY
+
+NORMALIZE_PATTERN = re.compile(r'\w+')
+
+CacheKey = Tuple[int, int, str]
+
+
+def normalize_question(question: str) -> str:
+    """Lowercase and drop punctuation and extra whitespace: "What's the rate?" == "what s the rate"."""
+    return ' '.join(NORMALIZE_PATTERN.findall(question.lower()))
+
+
+def question_shingles(question: str) -> FrozenSet[str]:
+    """Consecutive word pairs of the normalized question, so word order and every number count.
+
+    "fare from Delhi to London" and "fare from London to Delhi" share no pair past "fare from".
+    """
+    words = normalize_question(question).split()
+    if len(words) < 2:
+        return frozenset(words)
+    return frozenset(f"{first} {second}" for first, second in zip(words, words[1:]))
+
+
+def question_numbers(question: str) -> FrozenSet[str]:
+    return frozenset(word for word in normalize_question(question).split() if any(c.isdigit() for c in word))
+
+
+def jaccard(a: FrozenSet[str], b: FrozenSet[str]) -> float:
+    if not a or not b:
+        return 0.0
+    return len(a & b) / len(a | b)
+
+
+@dataclass
+class CachedAnswer:
+    answer: str
+    source_documents: List[str]
+    shingles: FrozenSet[str] = frozenset()
+    numbers: FrozenSet[str] = frozenset()
+    created_at: float = field(default_factory=time.monotonic)
+
+
+class AnswerCache:
+    """LRU + TTL cache of answers keyed by (user id, corpus version, normalized question).
+
+    The corpus version lives on the user row and is bumped by every upload and delete, so
+    entries for an older corpus are never looked up again and simply age out. Optional
+    near-duplicate lookup (off while ``similarity_threshold`` is 0) compares the question's
+    word pairs with the cached questions of the same user and corpus version; questions
+    that mention different numbers never match.
+    """
+
+    def __init__(self, max_entries: int = ANSWER_CACHE_MAX_ENTRIES, ttl_seconds: float = ANSWER_CACHE_TTL_SECONDS,
+                 similarity_threshold: float = ANSWER_CACHE_SIMILARITY):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.similarity_threshold = similarity_threshold
+        self._entries: "OrderedDict[CacheKey, CachedAnswer]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats = {"hits": 0, "near_duplicate_hits": 0, "misses": 0, "stores": 0, "evictions": 0, "expired": 0}
+
+    def _expired(self, entry: CachedAnswer, now: float) -> bool:
+        return now - entry.created_at > self.ttl_seconds
+
+    def get(self, user_id: int, corpus_version: int, question: str) -> Tuple[Optional[CachedAnswer], Optional[str]]:
+        """Return ``(entry, "exact" | "near_duplicate")`` or ``(None, None)`` on a miss."""
+        key = (user_id, corpus_version, normalize_question(question))
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and self._expired(entry, now):
+                del self._entries[key]
+                self.stats["expired"] += 1
+                entry = None
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.stats["hits"] += 1
+                return entry, "exact"
+            if self.similarity_threshold > 0:
+                match = self._find_near_duplicate(user_id, corpus_version, question_shingles(question),
+                                                  question_numbers(question), now)
+                if match is not None:
+                    self._entries.move_to_end(match)
+                    self.stats["near_duplicate_hits"] += 1
+                    return self._entries[match], "near_duplicate"
+            self.stats["misses"] += 1
+            return None, None
+
+    def _find_near_duplicate(self, user_id: int, corpus_version: int, shingles: FrozenSet[str],
+                             numbers: FrozenSet[str], now: float) -> Optional[CacheKey]:
+        best_key, best_score = None, self.similarity_threshold
+        for key, entry in self._entries.items():
+            if key[0] != user_id or key[1] != corpus_version or self._expired(entry, now):
+                continue
+            if entry.numbers != numbers:
+                continue
+            score = jaccard(shingles, entry.shingles)
+            if score >= best_score:
+                best_key, best_score = key, score
+        return best_key
+
+    def put(self, user_id: int, corpus_version: int, question: str, answer: str, source_documents: List[str]):
+        key = (user_id, corpus_version, normalize_question(question))
+        with self._lock:
+            self._entries[key] = CachedAnswer(answer=answer, source_documents=list(source_documents),
+                                              shingles=question_shingles(question),
+                                              numbers=question_numbers(question))
+            self._entries.move_to_end(key)
+            self.stats["stores"] += 1
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.stats["evictions"] += 1
+
+    def invalidate_user(self, user_id: int):
+        """Free this worker's entries for a user; other workers rely on the version bump."""
+        with self._lock:
+            for key in [key for key in self._entries if key[0] == user_id]:
+                del self._entries[key]
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.stats["hits"] + self.stats["near_duplicate_hits"] + self.stats["misses"]
+            hits = self.stats["hits"] + self.stats["near_duplicate_hits"]
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "ttl_seconds": self.ttl_seconds,
+                "similarity_threshold": self.similarity_threshold,
+                "hit_rate": round(hits / lookups, 3) if lookups else 0.0,
+                **self.stats
+            }
+
+
+answer_cache = AnswerCache()
+
+
+def get_cache_stats() -> Dict[str, Any]:
+    return answer_cache.get_stats()
+
+
+def bump_corpus_version(user: models.User):
+    """Mark the user's corpus as changed; call before committing an upload or delete.
+
+    The increment is done in SQL so that concurrent uploads in different workers cannot
+    both write the same new version.
+    """
+    user.corpus_version = models.User.corpus_version + 1
+    answer_cache.invalidate_user(user.id)
@@ -0,0 +1,139 @@
+import os
+import logging
+import zipfile
+import zlib
+from contextlib import closing
+from dataclasses import dataclass
+from functools import partial
+from typing import BinaryIO, Callable, Iterator, List, Optional, Tuple
+
+from app.core.config import BULK_UPLOAD_MAX_FILES, BULK_UPLOAD_MAX_ARCHIVE_BYTES
+from app.services.upload_intake import (ZIP_MAGIC, SpooledUpload, UploadRejected, copy_to_spool, discard_spool_file,
+                                        file_type_from_name, spool_upload)
+
+logger = logging.getLogger(__name__)
+
+CONTENT_TYPES = {
+    "PDF": "application/pdf",
+    "DOCX": "application/vnd.openxmlformats-officedocument.wordprocessingml.document",
+}
+
+
+@dataclass
+class BulkFile:
+    filename: str
+    content_type: Optional[str]
+    stream: BinaryIO
+    size: Optional[int] = None
+
+
+@dataclass
+class BulkEntry:
+    """One file of a bulk upload: spooled and ready to queue, or rejected with a reason."""
+    filename: str
+    upload: Optional[SpooledUpload] = None
+    error: Optional[str] = None
+
+
+def is_archive(filename: Optional[str]) -> bool:
+    return bool(filename) and filename.lower().endswith(".zip")
+
+
+def _archive_members(archive: zipfile.ZipFile) -> Iterator[zipfile.ZipInfo]:
+    for info in archive.infolist():
+        basename = os.path.basename(info.filename)
+        if info.is_dir() or not basename or basename.startswith(".") or info.filename.startswith("__MACOSX/"):
+            continue
+        yield info
+
+
+def _spool_member(archive: zipfile.ZipFile, info: zipfile.ZipInfo) -> SpooledUpload:
+    filename = os.path.basename(info.filename)
+    file_type = file_type_from_name(filename)
+    if file_type is None:
+        raise UploadRejected("Unsupported file format. Only PDF and DOCX files are allowed.")
+    if info.flag_bits & 0x1:
+        raise UploadRejected("Encrypted archive entries are not supported")
+    # The declared size is only a hint: spool_upload counts the bytes actually inflated, so an
+    # entry that lies about its size is cut off at the limit all the same.
+    with archive.open(info) as member:
+        return spool_upload(member, filename, CONTENT_TYPES[file_type], declared_size=info.file_size)
+
+
+def _expand(files: List[BulkFile]) -> Iterator[Tuple[str, Optional[Callable[[], SpooledUpload]], Optional[str]]]:
+    """``(name, spool, error)`` for every file of the request, with archives replaced by their members."""
+    for bulk_file in files:
+        if not is_archive(bulk_file.filename):
+            yield bulk_file.filename or "", partial(
+                spool_upload, bulk_file.stream, bulk_file.filename,
+                bulk_file.content_type or "application/octet-stream", declared_size=bulk_file.size), None
+            continue
+        if bulk_file.size is not None and bulk_file.size > BULK_UPLOAD_MAX_ARCHIVE_BYTES:
+            limit_mb = BULK_UPLOAD_MAX_ARCHIVE_BYTES / (1024 * 1024)
+            yield bulk_file.filename, None, f"Archive exceeds {limit_mb:g}MB limit"
+            continue
+        # The size is not always declared, so the archive is copied under the limit before it is opened.
+        try:
+            archive_path, _, _ = copy_to_spool(bulk_file.stream, ".zip", lambda head: head.startswith(ZIP_MAGIC),
+                                               "ZIP", "Archive", BULK_UPLOAD_MAX_ARCHIVE_BYTES)
+        except UploadRejected as e:
+            yield bulk_file.filename, None, str(e)
+            continue
+        try:
+            try:
+                archive = zipfile.ZipFile(archive_path)
+            except zipfile.BadZipFile:
+                yield bulk_file.filename, None, "Invalid ZIP archive"
+                continue
+            with archive:
+                for info in _archive_members(archive):
+                    yield f"{bulk_file.filename}/{info.filename}", partial(_spool_member, archive, info), None
+        finally:
+            discard_spool_file(archive_path)
+
+
+def spool_bulk_uploads(files: List[BulkFile], allowance: int) -> List[BulkEntry]:
+    """Validate and spool every PDF/DOCX of a bulk upload, one file at a time.
+
+    ZIP archives are first copied to a spool file, stopping at ``BULK_UPLOAD_MAX_ARCHIVE_BYTES``
+    whether or not the size was declared; each member is then checked like a single upload,
+    with the same size limit. At most ``BULK_UPLOAD_MAX_FILES`` files are considered per request
+    and at most ``allowance`` are accepted; the rest are reported as rejected. On an
+    unexpected error every file spooled so far is removed.
+    """
+    entries: List[BulkEntry] = []
+    accepted = 0
+    try:
+        # Closed on the way out, so a spooled archive is removed when the file cap cuts it short.
+        with closing(_expand(files)) as expanded:
+            for name, spool, error in expanded:
+                if len(entries) >= BULK_UPLOAD_MAX_FILES:
+                    entries.append(BulkEntry(filename=name, error=f"A bulk upload may contain at most "
+                                                                  f"{BULK_UPLOAD_MAX_FILES} files; this and any "
+                                                                  f"later files were skipped"))
+                    break
+                entry = BulkEntry(filename=name, error=error)
+                entries.append(entry)
+                if error is not None:
+                    continue
+                if accepted >= allowance:
+                    entry.error = "Bulk upload quota reached"
+                    continue
+                try:
+                    entry.upload = spool()
+                    accepted += 1
+                except UploadRejected as e:
+                    entry.error = str(e)
+                except (zipfile.BadZipFile, zipfile.LargeZipFile, zlib.error, NotImplementedError, EOFError) as e:
+                    entry.error = f"Could not read archive entry: {e}"
+    except BaseException:
+        discard_entries(entries)
+        raise
+    logger.info(f"Spooled {accepted} of {len(entries)} files from a bulk upload")
+    return entries
+
+
+def discard_entries(entries: List[BulkEntry]):
+    for entry in entries:
+        if entry.upload is not None:
+            entry.upload.discard()
@@ -0,0 +1,120 @@
+import math
+import threading
+import logging
+from dataclasses import dataclass, replace
+from typing import Dict, List, Optional, Set
+
+from app.core.config import CONTEXT_TOKEN_BUDGET
+from app.services.document_processor import RetrievedPassage
+
+logger = logging.getLogger(__name__)
+
+CHARS_PER_TOKEN = 4
+IMPORTANCE_WEIGHT = 0.3
+DUPLICATE_OVERLAP = 0.8
+SHINGLE_SIZE = 4
+
+
+def estimate_tokens(text: str) -> int:
+    return math.ceil(len(text) / CHARS_PER_TOKEN) if text else 0
+
+
+@dataclass
+class PackedContext:
+    passages: List[RetrievedPassage]
+    budget_tokens: int
+    used_tokens: int
+    corpus_tokens: int
+    duplicates_dropped: int = 0
+    over_budget_dropped: int = 0
+    truncated: int = 0
+
+    @property
+    def saved_tokens(self) -> int:
+        return max(self.corpus_tokens - self.used_tokens, 0)
+
+    def report(self) -> Dict[str, int]:
+        return {
+            "budget_tokens": self.budget_tokens,
+            "used_tokens": self.used_tokens,
+            "corpus_tokens": self.corpus_tokens,
+            "saved_tokens": self.saved_tokens,
+            "passages": len(self.passages),
+            "duplicates_dropped": self.duplicates_dropped,
+            "over_budget_dropped": self.over_budget_dropped,
+            "truncated": self.truncated
+        }
+
+
+def _shingles(text: str) -> Set[str]:
+    words = text.lower().split()
+    if len(words) < SHINGLE_SIZE:
+        return {' '.join(words)}
+    return {' '.join(words[i:i + SHINGLE_SIZE]) for i in range(len(words) - SHINGLE_SIZE + 1)}
+
+
+def _is_duplicate(shingles: Set[str], kept: List[Set[str]]) -> bool:
+    for other in kept:
+        smaller = min(len(shingles), len(other))
+        if smaller and len(shingles & other) / smaller >= DUPLICATE_OVERLAP:
+            return True
+    return False
+
+
+def pack_context(passages: List[RetrievedPassage], token_budget: int = CONTEXT_TOKEN_BUDGET,
+                 corpus_tokens: Optional[int] = None) -> PackedContext:
+    """Greedily fill ``token_budget`` with the highest-priority passages.
+
+    Priority blends the retrieval score with the chunk's ``importance_score``. Near-duplicate
+    windows are dropped, and the kept passages are returned grouped by document (best document
+    first) in their original section order.
+    """
+    max_score = max((passage.score for passage in passages), default=0.0) or 1.0
+
+    def priority(passage: RetrievedPassage) -> float:
+        return (1 - IMPORTANCE_WEIGHT) * passage.score / max_score + IMPORTANCE_WEIGHT * passage.importance_score
+
+    packed = PackedContext(passages=[], budget_tokens=token_budget, used_tokens=0,
+                           corpus_tokens=corpus_tokens or 0)
+    kept_shingles: List[Set[str]] = []
+    document_rank: Dict[Optional[int], int] = {}
+    for passage in sorted(passages, key=priority, reverse=True):
+        shingles = _shingles(passage.content)
+        if _is_duplicate(shingles, kept_shingles):
+            packed.duplicates_dropped += 1
+            continue
+        remaining = token_budget - packed.used_tokens
+        tokens = estimate_tokens(passage.content)
+        if tokens > remaining:
+            if packed.passages or remaining <= 0:
+                packed.over_budget_dropped += 1
+                continue
+            passage = replace(passage, content=passage.content[:remaining * CHARS_PER_TOKEN])
+            tokens = estimate_tokens(passage.content)
+            packed.truncated += 1
+        packed.passages.append(passage)
+        packed.used_tokens += tokens
+        kept_shingles.append(shingles)
+        document_rank.setdefault(passage.document_id, len(document_rank))
+
+    packed.passages.sort(key=lambda p: (document_rank[p.document_id], p.chunk_index))
+    if corpus_tokens is None:
+        packed.corpus_tokens = sum(estimate_tokens(passage.content) for passage in passages)
+    _record(packed)
+    return packed
+
+
+_stats_lock = threading.Lock()
+_stats = {"packs": 0, "used_tokens": 0, "saved_tokens": 0}
+
+
+def _record(packed: PackedContext):
+    with _stats_lock:
+        _stats["packs"] += 1
+        _stats["used_tokens"] += packed.used_tokens
+        _stats["saved_tokens"] += packed.saved_tokens
+
+
+def get_packing_stats() -> Dict[str, int]:
+    with _stats_lock:
+        return {"budget_tokens": CONTEXT_TOKEN_BUDGET, **_stats}
@@ -0,0 +1,184 @@
+import logging
+from collections import Counter
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+from sqlalchemy.orm import Session
+
+from app.db import models
+from app.services import document_processor
+
+logger = logging.getLogger(__name__)
+
+TERMS_PER_DOCUMENT = 200
+COUNTER_FIELDS = ("terms", "domain_indicators", "entities", "language_words", "document_type_words",
+                  "complexity_words", "file_types")
+
+
+def compute_document_stats(text: str, metadata: document_processor.DocumentMetadata,
+                           analysis: Dict[str, Any]) -> Dict[str, Any]:
+    """Mergeable per-document statistics; summing these over a user's documents gives the corpus profile."""
+    domain_hits = document_processor.find_domain_indicator_hits(text)
+    return {
+        "document_count": 1,
+        "word_count": metadata.word_count,
+        "section_count": analysis.get("content_structure", {}).get("hierarchical_depth", 0),
+        "confidence_weighted": metadata.confidence_score * max(metadata.word_count, 1),
+        "confidence_weight": max(metadata.word_count, 1),
+        "terms": dict(document_processor.count_topic_terms(text).most_common(TERMS_PER_DOCUMENT)),
+        "domain_indicators": {f"{domain}::{indicator}": 1
+                              for domain, indicators in domain_hits.items() for indicator in indicators},
+        "entities": {entity: 1 for entity in metadata.entities_detected},
+        "language_words": {metadata.language_primary: max(metadata.word_count, 1)},
+        "document_type_words": {metadata.document_type.value: max(metadata.word_count, 1)},
+        "complexity_words": {metadata.complexity_level.value: max(metadata.word_count, 1)},
+        "file_types": {metadata.file_type: 1}
+    }
+
+
+def empty_profile() -> Dict[str, Any]:
+    profile = {"document_count": 0, "word_count": 0, "section_count": 0,
+               "confidence_weighted": 0.0, "confidence_weight": 0}
+    profile.update({field: {} for field in COUNTER_FIELDS})
+    return profile
+
+
+def apply_stats(profile: Dict[str, Any], stats: Dict[str, Any], sign: int = 1,
+                summarize: bool = True) -> Dict[str, Any]:
+    """Return a new profile with ``stats`` added (sign=1) or subtracted (sign=-1)."""
+    updated = {key: profile.get(key, 0) + sign * stats.get(key, 0)
+               for key in ("document_count", "word_count", "section_count", "confidence_weight")}
+    updated["confidence_weighted"] = round(profile.get("confidence_weighted", 0.0) +
+                                           sign * stats.get("confidence_weighted", 0.0), 6)
+    for field in COUNTER_FIELDS:
+        counter = Counter(profile.get(field, {}))
+        delta = Counter(stats.get(field, {}))
+        if sign > 0:
+            counter.update(delta)
+        else:
+            counter.subtract(delta)
+        updated[field] = {key: value for key, value in counter.items() if value > 0}
+    if summarize:
+        updated["summary"] = summarize_profile(updated)
+    return updated
+
+
+def summarize_profile(profile: Dict[str, Any]) -> Dict[str, Any]:
+    """Precompute the prompt header so queries only read it."""
+    def ranked(field: str) -> List[str]:
+        counts = profile.get(field, {})
+        return sorted(counts, key=counts.get, reverse=True)
+
+    indicator_hits: Dict[str, List[str]] = {}
+    for key in profile.get("domain_indicators", {}):
+        domain, indicator = key.split("::", 1)
+        indicator_hits.setdefault(domain, []).append(indicator)
+    file_types = ranked("file_types")
+    terms = profile.get("terms", {})
+    languages = ranked("language_words")
+    document_types = ranked("document_type_words") or [document_processor.DocumentType.GENERAL_DOCUMENT.value]
+    complexities = ranked("complexity_words") or [document_processor.ContentComplexity.SIMPLE.value]
+    return {
+        "file_type": file_types[0] if len(file_types) == 1 else ("mixed" if file_types else "unknown"),
+        "language_primary": languages[0] if languages else "English",
+        "languages_detected": languages,
+        "document_type": document_types[0],
+        "complexity_level": complexities[0],
+        "key_topics": [term for term in ranked("terms")[:10] if terms[term] > 1],
+        "entities": ranked("entities")[:20],
+        "knowledge_domains": document_processor.format_knowledge_domains(indicator_hits),
+        "confidence_score": (profile["confidence_weighted"] / profile["confidence_weight"]
+                             if profile.get("confidence_weight") else 0.7)
+    }
+
+
+def _document_stats(document: models.Document) -> Dict[str, Any]:
+    """Stats stored with the document, computing (and saving) them for rows ingested before profiles existed."""
+    record = document.analysis
+    if not record:
+        record = document_processor.analyze_stored_document(document.content or "", document.filename)
+    if "stats" not in record:
+        metadata = document_processor.metadata_from_record(record)
+        record = {**record, "stats": compute_document_stats(document.content or "", metadata, record["analysis"])}
+        document.analysis = record
+    return record["stats"]
+
+
+def rebuild_profile(db: Session, user_id: int) -> models.CorpusProfile:
+    profile = empty_profile()
+    documents = db.query(models.Document).filter(models.Document.user_id == user_id).all()
+    for document in documents:
+        profile = apply_stats(profile, _document_stats(document), summarize=False)
+    profile["summary"] = summarize_profile(profile)
+    row = db.query(models.CorpusProfile).filter(models.CorpusProfile.user_id == user_id).first()
+    if row is None:
+        row = models.CorpusProfile(user_id=user_id)
+    row.profile = profile
+    row.updated_at = datetime.utcnow()
+    db.add(row)
+    # Sessions do not autoflush, and a later lookup in this transaction must find the row.
+    db.flush()
+    logger.info(f"Rebuilt corpus profile for user {user_id} from {len(documents)} documents")
+    return row
+
+
+def _locked_profile(db: Session, user_id: int) -> models.CorpusProfile:
+    query = db.query(models.CorpusProfile).filter(models.CorpusProfile.user_id == user_id).with_for_update()
+    row = query.first()
+    if row is None:
+        # Concurrent first uploads for a user would both insert a profile; locking the user
+        # row makes the second wait and then find the first one's.
+        db.query(models.User.id).filter(models.User.id == user_id).with_for_update().one()
+        row = query.first()
+    return row if row is not None else rebuild_profile(db, user_id)
+
+
+def add_document_stats(db: Session, user_id: int, stats: Dict[str, Any]):
+    """Fold a new document's stats into the profile; call before the new document is added to the session."""
+    row = _locked_profile(db, user_id)
+    row.profile = apply_stats(row.profile, stats)
+    row.updated_at = datetime.utcnow()
+    db.add(row)
+
+
+def remove_document_stats(db: Session, user_id: int, document: models.Document):
+    """Subtract a document's stats; call while the document still exists, before the delete is committed.
+
+    A missing profile is rebuilt first, which still counts the document, so it is subtracted either way.
+    """
+    stats = _document_stats(document)
+    row = _locked_profile(db, user_id)
+    row.profile = apply_stats(row.profile, stats, sign=-1)
+    row.updated_at = datetime.utcnow()
+    db.add(row)
+
+
+def load_profile_view(db: Session, user_id: int) -> Tuple[Optional[document_processor.DocumentMetadata],
+                                                          Optional[Dict[str, Any]]]:
+    """User-level metadata/analysis for the prompt header, read straight from the stored summary."""
+    row = db.query(models.CorpusProfile).filter(models.CorpusProfile.user_id == user_id).first()
+    if row is None:
+        row = rebuild_profile(db, user_id)
+        db.commit()
+    profile = row.profile
+    if not profile.get("document_count"):
+        return None, None
+    summary = profile["summary"]
+    metadata = document_processor.DocumentMetadata(
+        file_type=summary["file_type"],
+        estimated_pages=max(1, profile["word_count"] // 250),
+        word_count=profile["word_count"],
+        language_primary=summary["language_primary"],
+        languages_detected=summary["languages_detected"],
+        document_type=document_processor.DocumentType(summary["document_type"]),
+        complexity_level=document_processor.ContentComplexity(summary["complexity_level"]),
+        key_topics=summary["key_topics"],
+        entities_detected=summary["entities"],
+        structure_analysis={},
+        confidence_score=summary["confidence_score"]
+    )
+    analysis = {
+        "knowledge_domains": summary["knowledge_domains"],
+        "content_structure": {"hierarchical_depth": profile["section_count"]}
+    }
+    return metadata, analysis
@@ -1,19 +1,23 @@
 import fitz
 import zipfile
 import xml.etree.ElementTree as ET
-from io import BytesIO
-from typing import Tuple, Dict, Any, List, Optional
+from typing import Tuple, Dict, Any, Iterable, Iterator, List, Optional, Union
 from google.cloud import storage
-import vertexai
-from vertexai.generative_models import GenerativeModel, GenerationConfig
 import re
 import json
 from datetime import datetime
 import hashlib
-from dataclasses import dataclass
+from dataclasses import dataclass, field
+from collections import Counter
 from enum import Enum
 import logging
-from app.core.config import INSTANCE_CONNECTION_NAME
+from app.core.config import INSTANCE_CONNECTION_NAME, CHUNK_MAX_CHARS
+from app.services.text_analyzer import analyze_text, KNOWLEDGE_DOMAIN_INDICATORS
+from app.services import pattern_registry, question_router
+from app.services.question_router import QuestionRoute, route_question
+from app.services.llm_client import get_llm_client
+from app.services.pdf_extraction import PdfPageResult, extract_pdf_pages
+from app.services.docx_extraction import extract_docx, extract_docx_sections
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 PROJECT_ID = INSTANCE_CONNECTION_NAME.split(':')[0]
@@ -59,6 +63,16 @@ class DocumentMetadata:
     structure_analysis: Dict[str, Any]
     confidence_score: float
 
+@dataclass
+class ExtractedSegment:
+    """A PDF page or a DOCX heading section: the unit that is fingerprinted, chunked and
+    reused when a new version of the document is uploaded."""
+    fingerprint: str
+    content: str
+    details: Dict[str, Any] = field(default_factory=dict)
+    reused: bool = False
+
+
 @dataclass
 class SemanticChunk:
     content: str
@@ -68,6 +82,27 @@ class SemanticChunk:
     entities: List[str]
     relationships: List[str]
     context_window: str
+
+
+@dataclass
+class RetrievedPassage:
+    content: str
+    source: str
+    score: float
+    document_id: Optional[int] = None
+    chunk_index: int = 0
+    importance_score: float = 0.5
+
+
+def passages_to_text(passages: List[RetrievedPassage]) -> str:
+    return "\n\n".join(passage.content for passage in passages)
+
+
+def format_passages_for_prompt(passages: List[RetrievedPassage]) -> str:
+    sections = []
+    for number, passage in enumerate(passages, start=1):
+        sections.append(f"[Excerpt {number} | Source: {passage.source}]\n{passage.content}")
+    return "\n\n".join(sections)
 def upload_file_to_gcs(file_contents: bytes, filename: str, content_type: str):
     if not storage_client:
         logger.error("Storage client not initialized")
@@ -87,7 +122,13 @@ def upload_file_to_gcs(file_contents: bytes, filename: str, content_type: str):
     except Exception as e:
         logger.error(f"Failed to upload to GCS: {e}")
         return False
-def upload_file_to_gcs_with_metadata(file_contents: bytes, filename: str, content_type: str,
+def content_storage_path(sha256: str, filename: str) -> str:
+    """GCS object name for content-addressed uploads; identical bytes share one object."""
+    extension = filename.rsplit('.', 1)[-1].lower() if '.' in filename else 'bin'
+    return f"content/{sha256[:2]}/{sha256}.{extension}"
+
+
+def upload_file_to_gcs_with_metadata(file_contents: Union[bytes, str], filename: str, content_type: str,
                                      metadata: DocumentMetadata):
     if not storage_client:
         logger.error("Storage client not initialized")
@@ -104,7 +145,10 @@ def upload_file_to_gcs_with_metadata(file_contents: bytes, filename: str, conten
             'processing_timestamp': datetime.now().isoformat()
         }
 
-        blob.upload_from_string(file_contents, content_type=content_type)
+        if isinstance(file_contents, str):
+            blob.upload_from_filename(file_contents, content_type=content_type)
+        else:
+            blob.upload_from_string(file_contents, content_type=content_type)
         logger.info(f"Successfully uploaded {filename} with metadata to GCS.")
         return True
     except Exception as e:
@@ -113,7 +157,7 @@ def upload_file_to_gcs_with_metadata(file_contents: bytes, filename: str, conten
 def extract_text_from_pdf(file_contents: bytes) -> str:
     if not file_contents:
         raise ValueError("No file contents provided")
-    text = ""
+    page_texts = []
     try:
         with fitz.open(stream=file_contents, filetype="pdf") as doc:
             if len(doc) == 0:
@@ -121,7 +165,7 @@ def extract_text_from_pdf(file_contents: bytes) -> str:
 
             for page_num, page in enumerate(doc):
                 if page_num > 0:
-                    text += f"\n\n--- Page {page_num + 1} ---\n\n"
+                    page_texts.append(f"\n\n--- Page {page_num + 1} ---\n\n")
                 page_text = page.get_text("text", sort=True)
                 if not page_text.strip():
                     continue
@@ -138,8 +182,8 @@ def extract_text_from_pdf(file_contents: bytes) -> str:
                     else:
                         processed_lines.append(cleaned_line)
 
-                text += '\n'.join(processed_lines)
-        result_text = text.strip()
+                page_texts.append('\n'.join(processed_lines))
+        result_text = ''.join(page_texts).strip()
         if not result_text:
             raise ValueError("No extractable text found in PDF")
         logger.info("Successfully extracted text from PDF with enhanced formatting.")
@@ -147,8 +191,38 @@ def extract_text_from_pdf(file_contents: bytes) -> str:
     except Exception as e:
         logger.error(f"Failed to extract text from PDF: {e}")
         raise ValueError(f"Could not parse the provided PDF file: {e}")
-def extract_text_from_pdf_advanced(file_contents: bytes) -> Tuple[str, DocumentMetadata]:
-    text = ""
+def pdf_page_segment(page: PdfPageResult) -> ExtractedSegment:
+    return ExtractedSegment(
+        fingerprint=page.fingerprint,
+        content=page.text,
+        details={"fonts": sorted(page.fonts), "non_latin": page.non_latin, "headers": page.headers,
+                 "has_table": page.has_table, "images": page.images},
+        reused=page.reused
+    )
+
+
+def pdf_page_from_segment(segment: ExtractedSegment) -> PdfPageResult:
+    details = segment.details or {}
+    return PdfPageResult(
+        text=segment.content,
+        fonts=set(details.get("fonts", [])),
+        non_latin=details.get("non_latin", False),
+        headers=list(details.get("headers", [])),
+        has_table=details.get("has_table", False),
+        images=details.get("images", 0),
+        fingerprint=segment.fingerprint,
+        reused=True
+    )
+
+
+def extract_text_from_pdf_advanced(file_contents: Union[bytes, str]) -> Tuple[str, DocumentMetadata]:
+    text, metadata, _ = extract_pdf_document(file_contents)
+    return text, metadata
+
+
+def extract_pdf_document(file_contents: Union[bytes, str], previous_segments: Optional[List[ExtractedSegment]] = None
+                         ) -> Tuple[str, DocumentMetadata, List[ExtractedSegment]]:
+    """Text, metadata and page segments; pages unchanged since ``previous_segments`` are not extracted again."""
     metadata_info = {
         "pages": 0,
         "images": 0,
@@ -159,43 +233,22 @@ def extract_text_from_pdf_advanced(file_contents: bytes) -> Tuple[str, DocumentM
     }
 
     try:
-        with fitz.open(stream=file_contents, filetype="pdf") as doc:
-            metadata_info["pages"] = len(doc)
-            for page_num, page in enumerate(doc):
-                text_dict = page.get_text("dict")
-                blocks = text_dict.get("blocks", [])
-                for block in blocks:
-                    if "lines" in block:
-                        for line in block["lines"]:
-                            for span in line.get("spans", []):
-                                font_info = f"{span.get('font', 'unknown')}_{span.get('size', 0)}"
-                                metadata_info["fonts"].add(font_info)
-                                text_content = span.get("text", "")
-                                if any(ord(char) > 127 for char in text_content):
-                                    metadata_info["languages"].add("non_latin")
-                page_text = page.get_text()
-                if page_num > 0:
-                    text += f"\n\n{'=' * 50}\n📄 PAGE {page_num + 1}\n{'=' * 50}\n\n"
-                lines = page_text.split('\n')
-                processed_lines = []
-                for i, line in enumerate(lines):
-                    cleaned_line = ' '.join(line.split())
-                    if not cleaned_line:
-                        continue
-                    if (len(cleaned_line) < 100 and
-                            cleaned_line.isupper() or
-                            (i < len(lines) - 1 and not lines[i + 1].strip())):
-                        processed_lines.append(f"\n## {cleaned_line}\n")
-                        metadata_info["structure_elements"].append(f"header:{cleaned_line}")
-                    else:
-                        processed_lines.append(cleaned_line)
-
-                text += '\n'.join(processed_lines)
-                if page.search_for("table") or page.search_for("Table"):
-                    metadata_info["tables"] += 1
-
-                image_list = page.get_images()
-                metadata_info["images"] += len(image_list)
+        known_pages = {segment.fingerprint: pdf_page_from_segment(segment) for segment in previous_segments or []}
+        pages = extract_pdf_pages(file_contents, known_pages)
+        metadata_info["pages"] = len(pages)
+        page_texts = []
+        for page_num, page in enumerate(pages):
+            if page_num > 0:
+                page_texts.append(f"\n\n{'=' * 50}\n📄 PAGE {page_num + 1}\n{'=' * 50}\n\n")
+            page_texts.append(page.text)
+            metadata_info["fonts"].update(page.fonts)
+            if page.non_latin:
+                metadata_info["languages"].add("non_latin")
+            metadata_info["structure_elements"].extend(page.headers)
+            if page.has_table:
+                metadata_info["tables"] += 1
+            metadata_info["images"] += page.images
+        text = ''.join(page_texts)
         word_count = len(text.split())
         primary_lang = detect_primary_language(text)
         doc_type = classify_document_type(text)
@@ -215,7 +268,7 @@ def extract_text_from_pdf_advanced(file_contents: bytes) -> Tuple[str, DocumentM
             structure_analysis=metadata_info,
             confidence_score=calculate_extraction_confidence(text, metadata_info)
         )
-        return text.strip(), metadata
+        return text.strip(), metadata, [pdf_page_segment(page) for page in pages]
     except Exception as e:
         logger.error(f"Advanced PDF extraction failed: {e}")
         raise ValueError(f"Could not parse the provided PDF file: {e}")
@@ -223,51 +276,11 @@ def extract_text_from_docx(file_contents: bytes) -> str:
     if not file_contents:
         raise ValueError("No file contents provided")
     try:
-        with zipfile.ZipFile(BytesIO(file_contents)) as docx:
-            if 'word/document.xml' not in docx.namelist():
-                raise ValueError("Invalid DOCX file: missing document.xml")
-
-            tree = ET.fromstring(docx.read('word/document.xml'))
-            namespace = {'w': 'http://schemas.openxmlformats.org/wordprocessingml/2006/main'}
-            text_elements = []
-            for paragraph in tree.findall('.//w:p', namespace):
-                para_text = ""
-                is_header = False
-                style_elem = paragraph.find('.//w:pStyle', namespace)
-                if style_elem is not None:
-                    style_val = style_elem.get(f'{{{namespace["w"]}}}val', '')
-                    if 'heading' in style_val.lower() or 'title' in style_val.lower():
-                        is_header = True
-                for run in paragraph.findall('.//w:r', namespace):
-                    for text_elem in run.findall('.//w:t', namespace):
-                        if text_elem.text:
-                            para_text += text_elem.text
-
-                if para_text.strip():
-                    if is_header:
-                        text_elements.append(f"\n## {para_text.strip()}\n")
-                    else:
-                        text_elements.append(para_text.strip())
-            tables = tree.findall('.//w:tbl', namespace)
-            for table in tables:
-                table_text = "\n### TABLE CONTENT ###\n"
-                for row in table.findall('.//w:tr', namespace):
-                    row_text = []
-                    for cell in row.findall('.//w:tc', namespace):
-                        cell_text = ""
-                        for para in cell.findall('.//w:p', namespace):
-                            for text_elem in para.findall('.//w:t', namespace):
-                                if text_elem.text:
-                                    cell_text += text_elem.text
-                        row_text.append(cell_text.strip())
-                    table_text += " | ".join(row_text) + "\n"
-                text_elements.append(table_text)
-
-            result_text = '\n\n'.join(text_elements)
-            if not result_text.strip():
-                raise ValueError("No text content found in DOCX")
-            logger.info("Successfully extracted text from DOCX with structure preservation.")
-            return result_text
+        result_text, _ = extract_docx(file_contents)
+        if not result_text.strip():
+            raise ValueError("No text content found in DOCX")
+        logger.info("Successfully extracted text from DOCX with structure preservation.")
+        return result_text
 
     except zipfile.BadZipFile:
         raise ValueError("Invalid DOCX file format")
@@ -278,83 +291,43 @@ def extract_text_from_docx(file_contents: bytes) -> str:
         raise ValueError(f"Could not parse the provided Word document: {e}")
 
 
-def extract_text_from_docx_advanced(file_contents: bytes) -> Tuple[str, DocumentMetadata]:
+def extract_text_from_docx_advanced(file_contents: Union[bytes, str]) -> Tuple[str, DocumentMetadata]:
+    text, metadata, _ = extract_docx_document(file_contents)
+    return text, metadata
+
+
+def extract_docx_document(file_contents: Union[bytes, str], previous_segments: Optional[List[ExtractedSegment]] = None
+                          ) -> Tuple[str, DocumentMetadata, List[ExtractedSegment]]:
+    """Text, metadata and heading sections; the whole file is parsed, which is cheap for DOCX."""
     try:
-        with zipfile.ZipFile(BytesIO(file_contents), 'r') as docx_zip:
-            document_xml = docx_zip.read('word/document.xml')
-            try:
-                styles_xml = docx_zip.read('word/styles.xml')
-                styles_root = ET.fromstring(styles_xml)
-            except:
-                styles_root = None
-            root = ET.fromstring(document_xml)
-            namespace = {'w': 'http://schemas.openxmlformats.org/wordprocessingml/2006/main'}
-
-            text_elements = []
-            structure_info = {
-                "paragraphs": 0,
-                "tables": 0,
-                "headers": 0,
-                "lists": 0
-            }
-            for paragraph in root.findall('.//w:p', namespace):
-                para_text = ""
-                is_header = False
-                style_elem = paragraph.find('.//w:pStyle', namespace)
-                if style_elem is not None:
-                    style_val = style_elem.get(f'{{{namespace["w"]}}}val', '')
-                    if 'heading' in style_val.lower() or 'title' in style_val.lower():
-                        is_header = True
-                        structure_info["headers"] += 1
-                for run in paragraph.findall('.//w:r', namespace):
-                    for text_elem in run.findall('.//w:t', namespace):
-                        if text_elem.text:
-                            para_text += text_elem.text
-
-                if para_text.strip():
-                    if is_header:
-                        text_elements.append(f"\n## {para_text.strip()}\n")
-                    else:
-                        text_elements.append(para_text.strip())
-                    structure_info["paragraphs"] += 1
-            tables = root.findall('.//w:tbl', namespace)
-            structure_info["tables"] = len(tables)
-            for table in tables:
-                table_text = "\n### TABLE CONTENT ###\n"
-                for row in table.findall('.//w:tr', namespace):
-                    row_text = []
-                    for cell in row.findall('.//w:tc', namespace):
-                        cell_text = ""
-                        for para in cell.findall('.//w:p', namespace):
-                            for text_elem in para.findall('.//w:t', namespace):
-                                if text_elem.text:
-                                    cell_text += text_elem.text
-                        row_text.append(cell_text.strip())
-                    table_text += " | ".join(row_text) + "\n"
-                text_elements.append(table_text)
-
-            extracted_text = '\n\n'.join(text_elements)
-            word_count = len(extracted_text.split())
-            primary_lang = detect_primary_language(extracted_text)
-            doc_type = classify_document_type(extracted_text)
-            complexity = assess_content_complexity(extracted_text)
-            topics = extract_key_topics(extracted_text)
-            entities = extract_named_entities(extracted_text)
-
-            metadata = DocumentMetadata(
-                file_type="docx",
-                estimated_pages=max(1, word_count // 250),
-                word_count=word_count,
-                language_primary=primary_lang,
-                languages_detected=[primary_lang],
-                document_type=doc_type,
-                complexity_level=complexity,
-                key_topics=topics,
-                entities_detected=entities,
-                structure_analysis=structure_info,
-                confidence_score=calculate_extraction_confidence(extracted_text, structure_info)
-            )
-            return extracted_text, metadata
+        sections, structure_info = extract_docx_sections(file_contents)
+        extracted_text = '\n\n'.join(sections)
+        word_count = len(extracted_text.split())
+        primary_lang = detect_primary_language(extracted_text)
+        doc_type = classify_document_type(extracted_text)
+        complexity = assess_content_complexity(extracted_text)
+        topics = extract_key_topics(extracted_text)
+        entities = extract_named_entities(extracted_text)
+
+        metadata = DocumentMetadata(
+            file_type="docx",
+            estimated_pages=max(1, word_count // 250),
+            word_count=word_count,
+            language_primary=primary_lang,
+            languages_detected=[primary_lang],
+            document_type=doc_type,
+            complexity_level=complexity,
+            key_topics=topics,
+            entities_detected=entities,
+            structure_analysis=structure_info,
+            confidence_score=calculate_extraction_confidence(extracted_text, structure_info)
+        )
+        known = {segment.fingerprint for segment in previous_segments or []}
+        segments = []
+        for section in sections:
+            fingerprint = hashlib.sha256(section.encode()).hexdigest()
+            segments.append(ExtractedSegment(fingerprint=fingerprint, content=section, reused=fingerprint in known))
+        return extracted_text, metadata, segments
     except Exception as e:
         logger.error(f"Advanced DOCX extraction failed: {e}")
         raise ValueError(f"Could not parse the provided Word document: {e}")
@@ -375,19 +348,31 @@ def determine_file_type_and_extract(file_contents: bytes, filename: str) -> str:
         return extract_text_from_docx(file_contents)
     else:
         raise ValueError("Unsupported file format. Please upload PDF or DOCX files only.")
-def determine_file_type_and_extract_advanced(file_contents: bytes, filename: str) -> Tuple[
-    str, DocumentMetadata, Dict[str, Any]]:
+def extract_text_and_metadata(file_contents: Union[bytes, str], filename: str) -> Tuple[str, DocumentMetadata]:
+    """Extract from upload bytes or from the path of a spooled upload."""
+    text, metadata, _ = extract_document_segments(file_contents, filename)
+    return text, metadata
+
+
+def extract_document_segments(file_contents: Union[bytes, str], filename: str,
+                              previous_segments: Optional[List[ExtractedSegment]] = None
+                              ) -> Tuple[str, DocumentMetadata, List[ExtractedSegment]]:
+    """Like ``extract_text_and_metadata``, also returning the segments and reusing those of an earlier version."""
     filename_lower = filename.lower()
+    if filename_lower.endswith('.pdf'):
+        return extract_pdf_document(file_contents, previous_segments)
+    elif filename_lower.endswith('.docx'):
+        return extract_docx_document(file_contents, previous_segments)
+    elif filename_lower.endswith('.doc'):
+        raise ValueError("Legacy .doc files require conversion to .docx format for optimal processing.")
+    else:
+        raise ValueError("Unsupported file format. Please upload PDF or DOCX files.")
+
 
+def determine_file_type_and_extract_advanced(file_contents: bytes, filename: str) -> Tuple[
+    str, DocumentMetadata, Dict[str, Any]]:
     try:
-        if filename_lower.endswith('.pdf'):
-            text, metadata = extract_text_from_pdf_advanced(file_contents)
-        elif filename_lower.endswith('.docx'):
-            text, metadata = extract_text_from_docx_advanced(file_contents)
-        elif filename_lower.endswith('.doc'):
-            raise ValueError("Legacy .doc files require conversion to .docx format for optimal processing.")
-        else:
-            raise ValueError("Unsupported file format. Please upload PDF or DOCX files.")
+        text, metadata = extract_text_and_metadata(file_contents, filename)
         analysis = perform_comprehensive_document_analysis(text, metadata)
         return text, metadata, analysis
     except Exception as e:
@@ -396,63 +381,34 @@ def determine_file_type_and_extract_advanced(file_contents: bytes, filename: str
 def detect_primary_language(text: str) -> str:
     if not text:
         return "English"
-    text_sample = text[:1000].lower()
-    hindi_indicators = ['के', 'का', 'की', 'में', 'से', 'को', 'और', 'है', 'हैं', 'आवास', 'दर']
-    spanish_indicators = ['el', 'la', 'los', 'las', 'de', 'en', 'y', 'que', 'para', 'con']
-    french_indicators = ['le', 'la', 'les', 'de', 'et', 'en', 'un', 'une', 'pour', 'avec']
-    german_indicators = ['der', 'die', 'das', 'und', 'in', 'zu', 'den', 'von', 'mit', 'für']
-    hindi_count = sum(1 for word in hindi_indicators if word in text_sample)
-    spanish_count = sum(1 for word in spanish_indicators if word in text_sample)
-    french_count = sum(1 for word in french_indicators if word in text_sample)
-    german_count = sum(1 for word in german_indicators if word in text_sample)
-    if hindi_count > 2:
+    scores = analyze_text(text).language_scores
+    if scores["Hindi/Hinglish"] > 2:
         return "Hindi/Hinglish"
-    elif spanish_count > 3:
+    elif scores["Spanish"] > 3:
         return "Spanish"
-    elif french_count > 3:
+    elif scores["French"] > 3:
         return "French"
-    elif german_count > 3:
+    elif scores["German"] > 3:
         return "German"
     else:
         return "English"
 def classify_document_type(text: str) -> DocumentType:
-    text_lower = text.lower()
-    academic_terms = ['abstract', 'methodology', 'literature review', 'hypothesis', 'conclusion', 'references',
-                      'citation']
-    legal_terms = ['whereas', 'party', 'agreement', 'contract', 'terms and conditions', 'liability', 'jurisdiction']
-    financial_terms = ['revenue', 'profit', 'loss', 'balance sheet', 'cash flow', 'assets', 'liabilities', 'equity']
-    technical_terms = ['procedure', 'specification', 'installation', 'configuration', 'troubleshooting', 'manual']
-    policy_terms = ['policy', 'guideline', 'procedure', 'compliance', 'regulation', 'requirement', 'entitlement']
-    medical_terms = ['patient', 'diagnosis', 'treatment', 'medication', 'symptoms', 'medical history', 'prescription']
-    scores = {
-        DocumentType.ACADEMIC_PAPER: sum(1 for term in academic_terms if term in text_lower),
-        DocumentType.LEGAL_CONTRACT: sum(1 for term in legal_terms if term in text_lower),
-        DocumentType.FINANCIAL_REPORT: sum(1 for term in financial_terms if term in text_lower),
-        DocumentType.TECHNICAL_MANUAL: sum(1 for term in technical_terms if term in text_lower),
-        DocumentType.POLICY_DOCUMENT: sum(1 for term in policy_terms if term in text_lower),
-        DocumentType.MEDICAL_RECORD: sum(1 for term in medical_terms if term in text_lower)
-    }
-    max_score = max(scores.values())
-    if max_score >= 2:
-        return max(scores, key=scores.get)
+    scores = analyze_text(text).document_type_scores
+    best_type = max(scores, key=scores.get)
+    if scores[best_type] >= 2:
+        return DocumentType(best_type)
     else:
         return DocumentType.GENERAL_DOCUMENT
 def assess_content_complexity(text: str) -> ContentComplexity:
-    sentences = text.split('.')
-    avg_sentence_length = sum(len(s.split()) for s in sentences) / len(sentences) if sentences else 0
-    technical_terms = ['algorithm', 'methodology', 'implementation', 'specification', 'configuration',
-                       'optimization', 'analysis', 'framework', 'architecture', 'infrastructure']
-    specialized_terms = ['pursuant', 'heretofore', 'notwithstanding', 'aforementioned', 'whereby',
-                         'coefficient', 'derivative', 'integral', 'hypothesis', 'paradigm']
-    technical_count = sum(1 for term in technical_terms if term.lower() in text.lower())
-    specialized_count = sum(1 for term in specialized_terms if term.lower() in text.lower())
+    text_analysis = analyze_text(text)
+    avg_sentence_length = text_analysis.avg_sentence_length
     complexity_score = 0
     if avg_sentence_length > 25:
         complexity_score += 2
     elif avg_sentence_length > 20:
         complexity_score += 1
-    complexity_score += min(technical_count // 5, 2)
-    complexity_score += min(specialized_count // 3, 3)
+    complexity_score += min(text_analysis.technical_count // 5, 2)
+    complexity_score += min(text_analysis.specialized_count // 3, 3)
     if complexity_score >= 6:
         return ContentComplexity.SPECIALIZED
     elif complexity_score >= 4:
@@ -463,54 +419,29 @@ def assess_content_complexity(text: str) -> ContentComplexity:
         return ContentComplexity.MODERATE
     else:
         return ContentComplexity.SIMPLE
+TOPIC_STOP_WORDS = {'that', 'this', 'with', 'from', 'they', 'been', 'have', 'were', 'said', 'each', 'which', 'their',
+                    'time', 'will', 'about', 'would', 'there', 'could', 'other', 'more', 'very', 'what', 'know',
+                    'just', 'first', 'into', 'over', 'think', 'also', 'your', 'work', 'life', 'only', 'can', 'still',
+                    'should', 'after', 'being', 'now', 'made', 'before', 'here', 'through', 'when', 'where', 'much',
+                    'some', 'these', 'many', 'then', 'them', 'well', 'were'}
+
+
+def count_topic_terms(text: str) -> Counter:
+    words = re.findall(r'\b[a-zA-Z]{4,}\b', text.lower())
+    return Counter(word for word in words if word not in TOPIC_STOP_WORDS and len(word) > 4)
+
+
 def extract_key_topics(text: str) -> List[str]:
     if not text:
         return []
-    words = re.findall(r'\b[a-zA-Z]{4,}\b', text.lower())
-    stop_words = {'that', 'this', 'with', 'from', 'they', 'been', 'have', 'were', 'said', 'each', 'which', 'their',
-                  'time', 'will', 'about', 'would', 'there', 'could', 'other', 'more', 'very', 'what', 'know', 'just',
-                  'first', 'into', 'over', 'think', 'also', 'your', 'work', 'life', 'only', 'can', 'still', 'should',
-                  'after', 'being', 'now', 'made', 'before', 'here', 'through', 'when', 'where', 'much', 'some',
-                  'these', 'many', 'then', 'them', 'well', 'were'}
-    filtered_words = [word for word in words if word not in stop_words and len(word) > 4]
-    word_freq = {}
-    for word in filtered_words:
-        word_freq[word] = word_freq.get(word, 0) + 1
-    sorted_words = sorted(word_freq.items(), key=lambda x: x[1], reverse=True)
+    sorted_words = sorted(count_topic_terms(text).items(), key=lambda x: x[1], reverse=True)
     return [word for word, freq in sorted_words[:10] if freq > 1]
 
 
 def extract_named_entities(text: str) -> List[str]:
     if not text:
         return []
-    entities = []
-    date_patterns = [
-        r'\b\d{1,2}[-/]\d{1,2}[-/]\d{2,4}\b',
-        r'\b\d{4}[-/]\d{1,2}[-/]\d{1,2}\b',
-        r'\b(?:Jan|Feb|Mar|Apr|May|Jun|Jul|Aug|Sep|Oct|Nov|Dec)[a-z]* \d{1,2},? \d{4}\b'
-    ]
-
-    for pattern in date_patterns:
-        matches = re.findall(pattern, text, re.IGNORECASE)
-        entities.extend([f"DATE:{match}" for match in matches[:5]]) 
-    money_patterns = [
-        r'\$\d+(?:,\d{3})*(?:\.\d{2})?',
-        r'₹\d+(?:,\d{3})*(?:\.\d{2})?',
-        r'\b\d+(?:,\d{3})*(?:\.\d{2})?\s*(?:USD|INR|EUR|GBP)\b'
-    ]
-
-    for pattern in money_patterns:
-        matches = re.findall(pattern, text, re.IGNORECASE)
-        entities.extend([f"MONEY:{match}" for match in matches[:5]])
-    org_patterns = [
-        r'\b[A-Z][a-z]+ (?:Inc|Corp|LLC|Ltd|Company|Corporation|Limited)\b',
-        r'\b[A-Z]{2,}\b' 
-    ]
-
-    for pattern in org_patterns:
-        matches = re.findall(pattern, text)
-        entities.extend([f"ORG:{match}" for match in matches[:5]])
-
+    entities = [f"{match.label}:{match.value}" for match in pattern_registry.scan("entities", text)]
     return list(set(entities))[:20]
 def calculate_extraction_confidence(text: str, structure_info: Dict) -> float:
     confidence = 0.5
@@ -556,26 +487,11 @@ def analyze_document_structure(context: str) -> Dict[str, Any]:
         "entities": []
     }
 
-    context_lower = context.lower()
-    table_indicators = ["rate", "cost", "zone", "tier", "level", "grade", "$", "₹", "allowance",
-                        "amount", "price", "fee", "charge", "expense", "budget"]
-    policy_indicators = ["policy", "procedure", "guideline", "rule", "entitlement", "shall",
-                         "must", "required", "mandatory", "compliance", "regulation"]
-    location_indicators = ["zone", "region", "city", "country", "state", "province",
-                           "new york", "delhi", "london", "mumbai", "bangalore", "chennai"]
-    hindi_indicators = ['के लिए', 'में', 'क्या', 'है', 'दर', 'और', 'का', 'की', 'से', 'पर']
-    if any(indicator in context_lower for indicator in table_indicators):
-        analysis["has_tables"] = True
-
-    if any(indicator in context_lower for indicator in policy_indicators):
-        analysis["has_policies"] = True
-
-    if any(indicator in context_lower for indicator in location_indicators):
-        analysis["has_locations"] = True
-
-    if any(indicator in context for indicator in hindi_indicators):
-        analysis["is_multilingual"] = True
-        analysis["primary_language"] = "Hindi/Hinglish"
+    text_analysis = analyze_text(context)
+    analysis["has_tables"] = text_analysis.has("tables")
+    analysis["has_policies"] = text_analysis.has("policies")
+    analysis["has_locations"] = text_analysis.has("locations")
+    analysis["is_multilingual"] = text_analysis.has("hindi")
     analysis["primary_language"] = detect_primary_language(context)
     analysis["document_type"] = classify_document_type(context).value
     analysis["key_topics"] = extract_key_topics(context)
@@ -670,67 +586,44 @@ def perform_semantic_analysis(text: str) -> Dict[str, Any]:
     semantic_info["semantic_density"] = len(concept_candidates) / len(sentences) if sentences else 0
 
     return semantic_info
-def identify_knowledge_domains(text: str) -> List[str]:
-    domains = []
-    text_lower = text.lower()
-
-    domain_indicators = {
-        "Human Resources": ["hr", "employee", "salary", "benefits", "leave", "performance", "recruitment"],
-        "Finance": ["budget", "cost", "revenue", "profit", "expense", "financial", "accounting"],
-        "Legal": ["contract", "agreement", "legal", "compliance", "regulation", "law", "terms"],
-        "Technology": ["system", "software", "hardware", "network", "database", "application", "technical"],
-        "Healthcare": ["medical", "health", "patient", "treatment", "diagnosis", "clinical", "healthcare"],
-        "Travel": ["travel", "trip", "accommodation", "transport", "per diem", "allowance", "lodging"],
-        "Operations": ["process", "procedure", "workflow", "operation", "management", "quality", "standard"],
-        "Research": ["research", "study", "analysis", "methodology", "findings", "data", "results"]
-    }
+def find_domain_indicator_hits(text: str) -> Dict[str, List[str]]:
+    return analyze_text(text).domain_hits
+
 
-    for domain, indicators in domain_indicators.items():
-        score = sum(1 for indicator in indicators if indicator in text_lower)
+def format_knowledge_domains(indicator_hits: Dict[str, List[str]]) -> List[str]:
+    domains = []
+    for domain in KNOWLEDGE_DOMAIN_INDICATORS:
+        score = len(indicator_hits.get(domain, []))
         if score >= 2:
             domains.append(f"{domain} (confidence: {score})")
-
     return domains
 
-def find_cross_references(text: str) -> List[Dict[str, str]]:
-    references = []
-    ref_patterns = [
-        r'(?:see|refer to|as per|according to)\s+(?:section|chapter|table|figure|appendix)\s+(\w+)',
-        r'(?:section|chapter|table|figure|appendix)\s+(\w+)\s+(?:shows|indicates|describes)',
-        r'(?:above|below|following|preceding)\s+(?:section|table|figure)'
-    ]
-
-    for pattern in ref_patterns:
-        matches = re.finditer(pattern, text, re.IGNORECASE)
-        for match in matches:
-            references.append({
-                "reference_text": match.group(0),
-                "target": match.group(1) if match.groups() else "unspecified",
-                "context": text[max(0, match.start() - 50):match.end() + 50]
-            })
 
-    return references
+def identify_knowledge_domains(text: str) -> List[str]:
+    return format_knowledge_domains(find_domain_indicator_hits(text))
+
+def find_cross_references(text: str) -> List[Dict[str, str]]:
+    return [{
+        "reference_text": match.value,
+        "target": match.groups[0] if match.groups else "unspecified",
+        "context": text[max(0, match.start - 50):match.end + 50]
+    } for match in pattern_registry.scan("cross_references", text)]
 
 
 def identify_data_patterns(text: str) -> List[Dict[str, Any]]:
     patterns = []
-    rate_pattern = r'(\w+(?:\s+\w+)*)\s*[:\-]\s*(?:₹|Rs\.?|\$|USD|INR)?\s*(\d+(?:,\d{3})*(?:\.\d{2})?)'
-    rate_matches = re.finditer(rate_pattern, text, re.IGNORECASE)
-
-    for match in rate_matches:
+    for match in pattern_registry.scan("rates", text):
         patterns.append({
-            "type": "rate_pricing",
-            "item": match.group(1).strip(),
-            "value": match.group(2),
-            "context": text[max(0, match.start() - 30):match.end() + 30]
+            "type": match.label,
+            "item": match.groups[0].strip(),
+            "value": match.groups[1],
+            "context": text[max(0, match.start - 30):match.end + 30]
         })
-    grade_pattern = r'(L\d+|Level\s+\d+|Grade\s+\d+|Tier\s+\d+)'
-    grade_matches = re.finditer(grade_pattern, text, re.IGNORECASE)
-    for match in grade_matches:
+    for match in pattern_registry.scan("grades", text):
         patterns.append({
-            "type": "grade_level",
-            "value": match.group(1),
-            "context": text[max(0, match.start() - 30):match.end() + 30]
+            "type": match.label,
+            "value": match.groups[0],
+            "context": text[max(0, match.start - 30):match.end + 30]
         })
 
     return patterns
@@ -743,26 +636,8 @@ def map_contextual_relationships(text: str) -> Dict[str, List[str]]:
         "temporal": [],
         "hierarchical": []
     }
-    conditional_patterns = [
-        r'if\s+(.+?)\s+then\s+(.+?)(?:\.|,)',
-        r'provided\s+that\s+(.+?)(?:\.|,)',
-        r'subject\s+to\s+(.+?)(?:\.|,)'
-    ]
-
-    for pattern in conditional_patterns:
-        matches = re.finditer(pattern, text, re.IGNORECASE | re.DOTALL)
-        for match in matches:
-            relationships["conditional"].append(match.group(0))
-    causal_patterns = [
-        r'because\s+(.+?)(?:\.|,)',
-        r'due\s+to\s+(.+?)(?:\.|,)',
-        r'as\s+a\s+result\s+of\s+(.+?)(?:\.|,)'
-    ]
-
-    for pattern in causal_patterns:
-        matches = re.finditer(pattern, text, re.IGNORECASE)
-        for match in matches:
-            relationships["causal"].append(match.group(0))
+    for name in ("conditional", "causal"):
+        relationships[name] = [match.value for match in pattern_registry.scan(name, text)]
 
     return relationships
 
@@ -867,35 +742,26 @@ What aspect of business travel would you like to explore today? I'm here to help
 
 
 def is_off_topic_request(question_lower: str) -> bool:
-    off_topic_keywords = [
-        'program', 'code', 'function', 'algorithm', 'script', 'software',
-        'python', 'java', 'javascript', 'write', 'create', 'develop',
-        'weather', 'news', 'sports', 'cooking', 'recipe', 'movie',
-        'music', 'game', 'joke', 'story', 'math', 'calculate','c++','c','typescript','sql','nosql'
-    ]
-
-    travel_keywords = ['travel', 'trip', 'flight', 'hotel', 'accommodation', 'per diem', 'allowance', 'policy',
-                       'booking']
-
-    has_off_topic = any(keyword in question_lower for keyword in off_topic_keywords)
-    has_travel = any(keyword in question_lower for keyword in travel_keywords)
-
-    return has_off_topic and not has_travel
+    return question_router.is_off_topic(question_lower)
 
 
 def is_vague_question(question_lower: str) -> bool:
-    vague_patterns = [
-        'help', 'what can you do', 'tell me', 'explain', 'info', 'information',
-        'about', 'details', 'more', 'anything', 'everything'
-    ]
+    return question_router.is_vague(question_lower)
+
 
-    return (len(question_lower.split()) < 4 or
-            any(pattern == question_lower for pattern in vague_patterns) or
-            question_lower in ['what', 'how', 'why', 'when', 'where'])
+def generate_routed_response(route: QuestionRoute, question: str) -> Optional[str]:
+    """Canned reply for greeting/off-topic/vague questions; None when the question needs the documents."""
+    if route is QuestionRoute.GREETING:
+        return generate_friendly_greeting_response()
+    if route is QuestionRoute.OFF_TOPIC:
+        return generate_off_topic_friendly_response(question)
+    if route is QuestionRoute.VAGUE:
+        return generate_vague_question_response()
+    return None
 
 
-def create_dynamic_ultra_prompt_with_personality(question: str, context: str, metadata: DocumentMetadata,
-                                                 analysis: Dict[str, Any]) -> str:
+def create_dynamic_ultra_prompt_with_personality(question: str, passages: List[RetrievedPassage],
+                                                 metadata: DocumentMetadata, analysis: Dict[str, Any]) -> str:
 
     doc_type = metadata.document_type.value
     complexity = metadata.complexity_level.value
@@ -978,8 +844,8 @@ APAC: Singapore/HK/Tokyo → Zone 1 | Regional hubs → Zone 2
 - **Logical Extrapolation**: Extend policies to unstated but implied scenarios
 - **Cross-Reference Resolution**: Link related information across document structure
 
-**📊 DOCUMENT KNOWLEDGE BASE:**
-{context}
+**📊 DOCUMENT KNOWLEDGE BASE (most relevant excerpts, ranked by relevance):**
+{format_passages_for_prompt(passages)}
 
 **🎯 USER QUERY:**
 "{question}"
@@ -1075,42 +941,91 @@ Execute with the precision of a specialist, the breadth of a generalist, the ins
     return prompt
 
 
-def generate_ultra_advanced_answer_with_personality(question: str, context: str, metadata: DocumentMetadata,
-                                                    analysis: Dict[str, Any]) -> str:
+def generate_ultra_advanced_answer_with_personality(question: str, passages: List[RetrievedPassage],
+                                                    metadata: DocumentMetadata, analysis: Dict[str, Any]) -> str:
     try:
-        vertexai.init(project=PROJECT_ID, location=LOCATION)
-        model = GenerativeModel("gemini-2.0-flash-lite-001")
-        prompt = create_dynamic_ultra_prompt_with_personality(question, context, metadata, analysis)
-
-        generation_config = GenerationConfig(
+        prompt = create_dynamic_ultra_prompt_with_personality(question, passages, metadata, analysis)
+        response_text = get_llm_client().generate(
+            prompt,
             candidate_count=1,
             max_output_tokens=4096,
             temperature=0.5,
             top_p=0.8,
             top_k=40
         )
-
-        response = model.generate_content(prompt, generation_config=generation_config)
-        return add_friendly_touches(response.text)
+        return add_friendly_touches(response_text)
     except Exception as e:
         logger.error(f"Error in personality-enhanced answer generation: {e}")
-        return generate_friendly_fallback_response(question, context, metadata)
+        return generate_friendly_fallback_response(question, passages_to_text(passages), metadata)
+
+
+ENTHUSIASTIC_STARTERS = ['great', 'excellent', 'perfect', 'wonderful', 'fantastic', 'i\'d be happy', 'absolutely',
+                         'sure thing']
+HELPFUL_ENDINGS = ['help', 'questions', 'assist', 'anything else', 'clarification', 'more information']
+FRIENDLY_PREFIX = "Great question! "
+FRIENDLY_SUFFIX = "\n\n💡 **Need anything else?** I'm here to help with any other travel policy questions you might have!"
+STARTER_PROBE_CHARS = max(len(starter) for starter in ENTHUSIASTIC_STARTERS)
+
+
+def friendly_prefix(response_start: str) -> str:
+    if not any(response_start.lower().startswith(starter) for starter in ENTHUSIASTIC_STARTERS):
+        return FRIENDLY_PREFIX
+    return ""
+
+
+def friendly_suffix(response: str) -> str:
+    if not any(ending in response.lower() for ending in HELPFUL_ENDINGS):
+        return FRIENDLY_SUFFIX
+    return ""
 
 
 def add_friendly_touches(response: str) -> str:
-    enthusiastic_starters = ['great', 'excellent', 'perfect', 'wonderful', 'fantastic', 'i\'d be happy', 'absolutely',
-                             'sure thing']
-    if not any(response.lower().startswith(starter) for starter in enthusiastic_starters):
-        response = f"Great question! {response}"
-    helpful_endings = ['help', 'questions', 'assist', 'anything else', 'clarification', 'more information']
-    if not any(ending in response.lower() for ending in helpful_endings):
-        response += f"\n\n💡 **Need anything else?** I'm here to help with any other travel policy questions you might have!"
-    return response
+    response = friendly_prefix(response) + response
+    return response + friendly_suffix(response)
+
+
+def stream_friendly_touches(chunks: Iterable[str]) -> Iterator[str]:
+    """``add_friendly_touches`` for a stream: the joined output equals ``add_friendly_touches(''.join(chunks))``.
+
+    Only the first few characters are held back, until it is known whether the prefix is needed.
+    """
+    pending = ""
+    started = False
+    parts: List[str] = []
+    for chunk in chunks:
+        if started:
+            parts.append(chunk)
+            yield chunk
+            continue
+        pending += chunk
+        if len(pending) >= STARTER_PROBE_CHARS:
+            started = True
+            prefixed = friendly_prefix(pending) + pending
+            parts.append(prefixed)
+            yield prefixed
+    if not started:
+        prefixed = friendly_prefix(pending) + pending
+        parts.append(prefixed)
+        yield prefixed
+    suffix = friendly_suffix(''.join(parts))
+    if suffix:
+        yield suffix
+
+
+FALLBACK_RESPONSE_HEADER = "🔧 **Oops! Let me help you anyway!**"
+STREAM_INTERRUPTED_NOTE = "\n\n⚠️ The answer was cut short by a technical issue. Please try asking again."
+GENERIC_ERROR_RESPONSE = "Sorry, I encountered an error while processing your question. Please try again later."
+
+
+def is_fallback_response(answer: str) -> bool:
+    """True for the error/fallback texts, which must not be cached as answers."""
+    return (FALLBACK_RESPONSE_HEADER in answer[:200] or answer.endswith(STREAM_INTERRUPTED_NOTE)
+            or answer == GENERIC_ERROR_RESPONSE)
 
 
 def generate_friendly_fallback_response(question: str, context: str, metadata: DocumentMetadata) -> str:
     return f"""
-🔧 **Oops! Let me help you anyway!**
+{FALLBACK_RESPONSE_HEADER}
 
 Hi there! 😊 I encountered a small technical hiccup while processing your question with my advanced analysis system, but don't worry - I can still provide you with helpful information!
 
@@ -1132,39 +1047,29 @@ Even with this minor technical issue, I can assist you with travel policy questi
 """
 
 
-def generate_contextual_friendly_response(question: str, context: str, metadata: DocumentMetadata,
-                                          analysis: Dict[str, Any]) -> str:
+def generate_contextual_friendly_response(question: str, passages: List[RetrievedPassage],
+                                          metadata: DocumentMetadata, analysis: Dict[str, Any]) -> str:
 
-    question_lower = question.lower().strip()
-    if question_lower in ['hi', 'hello', 'hey', 'good morning', 'good afternoon', 'good evening']:
-        return generate_friendly_greeting_response()
-    if is_off_topic_request(question_lower):
-        return generate_off_topic_friendly_response(question)
-    if is_vague_question(question_lower):
-        return generate_vague_question_response()
-    return generate_ultra_advanced_answer_with_personality(question, context, metadata, analysis)
-def generate_answer_with_rag(question: str, context: str) -> str:
+    routed_response = generate_routed_response(route_question(question), question)
+    if routed_response is not None:
+        return routed_response
+    return generate_ultra_advanced_answer_with_personality(question, passages, metadata, analysis)
+def generate_answer_with_rag(question: str, passages: List[RetrievedPassage]) -> str:
     """
     Enhanced RAG function that combines the original structure with advanced features.
     """
     if not question or not question.strip():
         return "Please provide a valid question."
 
+    routed_response = generate_routed_response(route_question(question), question)
+    if routed_response is not None:
+        return routed_response
+
+    context = passages_to_text(passages)
     if not context or not context.strip():
         return "No document context available. Please upload a document first."
 
     try:
-        question_lower = question.lower().strip()
-        if question_lower in ['hi', 'hello', 'hey', 'good morning', 'good afternoon']:
-            return generate_friendly_greeting_response()
-
-        if is_off_topic_request(question_lower):
-            return generate_off_topic_friendly_response(question)
-
-        if is_vague_question(question_lower):
-            return generate_vague_question_response()
-        vertexai.init(project=PROJECT_ID, location=LOCATION)
-        model = GenerativeModel("gemini-2.0-flash-lite-001")
         doc_analysis = analyze_document_structure(context)
         prompt = f"""
 **ROLE:** You are an elite Knowledge Analyst AI with a friendly, helpful personality. Your purpose is to provide precise, intelligent answers by deeply analyzing the provided document and expertly understanding the user's question.
@@ -1206,9 +1111,8 @@ def generate_answer_with_rag(question: str, context: str) -> str:
 5. **HONESTY:** If the answer cannot be found in the document, respond with: "Based on the provided documents, I could not find a definitive answer to this question."
 
 ---
-**DOCUMENT CONTEXT:**
-{context}
-text
+**DOCUMENT CONTEXT (most relevant excerpts, ranked by relevance):**
+{format_passages_for_prompt(passages)}
 ---
 
 **USER'S QUESTION:**
@@ -1217,17 +1121,16 @@ text
 **YOUR FRIENDLY, EXPERT RESPONSE:**
 """
 
-        generation_config = GenerationConfig(
+        response_text = get_llm_client().generate(
+            prompt,
             temperature=0.3,
             max_output_tokens=2048,
             top_p=0.8,
             top_k=40
         )
 
-        response = model.generate_content(prompt, generation_config=generation_config)
-
-        if response and response.text:
-            result = response.text.strip()
+        if response_text:
+            result = response_text.strip()
             if not any(ending in result.lower() for ending in ['help', 'questions', 'assist', 'anything else']):
                 result += f"\n\n💡 **Need anything else?** I'm here to help with any other questions you might have!"
 
@@ -1237,61 +1140,175 @@ text
 
     except Exception as e:
         logger.error(f"Error generating answer from Vertex AI: {e}")
-        return "Sorry, I encountered an error while processing your question. Please try again later."
+        return GENERIC_ERROR_RESPONSE
+
+def analyze_passage_context(context: str, filename: Optional[str] = None) -> Tuple[DocumentMetadata, Dict[str, Any]]:
+    """Analyse the retrieved context itself, for callers without stored document analysis."""
+    metadata = DocumentMetadata(
+        file_type=filename.split('.')[-1].lower() if filename else "unknown",
+        estimated_pages=max(1, len(context.split()) // 250),
+        word_count=len(context.split()),
+        language_primary=detect_primary_language(context),
+        languages_detected=[detect_primary_language(context)],
+        document_type=classify_document_type(context),
+        complexity_level=assess_content_complexity(context),
+        key_topics=extract_key_topics(context),
+        entities_detected=extract_named_entities(context),
+        structure_analysis={},
+        confidence_score=0.8 if filename else 0.7
+    )
+    return metadata, perform_comprehensive_document_analysis(context, metadata)
+
+
+def stream_answer_with_ultra_rag(question: str, passages: List[RetrievedPassage], filename: str = None,
+                                 metadata: Optional[DocumentMetadata] = None,
+                                 analysis: Optional[Dict[str, Any]] = None) -> Iterator[str]:
+    """Streaming counterpart of ``generate_answer_with_ultra_rag``; yields answer text as it is generated."""
+    routed_response = generate_routed_response(route_question(question), question)
+    if routed_response is not None:
+        yield routed_response
+        return
+    context = passages_to_text(passages)
+    streamed_any = False
+    try:
+        if metadata is None or analysis is None:
+            metadata, analysis = analyze_passage_context(context, filename)
+        prompt = create_dynamic_ultra_prompt_with_personality(question, passages, metadata, analysis)
+        chunks = get_llm_client().stream(
+            prompt,
+            candidate_count=1,
+            max_output_tokens=4096,
+            temperature=0.5,
+            top_p=0.8,
+            top_k=40
+        )
+        for chunk in stream_friendly_touches(chunks):
+            streamed_any = True
+            yield chunk
+    except Exception as e:
+        logger.error(f"Streaming answer generation failed: {e}")
+        if streamed_any:
+            yield STREAM_INTERRUPTED_NOTE
+        elif metadata is not None:
+            yield generate_friendly_fallback_response(question, context, metadata)
+        else:
+            yield GENERIC_ERROR_RESPONSE
+
 
-def generate_answer_with_ultra_rag(question: str, context: str, filename: str = None) -> str:
+def generate_answer_with_ultra_rag(question: str, passages: List[RetrievedPassage], filename: str = None,
+                                   metadata: Optional[DocumentMetadata] = None,
+                                   analysis: Optional[Dict[str, Any]] = None) -> str:
     """
     Main function for ultra-advanced RAG processing with friendly personality.
+
+    Callers holding the analysis stored at ingestion pass ``metadata``/``analysis`` to skip re-analysis.
     """
+    routed_response = generate_routed_response(route_question(question), question)
+    if routed_response is not None:
+        return routed_response
+    context = passages_to_text(passages)
     try:
-        if filename:
-            metadata = DocumentMetadata(
-                file_type=filename.split('.')[-1].lower(),
-                estimated_pages=max(1, len(context.split()) // 250),
-                word_count=len(context.split()),
-                language_primary=detect_primary_language(context),
-                languages_detected=[detect_primary_language(context)],
-                document_type=classify_document_type(context),
-                complexity_level=assess_content_complexity(context),
-                key_topics=extract_key_topics(context),
-                entities_detected=extract_named_entities(context),
-                structure_analysis={},
-                confidence_score=0.8
-            )
-        else:
-            metadata = DocumentMetadata(
-                file_type="unknown",
-                estimated_pages=max(1, len(context.split()) // 250),
-                word_count=len(context.split()),
-                language_primary=detect_primary_language(context),
-                languages_detected=[detect_primary_language(context)],
-                document_type=classify_document_type(context),
-                complexity_level=assess_content_complexity(context),
-                key_topics=extract_key_topics(context),
-                entities_detected=extract_named_entities(context),
-                structure_analysis={},
-                confidence_score=0.7
-            )
-        analysis = perform_comprehensive_document_analysis(context, metadata)
-        return generate_contextual_friendly_response(question, context, metadata, analysis)
+        if metadata is not None and analysis is not None:
+            return generate_contextual_friendly_response(question, passages, metadata, analysis)
+        metadata, analysis = analyze_passage_context(context, filename)
+        return generate_contextual_friendly_response(question, passages, metadata, analysis)
 
     except Exception as e:
         logger.error(f"Ultra RAG processing failed: {e}")
         return generate_friendly_fallback_response(question, context, metadata if 'metadata' in locals() else None)
-def create_semantic_chunks(text: str, metadata: DocumentMetadata) -> List[SemanticChunk]:
+ANALYSIS_LIST_CAP = 25
+
+
+def to_json_safe(value: Any) -> Any:
+    if isinstance(value, Enum):
+        return value.value
+    if hasattr(value, '__dataclass_fields__'):
+        return to_json_safe(value.__dict__)
+    if isinstance(value, dict):
+        return {str(key): to_json_safe(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [to_json_safe(item) for item in value]
+    if isinstance(value, (set, frozenset)):
+        return sorted((to_json_safe(item) for item in value), key=str)
+    return value
+
+
+def cap_lists(value: Any, limit: int = ANALYSIS_LIST_CAP) -> Any:
+    if isinstance(value, dict):
+        return {key: cap_lists(item, limit) for key, item in value.items()}
+    if isinstance(value, list):
+        return [cap_lists(item, limit) for item in value[:limit]]
+    return value
+
+
+def build_document_analysis_record(metadata: DocumentMetadata, analysis: Dict[str, Any]) -> Dict[str, Any]:
+    """JSON-safe record of the ingestion-time analysis, stored on the document row."""
+    return {
+        "metadata": cap_lists(to_json_safe(metadata)),
+        "analysis": cap_lists(to_json_safe({key: value for key, value in analysis.items()
+                                            if key != "document_metadata"})),
+        "processing_timestamp": datetime.utcnow().isoformat()
+    }
+
+
+def metadata_from_record(record: Dict[str, Any]) -> DocumentMetadata:
+    data = record["metadata"]
+    return DocumentMetadata(
+        file_type=data.get("file_type", "unknown"),
+        estimated_pages=data.get("estimated_pages", 1),
+        word_count=data.get("word_count", 0),
+        language_primary=data.get("language_primary", "English"),
+        languages_detected=data.get("languages_detected", []),
+        document_type=DocumentType(data.get("document_type", DocumentType.GENERAL_DOCUMENT.value)),
+        complexity_level=ContentComplexity(data.get("complexity_level", ContentComplexity.SIMPLE.value)),
+        key_topics=data.get("key_topics", []),
+        entities_detected=data.get("entities_detected", []),
+        structure_analysis=data.get("structure_analysis", {}),
+        confidence_score=data.get("confidence_score", 0.7)
+    )
+
+
+def analyze_stored_document(text: str, filename: Optional[str]) -> Dict[str, Any]:
+    """Analysis record for documents ingested before analysis was persisted."""
+    word_count = len(text.split())
+    primary_lang = detect_primary_language(text)
+    metadata = DocumentMetadata(
+        file_type=filename.split('.')[-1].lower() if filename else "unknown",
+        estimated_pages=max(1, word_count // 250),
+        word_count=word_count,
+        language_primary=primary_lang,
+        languages_detected=[primary_lang],
+        document_type=classify_document_type(text),
+        complexity_level=assess_content_complexity(text),
+        key_topics=extract_key_topics(text),
+        entities_detected=extract_named_entities(text),
+        structure_analysis={},
+        confidence_score=0.8 if filename else 0.7
+    )
+    return build_document_analysis_record(metadata, perform_comprehensive_document_analysis(text, metadata))
+
+
+def create_semantic_chunks(text: str, metadata: Optional[DocumentMetadata],
+                           max_chars: int = CHUNK_MAX_CHARS) -> List[SemanticChunk]:
     chunks = []
     sections = re.split(r'\n#{1,6}\s+', text)
-    for i, section in enumerate(sections):
+    pieces = []
+    for section in sections:
         if len(section.strip()) < 50:
             continue
+        windows = split_section_into_windows(section.strip(), max_chars)
+        chunk_type = "section" if len(windows) == 1 else "section_part"
+        pieces.extend((window, chunk_type) for window in windows)
+    piece_texts = [piece for piece, _ in pieces]
+    for i, (piece, chunk_type) in enumerate(pieces):
         chunk = SemanticChunk(
-            content=section.strip(),
-            chunk_type="section",
-            importance_score=calculate_chunk_importance(section, metadata),
-            topic_tags=extract_chunk_topics(section),
-            entities=extract_named_entities(section),
-            relationships=find_chunk_relationships(section),
-            context_window=get_context_window(sections, i)
+            content=piece,
+            chunk_type=chunk_type,
+            importance_score=calculate_chunk_importance(piece, metadata),
+            topic_tags=extract_chunk_topics(piece),
+            entities=extract_named_entities(piece),
+            relationships=find_chunk_relationships(piece),
+            context_window=get_context_window(piece_texts, i)
         )
 
         chunks.append(chunk)
@@ -1299,11 +1316,41 @@ def create_semantic_chunks(text: str, metadata: DocumentMetadata) -> List[Semant
     return chunks
 
 
-def calculate_chunk_importance(chunk: str, metadata: DocumentMetadata) -> float:
+def split_section_into_windows(section: str, max_chars: int) -> List[str]:
+    if len(section) <= max_chars:
+        return [section]
+    windows = []
+    current = []
+    current_len = 0
+    for paragraph in re.split(r'\n\s*\n|\n', section):
+        paragraph = paragraph.strip()
+        if not paragraph:
+            continue
+        while len(paragraph) > max_chars:
+            cut = paragraph.rfind(' ', 0, max_chars)
+            if cut <= 0:
+                cut = max_chars
+            if current:
+                windows.append('\n'.join(current))
+                current, current_len = [], 0
+            windows.append(paragraph[:cut].strip())
+            paragraph = paragraph[cut:].strip()
+        if current and current_len + len(paragraph) + 1 > max_chars:
+            windows.append('\n'.join(current))
+            current, current_len = [], 0
+        if paragraph:
+            current.append(paragraph)
+            current_len += len(paragraph) + 1
+    if current:
+        windows.append('\n'.join(current))
+    return windows
+
+
+def calculate_chunk_importance(chunk: str, metadata: Optional[DocumentMetadata]) -> float:
     score = 0.5
     if len(chunk) > 500:
         score += 0.2
-    important_keywords = metadata.key_topics
+    important_keywords = metadata.key_topics if metadata else []
     for keyword in important_keywords:
         if keyword.lower() in chunk.lower():
             score += 0.1
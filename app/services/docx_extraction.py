@@ -0,0 +1,176 @@
+import zipfile
+import xml.etree.ElementTree as ET
+from dataclasses import dataclass, field
+from io import BytesIO, StringIO
+from typing import Dict, IO, Iterator, List, Optional, Tuple, Union
+
+from app.core.config import DOCX_MAX_UNCOMPRESSED_BYTES, DOCX_MAX_COMPRESSION_RATIO
+
+W_NAMESPACE = 'http://schemas.openxmlformats.org/wordprocessingml/2006/main'
+W = f'{{{W_NAMESPACE}}}'
+DOCUMENT_XML = 'word/document.xml'
+TABLE_HEADER = "\n### TABLE CONTENT ###\n"
+# Small parts may compress extremely well (a run of empty table cells); the ratio only counts above this.
+RATIO_CHECK_MIN_BYTES = 1024 * 1024
+
+
+@dataclass
+class DocxParagraph:
+    text: str
+    is_header: bool = False
+
+
+@dataclass
+class DocxTable:
+    rows: List[List[str]] = field(default_factory=list)
+
+
+@dataclass
+class _ParagraphState:
+    texts: List[str] = field(default_factory=list)
+    is_header: bool = False
+    is_list_item: bool = False
+
+
+@dataclass
+class _TableState:
+    table: DocxTable = field(default_factory=DocxTable)
+    row: Optional[List[str]] = None
+    cell: Optional[List[str]] = None
+
+
+def new_structure_info() -> Dict[str, int]:
+    return {"paragraphs": 0, "tables": 0, "headers": 0, "lists": 0}
+
+
+def iter_docx_blocks(document_xml: IO[bytes],
+                     structure_info: Optional[Dict[str, int]] = None) -> Iterator[Union[DocxParagraph, DocxTable]]:
+    """Stream the body of ``word/document.xml`` as paragraphs and tables, in document order.
+
+    Every element is detached from its parent as soon as its end tag has been handled, so
+    memory stays bounded by the nesting depth and the largest single table rather than by
+    the document size. Paragraphs inside table cells become cell text only, text boxes
+    are folded into the paragraph that anchors them, and the rows of a nested table are
+    emitted in place inside the outermost table. ``structure_info`` is filled in the same
+    pass.
+    """
+    if structure_info is None:
+        structure_info = new_structure_info()
+    elements: List[ET.Element] = []
+    paragraphs: List[_ParagraphState] = []
+    tables: List[_TableState] = []
+
+    for event, element in ET.iterparse(document_xml, events=("start", "end")):
+        tag = element.tag
+        if event == "start":
+            elements.append(element)
+            if tag == f'{W}p':
+                paragraphs.append(_ParagraphState())
+            elif tag == f'{W}tbl':
+                tables.append(_TableState())
+                structure_info["tables"] += 1
+            elif tag == f'{W}tr' and tables:
+                tables[-1].row = []
+            elif tag == f'{W}tc' and tables:
+                tables[-1].cell = []
+            continue
+
+        elements.pop()
+        if tag == f'{W}t' and paragraphs and element.text:
+            paragraphs[-1].texts.append(element.text)
+        elif tag == f'{W}pStyle' and paragraphs:
+            style_val = element.get(f'{W}val', '').lower()
+            if 'heading' in style_val or 'title' in style_val:
+                paragraphs[-1].is_header = True
+        elif tag == f'{W}numPr' and paragraphs:
+            paragraphs[-1].is_list_item = True
+        elif tag == f'{W}p' and paragraphs:
+            paragraph = paragraphs.pop()
+            text = ''.join(paragraph.texts).strip()
+            if paragraph.is_header:
+                structure_info["headers"] += 1
+            if paragraphs:
+                # A text box paragraph: its text belongs to the anchoring paragraph.
+                if text:
+                    paragraphs[-1].texts.append(' ' + text)
+            elif text:
+                structure_info["paragraphs"] += 1
+                if paragraph.is_list_item:
+                    structure_info["lists"] += 1
+                if tables and tables[-1].cell is not None:
+                    tables[-1].cell.append(text)
+                else:
+                    yield DocxParagraph(text=text, is_header=paragraph.is_header)
+        elif tag == f'{W}tc' and tables:
+            state = tables[-1]
+            if state.row is not None and state.cell is not None:
+                state.row.append(' '.join(state.cell))
+            state.cell = None
+        elif tag == f'{W}tr' and tables:
+            state = tables[-1]
+            if state.row is not None:
+                state.table.rows.append(state.row)
+            state.row = None
+        elif tag == f'{W}tbl' and tables:
+            finished = tables.pop()
+            if tables:
+                tables[-1].table.rows.extend(finished.table.rows)
+            else:
+                yield finished.table
+        if elements:
+            elements[-1].remove(element)
+
+
+def format_docx_block(block: Union[DocxParagraph, DocxTable]) -> str:
+    if isinstance(block, DocxTable):
+        return TABLE_HEADER + ''.join(" | ".join(row) + "\n" for row in block.rows)
+    if block.is_header:
+        return f"\n## {block.text}\n"
+    return block.text
+
+
+def check_member_size(info: zipfile.ZipInfo):
+    """Refuse a zip member that would inflate to more than the configured size or ratio.
+
+    The declared size is enough to go by: ``zipfile`` never inflates a member past it and
+    fails the CRC check of one that claims less than it holds.
+    """
+    if info.file_size > DOCX_MAX_UNCOMPRESSED_BYTES:
+        raise ValueError(f"{info.filename} would inflate to {info.file_size} bytes, more than the "
+                         f"{DOCX_MAX_UNCOMPRESSED_BYTES} allowed")
+    if info.file_size > RATIO_CHECK_MIN_BYTES and info.file_size > info.compress_size * DOCX_MAX_COMPRESSION_RATIO:
+        raise ValueError(f"{info.filename} is compressed more than {DOCX_MAX_COMPRESSION_RATIO:g} to 1, "
+                         f"which only a zip bomb does")
+
+
+def extract_docx_sections(source: Union[bytes, str]) -> Tuple[List[str], Dict[str, int]]:
+    """The document's text split before every heading, and its ``structure_info`` counters.
+
+    Joining the sections with blank lines gives exactly the text of ``extract_docx``.
+    Raises ``zipfile.BadZipFile``, ``ET.ParseError`` or ``ValueError`` (missing or
+    oversized document.xml) for the caller to turn into user-facing errors.
+    """
+    structure_info = new_structure_info()
+    sections: List[str] = []
+    with zipfile.ZipFile(source if isinstance(source, str) else BytesIO(source)) as docx:
+        if DOCUMENT_XML not in docx.namelist():
+            raise ValueError("Invalid DOCX file: missing document.xml")
+        check_member_size(docx.getinfo(DOCUMENT_XML))
+        section = StringIO()
+        with docx.open(DOCUMENT_XML) as document_xml:
+            for block in iter_docx_blocks(document_xml, structure_info):
+                if isinstance(block, DocxParagraph) and block.is_header and section.tell():
+                    sections.append(section.getvalue())
+                    section = StringIO()
+                if section.tell():
+                    section.write('\n\n')
+                section.write(format_docx_block(block))
+        if section.tell() or not sections:
+            sections.append(section.getvalue())
+    return sections, structure_info
+
+
+def extract_docx(source: Union[bytes, str]) -> Tuple[str, Dict[str, int]]:
+    """Extracted text and ``structure_info`` counters for DOCX bytes or a DOCX file path."""
+    sections, structure_info = extract_docx_sections(source)
+    return '\n\n'.join(sections), structure_info
@@ -0,0 +1,140 @@
+import os
+import signal
+import logging
+import multiprocessing
+import time
+from typing import Any, Callable
+
+from app.core.config import EXTRACTION_TIMEOUT_SECONDS, EXTRACTION_MAX_RSS_BYTES
+from app.services import pdf_extraction
+
+logger = logging.getLogger(__name__)
+
+POLL_SECONDS = 0.1
+EXIT_GRACE_SECONDS = 1.0
+PAGE_SIZE = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+# Children are forked from a server that has already imported the extraction code, so a
+# sandbox starts in milliseconds instead of paying the imports again for every document.
+# The server finds the modules through the working directory, as gunicorn does.
+PRELOAD_MODULES = ["app.services.ingestion"]
+
+_context = multiprocessing.get_context("forkserver")
+_context.set_forkserver_preload(PRELOAD_MODULES)
+
+
+class ExtractionLimitExceeded(ValueError):
+    def __init__(self, message: str, limit: str):
+        super().__init__(message)
+        self.limit = limit
+
+
+def start_server():
+    """Start the fork server ahead of the first document, so its imports are not on that job's clock."""
+    from multiprocessing import forkserver
+    forkserver.ensure_running()
+
+
+def _sandbox_main(conn, fn: Callable, args: tuple):
+    # A process group of its own, so a kill also reaches any pool the extraction starts.
+    os.setpgrp()
+    pdf_extraction.use_forked_pool()
+    try:
+        result = ("ok", fn(*args))
+    except BaseException as e:
+        result = ("error", e)
+    try:
+        conn.send(result)
+    except Exception as e:
+        conn.send(("error", RuntimeError(f"Extraction result could not be returned: {e}")))
+    conn.close()
+
+
+def _process_memory_bytes(pid: str, rss_pages: int) -> int:
+    """Proportional set size where the kernel reports it, so pages shared after a fork count once."""
+    try:
+        with open(f"/proc/{pid}/smaps_rollup", "rb") as rollup:
+            for line in rollup:
+                if line.startswith(b"Pss:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    return rss_pages * PAGE_SIZE
+
+
+def _group_memory_bytes(pgid: int) -> int:
+    """Resident memory of every process in a process group, read from ``/proc``; 0 where there is none."""
+    total = 0
+    try:
+        entries = os.listdir("/proc")
+    except OSError:
+        return 0
+    for entry in entries:
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry}/stat", "rb") as stat_file:
+                stat = stat_file.read()
+        except OSError:
+            continue
+        # The fields after the command name, which may itself contain spaces and parentheses.
+        fields = stat[stat.rfind(b")") + 2:].split()
+        if len(fields) > 21 and int(fields[2]) == pgid:
+            total += _process_memory_bytes(entry, int(fields[21]))
+    return total
+
+
+def _stop(process: multiprocessing.process.BaseProcess, grace_seconds: float):
+    """Let the child exit within the grace period, then kill it together with everything it started."""
+    process.join(grace_seconds)
+    if process.exitcode is not None:
+        return
+    try:
+        os.killpg(process.pid, signal.SIGKILL)
+    except (ProcessLookupError, PermissionError):
+        # Not in its own group yet.
+        process.kill()
+    process.join()
+
+
+def run(fn: Callable, *args: Any, timeout_seconds: float = EXTRACTION_TIMEOUT_SECONDS,
+        max_rss_bytes: int = EXTRACTION_MAX_RSS_BYTES) -> Any:
+    """Run ``fn(*args)`` in a child process that is killed if it outlives or outgrows its limits.
+
+    The deadline is wall-clock time and the memory limit is the resident memory of the
+    child and everything it starts (counting pages they share once), checked every
+    ``POLL_SECONDS``. Hitting either raises
+    ``ExtractionLimitExceeded``; an exception raised by ``fn`` is raised here as it is.
+    """
+    receiver, sender = _context.Pipe(duplex=False)
+    process = _context.Process(target=_sandbox_main, args=(sender, fn, args), name="extraction-sandbox")
+    # Returns once the child is forked, which the first time waits for the server's imports.
+    process.start()
+    started = time.monotonic()
+    sender.close()
+    grace_seconds = 0.0
+    try:
+        while not receiver.poll(POLL_SECONDS):
+            elapsed = time.monotonic() - started
+            if elapsed > timeout_seconds:
+                logger.warning(f"Extraction sandbox {process.pid} killed after {elapsed:.1f}s")
+                raise ExtractionLimitExceeded(f"Processing the document took longer than {timeout_seconds:g} "
+                                              f"seconds", limit="timeout")
+            resident = _group_memory_bytes(process.pid)
+            if resident > max_rss_bytes:
+                logger.warning(f"Extraction sandbox {process.pid} killed at {resident / (1024 * 1024):.0f}MB resident")
+                raise ExtractionLimitExceeded(f"Processing the document needed more than "
+                                              f"{max_rss_bytes / (1024 * 1024):g}MB of memory", limit="memory")
+        try:
+            status, value = receiver.recv()
+            grace_seconds = EXIT_GRACE_SECONDS
+        except EOFError:
+            process.join()
+            logger.warning(f"Extraction sandbox {process.pid} died with exit code {process.exitcode}")
+            raise ExtractionLimitExceeded("The document could not be processed: the extractor crashed",
+                                          limit="crash")
+    finally:
+        receiver.close()
+        _stop(process, grace_seconds)
+    if status == "error":
+        raise value
+    return value
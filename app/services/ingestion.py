@@ -0,0 +1,535 @@
+import os
+import socket
+import hashlib
+import threading
+import time
+import uuid
+import logging
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from datetime import datetime, timedelta
+from enum import Enum
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from sqlalchemy import func, or_
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from app.db import models
+from app.core.config import (INGESTION_PROCESS_WORKERS, INGESTION_POLL_SECONDS, INGESTION_STALE_SECONDS,
+                             INGESTION_MAX_ATTEMPTS, INGESTION_CONCURRENT_JOBS)
+from app.services import (answer_cache, corpus_profile, document_processor, extraction_sandbox, retrieval,
+                          upload_intake, upload_sessions)
+
+logger = logging.getLogger(__name__)
+
+STAGES = ("extraction", "storage", "analysis", "indexing")
+
+
+class JobStatus(str, Enum):
+    QUEUED = "queued"
+    RUNNING = "running"
+    SUCCEEDED = "succeeded"
+    FAILED = "failed"
+
+
+class StageStatus(str, Enum):
+    PENDING = "pending"
+    RUNNING = "running"
+    DONE = "done"
+    FAILED = "failed"
+
+
+def extract_document(file_contents: bytes, filename: str,
+                     previous_segments: Optional[List[document_processor.ExtractedSegment]] = None
+                     ) -> Tuple[str, document_processor.DocumentMetadata, List[document_processor.ExtractedSegment]]:
+    """Extraction stage; runs in an ingestion worker process.
+
+    With the segments of an earlier version, PDF pages whose fingerprint is unchanged
+    are taken from them instead of being extracted again.
+    """
+    return document_processor.extract_document_segments(file_contents, filename, previous_segments)
+
+
+def analyze_document(text: str, metadata: document_processor.DocumentMetadata) -> Tuple[str, Dict[str, Any]]:
+    """Analysis stage; runs in an ingestion worker process.
+
+    Returns the preprocessed text to store and the analysis record, including the
+    mergeable corpus statistics, ready to be written to the document row.
+    """
+    analysis = document_processor.perform_comprehensive_document_analysis(text, metadata)
+    processed_text = document_processor.preprocess_text(text)
+    analysis_record = document_processor.build_document_analysis_record(metadata, analysis)
+    analysis_record["stats"] = corpus_profile.compute_document_stats(processed_text, metadata, analysis)
+    return processed_text, analysis_record
+
+
+def enqueue_upload(db: Session, user: models.User, upload: upload_intake.SpooledUpload,
+                   batch_id: Optional[str] = None) -> models.IngestionJob:
+    """Add a spooled upload to the job queue; the caller commits, then calls ``notify``.
+
+    The job only records where the spool file is, so it can only be run by a process on
+    this host. Jobs of a bulk upload share a ``batch_id`` and count against the bulk quota.
+    """
+    job = models.IngestionJob(
+        id=uuid.uuid4().hex,
+        user_id=user.id,
+        filename=upload.filename,
+        content_type=upload.content_type,
+        file_size=upload.size,
+        content_sha256=upload.sha256,
+        spool_path=upload.path,
+        spool_host=socket.gethostname(),
+        batch_id=batch_id,
+        status=JobStatus.QUEUED.value,
+        stages={stage: {"status": StageStatus.PENDING.value} for stage in STAGES}
+    )
+    db.add(job)
+    return job
+
+
+class IngestionWorker:
+    """Claims queued ingestion jobs from the database and runs them.
+
+    Every API process runs ``concurrency`` worker threads, each working on one job at a
+    time. Jobs are claimed with ``SELECT ... FOR UPDATE SKIP LOCKED``, so a job is
+    processed by exactly one thread, and only by a process on the host whose spool
+    directory holds the upload. The CPU-heavy extraction and analysis stages are sent to
+    a process pool shared by the threads, so they do not hold the GIL of the process
+    serving requests and several jobs (say, of a bulk upload) are extracted at once. Jobs
+    left ``running`` by a crashed process are picked up again once they have not been
+    updated for ``INGESTION_STALE_SECONDS``; jobs whose host is gone by then are failed,
+    since their file went with it.
+    """
+
+    def __init__(self, session_factory: Callable[[], Session], process_workers: int = INGESTION_PROCESS_WORKERS,
+                 poll_seconds: float = INGESTION_POLL_SECONDS, concurrency: int = INGESTION_CONCURRENT_JOBS):
+        self.session_factory = session_factory
+        self.process_workers = process_workers
+        self.poll_seconds = poll_seconds
+        self.concurrency = max(1, concurrency)
+        self.host = socket.gethostname()
+        self.name = f"{self.host}:{os.getpid()}"
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._pool_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._stopping = threading.Event()
+        self._threads: List[threading.Thread] = []
+        self._stats_lock = threading.Lock()
+        self.stats = {"claimed": 0, "succeeded": 0, "failed": 0, "requeued": 0, "orphaned": 0, "pool_restarts": 0,
+                      "sessions_expired": 0, "dedup_hits": 0, "dedup_misses": 0, "dedup_bytes_saved": 0,
+                      "versions_replaced": 0, "versions_unchanged": 0, "chunks_reused": 0,
+                      "sandbox_timeout": 0, "sandbox_memory": 0, "sandbox_crash": 0}
+
+    def start(self):
+        if self.process_workers > 0:
+            extraction_sandbox.start_server()
+        for index in range(self.concurrency):
+            thread = threading.Thread(target=self._run, name=f"ingestion-worker-{index}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        logger.info(f"Started ingestion worker {self.name} with {self.concurrency} threads and "
+                    f"{self.process_workers} extraction processes")
+
+    def stop(self, timeout: float = 10):
+        self._stopping.set()
+        self._wakeup.set()
+        deadline = time.monotonic() + timeout
+        for thread in self._threads:
+            thread.join(max(0.0, deadline - time.monotonic()))
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+
+    def notify(self):
+        self._wakeup.set()
+
+    def _count(self, counter: str, delta: int = 1):
+        with self._stats_lock:
+            self.stats[counter] += delta
+
+    def _run(self):
+        while not self._stopping.is_set():
+            try:
+                job_id = self._claim_next()
+            except Exception as e:
+                logger.error(f"Could not claim ingestion job: {e}")
+                job_id = None
+            if job_id is None:
+                self._wakeup.wait(self.poll_seconds)
+                self._wakeup.clear()
+                continue
+            self._process(job_id)
+
+    def _claim_next(self) -> Optional[str]:
+        db = self.session_factory()
+        try:
+            self._requeue_stale(db)
+            self._count("sessions_expired", upload_sessions.expire_sessions(db, self.host))
+            job = db.query(models.IngestionJob) \
+                .filter(models.IngestionJob.status == JobStatus.QUEUED.value,
+                        or_(models.IngestionJob.spool_host == self.host, models.IngestionJob.spool_host.is_(None))) \
+                .order_by(models.IngestionJob.created_at) \
+                .with_for_update(skip_locked=True) \
+                .first()
+            if job is None:
+                db.commit()
+                return None
+            job.status = JobStatus.RUNNING.value
+            job.attempts = (job.attempts or 0) + 1
+            job.updated_at = datetime.utcnow()
+            db.commit()
+            self._count("claimed")
+            return job.id
+        finally:
+            db.close()
+
+    def _requeue_stale(self, db: Session):
+        cutoff = datetime.utcnow() - timedelta(seconds=INGESTION_STALE_SECONDS)
+        stale = db.query(models.IngestionJob) \
+            .filter(models.IngestionJob.status.in_([JobStatus.QUEUED.value, JobStatus.RUNNING.value]),
+                    models.IngestionJob.updated_at < cutoff) \
+            .with_for_update(skip_locked=True) \
+            .all()
+        for job in stale:
+            if job.spool_host is not None and job.spool_host != self.host:
+                self._fail(db, job, "The upload was lost before it could be processed. Please upload the file again.")
+                self._count("orphaned")
+            elif job.status == JobStatus.QUEUED.value:
+                continue
+            elif (job.attempts or 0) >= INGESTION_MAX_ATTEMPTS:
+                self._fail(db, job, "Document processing did not finish after several attempts")
+            else:
+                job.status = JobStatus.QUEUED.value
+                self._count("requeued")
+            logger.warning(f"Ingestion job {job.id} was stale after {job.attempts} attempts")
+        if stale:
+            db.commit()
+
+    def _run_stage_in_process(self, fn: Callable, *args: Any) -> Any:
+        if self.process_workers <= 0:
+            return fn(*args)
+        with self._pool_lock:
+            if self._pool is None:
+                self._pool = ProcessPoolExecutor(max_workers=self.process_workers,
+                                                 mp_context=multiprocessing.get_context("spawn"))
+            pool = self._pool
+        try:
+            return pool.submit(fn, *args).result()
+        except BrokenProcessPool:
+            with self._pool_lock:
+                # Another thread may already have replaced the broken pool.
+                if self._pool is pool:
+                    pool.shutdown(wait=False, cancel_futures=True)
+                    self._pool = None
+                    self._count("pool_restarts")
+            raise
+
+    def _run_stage_in_sandbox(self, fn: Callable, *args: Any) -> Any:
+        """Like ``_run_stage_in_process``, but in a fresh process that is killed past its deadline or memory limit.
+
+        Extraction runs here: a malformed PDF or a zip bomb then fails its own job instead of
+        tying up a pool process, and everything it allocated goes with the process.
+        """
+        if self.process_workers <= 0:
+            return fn(*args)
+        try:
+            return extraction_sandbox.run(fn, *args)
+        except extraction_sandbox.ExtractionLimitExceeded as e:
+            self._count(f"sandbox_{e.limit}")
+            raise
+
+    def _set_stage(self, db: Session, job: models.IngestionJob, stage: str, stage_status: StageStatus,
+                   **details: Any):
+        now = datetime.utcnow()
+        stages = {name: dict(info) for name, info in (job.stages or {}).items()}
+        info = stages.setdefault(stage, {})
+        info["status"] = stage_status.value
+        if stage_status == StageStatus.RUNNING:
+            info["started_at"] = now.isoformat()
+        else:
+            info["finished_at"] = now.isoformat()
+            if "started_at" in info:
+                started = datetime.fromisoformat(info["started_at"])
+                info["duration_ms"] = round((now - started).total_seconds() * 1000, 1)
+        info.update(details)
+        job.stages = stages
+        job.stage = stage
+        job.updated_at = now
+        db.commit()
+
+    def _release_upload(self, job: models.IngestionJob):
+        job.payload = None
+        if job.spool_host == self.host:
+            upload_intake.discard_spool_file(job.spool_path)
+
+    def _fail(self, db: Session, job: models.IngestionJob, message: str):
+        if job.stage and (job.stages or {}).get(job.stage, {}).get("status") == StageStatus.RUNNING.value:
+            self._set_stage(db, job, job.stage, StageStatus.FAILED)
+        job.status = JobStatus.FAILED.value
+        job.error = message
+        self._release_upload(job)
+        job.finished_at = datetime.utcnow()
+        # Failed uploads do not use up the daily allowance, as before uploads were queued.
+        user = db.get(models.User, job.user_id)
+        if user is not None and job.batch_id is not None:
+            if user.bulk_upload_count:
+                user.bulk_upload_count -= 1
+        elif user is not None and user.pdf_upload_count:
+            user.pdf_upload_count -= 1
+        self._count("failed")
+
+    def _process(self, job_id: str):
+        db = self.session_factory()
+        extraction: Optional[models.ExtractedContent] = None
+        try:
+            job = db.get(models.IngestionJob, job_id)
+            logger.info(f"Processing ingestion job {job.id}: {job.filename} ({job.file_size} bytes)")
+            if not job.content_sha256 and job.payload is not None:
+                # Queued before uploads were hashed on the way in.
+                job.content_sha256 = hashlib.sha256(job.payload).hexdigest()
+                db.commit()
+            previous = self._previous_version(db, job)
+            if previous is not None and job.content_sha256 and previous.content_sha256 == job.content_sha256:
+                self._finish_unchanged(db, job, previous)
+                return
+            stored = db.get(models.ExtractedContent, job.content_sha256) if job.content_sha256 else None
+            segments = None
+            if stored is not None:
+                text, analysis_record, metadata = self._reuse_extraction(db, job, stored)
+            else:
+                text, analysis_record, metadata, segments, extraction = self._extract_and_analyze(db, job, previous)
+
+            self._set_stage(db, job, "indexing", StageStatus.RUNNING)
+            if extraction is not None:
+                self._add_extraction(db, extraction)
+            user = db.get(models.User, job.user_id)
+            if previous is not None:
+                # Lock the old version; it may have been deleted while this job was extracting.
+                previous = db.query(models.Document) \
+                    .filter(models.Document.id == previous.id) \
+                    .with_for_update() \
+                    .first()
+            if previous is not None:
+                corpus_profile.remove_document_stats(db, user.id, previous)
+            corpus_profile.add_document_stats(db, user.id, analysis_record["stats"])
+            document = models.Document(filename=job.filename, content=text, analysis=analysis_record,
+                                       content_sha256=job.content_sha256, owner=user)
+            source = None
+            if stored is not None:
+                source = db.query(models.Document) \
+                    .filter(models.Document.content_sha256 == job.content_sha256) \
+                    .order_by(models.Document.id).first()
+            chunks_reused = 0
+            if source is not None and source.chunks:
+                retrieval.copy_document_chunks(document, source)
+            elif segments:
+                chunks_reused = retrieval.store_segment_chunks(document, segments, metadata, previous)
+            else:
+                retrieval.store_document_chunks(document, text, metadata)
+            db.add(document)
+            answer_cache.bump_corpus_version(user)
+            db.flush()
+            replaced = {}
+            if previous is not None:
+                # The chunks reused above now belong to the new row, so only the old version's
+                # remaining chunks go with it.
+                replaced = {"replaced_document": previous.id, "chunks_reused": chunks_reused}
+                release_content(db, previous)
+                db.delete(previous)
+            job.document_id = document.id
+            job.status = JobStatus.SUCCEEDED.value
+            self._release_upload(job)
+            job.finished_at = datetime.utcnow()
+            self._set_stage(db, job, "indexing", StageStatus.DONE, chunks=len(document.chunks), **replaced)
+            if replaced:
+                retrieval.remove_document_from_index(user.id, replaced["replaced_document"])
+                self._count("versions_replaced")
+                self._count("chunks_reused", chunks_reused)
+            retrieval.index_document(user.id, document)
+            self._count("succeeded")
+            logger.info(f"Ingestion job {job.id} finished: document {document.id} for user {user.username}")
+
+        except ValueError as e:
+            logger.error(f"Text extraction failed for ingestion job {job_id}: {e}")
+            db.rollback()
+            self._discard_stored_object(db, extraction)
+            self._fail(db, db.get(models.IngestionJob, job_id), str(e))
+            db.commit()
+        except Exception as e:
+            logger.error(f"Unexpected error in ingestion job {job_id}: {e}")
+            db.rollback()
+            self._discard_stored_object(db, extraction)
+            self._fail(db, db.get(models.IngestionJob, job_id),
+                       "An unexpected error occurred while processing the document")
+            db.commit()
+        finally:
+            db.close()
+
+    def _previous_version(self, db: Session, job: models.IngestionJob) -> Optional[models.Document]:
+        """The user's latest document with the same filename, which this upload replaces."""
+        return db.query(models.Document) \
+            .filter(models.Document.user_id == job.user_id, models.Document.filename == job.filename) \
+            .order_by(models.Document.id.desc()) \
+            .first()
+
+    def _finish_unchanged(self, db: Session, job: models.IngestionJob, previous: models.Document):
+        """Close a job whose upload is byte for byte the document it would replace."""
+        for stage in STAGES:
+            self._set_stage(db, job, stage, StageStatus.DONE, reused=True)
+        job.document_id = previous.id
+        job.status = JobStatus.SUCCEEDED.value
+        self._release_upload(job)
+        job.finished_at = datetime.utcnow()
+        db.commit()
+        self._count("succeeded")
+        self._count("versions_unchanged")
+        logger.info(f"Ingestion job {job.id} finished: {job.filename} is unchanged, keeping document {previous.id}")
+
+    def _reuse_extraction(self, db: Session, job: models.IngestionJob, stored: models.ExtractedContent
+                          ) -> Tuple[str, Dict[str, Any], document_processor.DocumentMetadata]:
+        """Skip extraction, storage and analysis for bytes that were ingested before, by anyone."""
+        for stage in ("extraction", "storage", "analysis"):
+            self._set_stage(db, job, stage, StageStatus.DONE, reused=True)
+        stored.reuse_count += 1
+        db.commit()
+        self._count("dedup_hits")
+        self._count("dedup_bytes_saved", job.file_size or 0)
+        logger.info(f"Reusing stored extraction {stored.sha256[:12]} for {job.filename}")
+        analysis_record = dict(stored.analysis)
+        return stored.content, analysis_record, document_processor.metadata_from_record(analysis_record)
+
+    def _extract_and_analyze(self, db: Session, job: models.IngestionJob, previous: Optional[models.Document] = None
+                             ) -> Tuple[str, Dict[str, Any], document_processor.DocumentMetadata,
+                                        List[document_processor.ExtractedSegment], models.ExtractedContent]:
+        """Run extraction, storage and analysis; the returned extraction row is for the caller to add.
+
+        The row is written with the document, so a job that fails after this leaves neither
+        behind; the GCS object is already uploaded, which ``_discard_stored_object`` undoes.
+        """
+        # Extraction and GCS read the spool file by path; jobs queued before spooling carry bytes.
+        contents = job.spool_path or job.payload
+        if job.spool_path and not os.path.exists(job.spool_path):
+            raise ValueError("The uploaded file is no longer available. Please upload it again.")
+        content_type = job.content_type or "application/octet-stream"
+        self._count("dedup_misses")
+
+        self._set_stage(db, job, "extraction", StageStatus.RUNNING)
+        previous_segments = [document_processor.ExtractedSegment(
+            fingerprint=segment.fingerprint,
+            content=segment.content,
+            details=segment.details or {}
+        ) for segment in previous.segments] if previous is not None else None
+        text, metadata, segments = self._run_stage_in_sandbox(extract_document, contents, job.filename,
+                                                              previous_segments)
+        self._set_stage(db, job, "extraction", StageStatus.DONE, word_count=metadata.word_count,
+                        document_type=metadata.document_type.value, segments=len(segments),
+                        segments_reused=sum(1 for segment in segments if segment.reused))
+
+        self._set_stage(db, job, "storage", StageStatus.RUNNING)
+        storage_path = document_processor.content_storage_path(job.content_sha256, job.filename)
+        uploaded = document_processor.upload_file_to_gcs_with_metadata(contents, storage_path, content_type,
+                                                                       metadata)
+        if not uploaded:
+            logger.warning(f"GCS upload failed for {job.filename}, continuing with local processing")
+        self._set_stage(db, job, "storage", StageStatus.DONE, uploaded=bool(uploaded))
+
+        extraction = models.ExtractedContent(sha256=job.content_sha256, file_type=metadata.file_type,
+                                             file_size=job.file_size, storage_path=storage_path if uploaded else None)
+        try:
+            self._set_stage(db, job, "analysis", StageStatus.RUNNING)
+            text, analysis_record = self._run_stage_in_process(analyze_document, text, metadata)
+            self._set_stage(db, job, "analysis", StageStatus.DONE)
+        except BaseException:
+            db.rollback()
+            self._discard_stored_object(db, extraction)
+            raise
+
+        extraction.content = text
+        extraction.analysis = analysis_record
+        return text, analysis_record, metadata, segments, extraction
+
+    def _add_extraction(self, db: Session, extraction: models.ExtractedContent):
+        """Add the stored extraction to the job's transaction, unless another job stored the same bytes first."""
+        try:
+            with db.begin_nested():
+                db.add(extraction)
+        except IntegrityError:
+            # The same bytes were ingested concurrently by another job; keep its copy.
+            logger.info(f"Extraction {extraction.sha256[:12]} was stored concurrently, keeping the other copy")
+
+    def _discard_stored_object(self, db: Session, extraction: Optional[models.ExtractedContent]):
+        """Delete the GCS object a failed job uploaded, unless a stored extraction of the same bytes uses it."""
+        if extraction is None or not extraction.storage_path:
+            return
+        if db.get(models.ExtractedContent, extraction.sha256) is not None:
+            return
+        if not document_processor.delete_file_from_gcs(extraction.storage_path):
+            logger.warning(f"Failed to delete {extraction.storage_path} from GCS after a failed ingestion")
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._stats_lock:
+            return {"worker": self.name, "threads": self.concurrency, "process_workers": self.process_workers,
+                    **self.stats}
+
+
+_worker: Optional[IngestionWorker] = None
+
+
+def start_worker(session_factory: Callable[[], Session]) -> IngestionWorker:
+    global _worker
+    if _worker is None:
+        _worker = IngestionWorker(session_factory)
+        _worker.start()
+    return _worker
+
+
+def stop_worker():
+    global _worker
+    if _worker is not None:
+        _worker.stop()
+        _worker = None
+
+
+def notify():
+    """Wake this process's worker so a job queued here starts without waiting for the next poll."""
+    if _worker is not None:
+        _worker.notify()
+
+
+def get_ingestion_stats() -> Dict[str, Any]:
+    return _worker.get_stats() if _worker is not None else {"running": False}
+
+
+def get_dedup_stats(db: Session) -> Dict[str, Any]:
+    """Content-store totals across all processes: every miss stores one entry, every hit bumps its reuse count."""
+    entries, reuses, bytes_saved = db.query(
+        func.count(models.ExtractedContent.sha256),
+        func.coalesce(func.sum(models.ExtractedContent.reuse_count), 0),
+        func.coalesce(func.sum(models.ExtractedContent.reuse_count * models.ExtractedContent.file_size), 0)
+    ).one()
+    ingested = entries + reuses
+    return {
+        "stored_extractions": entries,
+        "reused_uploads": reuses,
+        "hit_rate": round(reuses / ingested, 3) if ingested else 0.0,
+        "bytes_saved": bytes_saved
+    }
+
+
+def release_content(db: Session, document: models.Document):
+    """Drop the stored extraction and GCS object of a document's bytes once no other document uses them."""
+    if not document.content_sha256:
+        if not document_processor.delete_file_from_gcs(document.filename):
+            logger.warning(f"Failed to delete {document.filename} from GCS, continuing with database deletion")
+        return
+    still_used = db.query(models.Document.id) \
+        .filter(models.Document.content_sha256 == document.content_sha256, models.Document.id != document.id) \
+        .first()
+    if still_used is not None:
+        return
+    stored = db.get(models.ExtractedContent, document.content_sha256)
+    if stored is not None:
+        if stored.storage_path and not document_processor.delete_file_from_gcs(stored.storage_path):
+            logger.warning(f"Failed to delete {stored.storage_path} from GCS, continuing with database deletion")
+        db.delete(stored)
@@ -0,0 +1,136 @@
+import heapq
+import math
+import re
+import threading
+import logging
+from collections import Counter
+from typing import Dict, Iterable, List, Set, Tuple
+
+logger = logging.getLogger(__name__)
+
+TOKEN_PATTERN = re.compile(r'\b\w{2,}\b')
+STOP_WORDS = frozenset({
+    'the', 'and', 'for', 'are', 'what', 'which', 'who', 'how', 'why', 'when', 'where', 'does', 'can', 'this',
+    'that', 'with', 'from', 'about', 'have', 'has', 'is', 'was', 'will', 'should', 'would', 'could', 'there',
+    'their', 'your', 'you', 'our', 'any', 'all', 'into', 'some', 'of', 'to', 'in', 'on', 'at', 'by', 'or', 'an',
+    'be', 'as', 'it', 'if', 'me', 'my', 'do', 'we', 'they', 'been', 'were', 'them', 'these', 'those', 'than'
+})
+
+
+def tokenize(text: str) -> List[str]:
+    return [token for token in TOKEN_PATTERN.findall(text.lower()) if token not in STOP_WORDS]
+
+
+class LexicalIndex:
+    """BM25 inverted index over chunk term frequencies.
+
+    Documents are added incrementally. Removal only tombstones their chunks;
+    postings are physically dropped by ``compact`` once enough of the index is dead.
+    Tombstoned chunks are already left out of every scoring statistic (chunk count,
+    average length, document frequency), so rankings do not depend on when that happens.
+    """
+
+    def __init__(self, k1: float = 1.5, b: float = 0.75, compaction_ratio: float = 0.25):
+        self.k1 = k1
+        self.b = b
+        self.compaction_ratio = compaction_ratio
+        self.postings: Dict[str, Dict[int, int]] = {}
+        self.chunk_lengths: Dict[int, int] = {}
+        self.chunk_documents: Dict[int, int] = {}
+        self.document_chunks: Dict[int, List[int]] = {}
+        self.tombstones: Set[int] = set()
+        self.live_chunks = 0
+        self.live_length = 0
+        self._lock = threading.RLock()
+
+    @property
+    def document_ids(self) -> Set[int]:
+        with self._lock:
+            return set(self.document_chunks)
+
+    def add_document(self, document_id: int, chunks: Iterable[Tuple[int, str]]):
+        with self._lock:
+            if document_id in self.document_chunks:
+                self.remove_document(document_id)
+            chunk_ids = []
+            for chunk_id, text in chunks:
+                term_counts = Counter(tokenize(text))
+                length = sum(term_counts.values())
+                for term, count in term_counts.items():
+                    self.postings.setdefault(term, {})[chunk_id] = count
+                self.tombstones.discard(chunk_id)
+                self.chunk_lengths[chunk_id] = length
+                self.chunk_documents[chunk_id] = document_id
+                self.live_chunks += 1
+                self.live_length += length
+                chunk_ids.append(chunk_id)
+            self.document_chunks[document_id] = chunk_ids
+
+    def remove_document(self, document_id: int) -> bool:
+        with self._lock:
+            chunk_ids = self.document_chunks.pop(document_id, None)
+            if chunk_ids is None:
+                return False
+            for chunk_id in chunk_ids:
+                self.tombstones.add(chunk_id)
+                self.live_chunks -= 1
+                self.live_length -= self.chunk_lengths.get(chunk_id, 0)
+            if len(self.tombstones) > self.compaction_ratio * max(len(self.chunk_lengths), 1):
+                self.compact()
+            return True
+
+    def compact(self):
+        with self._lock:
+            if not self.tombstones:
+                return
+            dead = self.tombstones
+            for term in list(self.postings):
+                posting = self.postings[term]
+                for chunk_id in dead.intersection(posting):
+                    del posting[chunk_id]
+                if not posting:
+                    del self.postings[term]
+            for chunk_id in dead:
+                self.chunk_lengths.pop(chunk_id, None)
+                self.chunk_documents.pop(chunk_id, None)
+            logger.info(f"Compacted lexical index: dropped {len(dead)} tombstoned chunks")
+            self.tombstones = set()
+
+    def search(self, query: str, top_k: int = 10) -> List[Tuple[int, float]]:
+        query_terms = set(tokenize(query))
+        if not query_terms:
+            return []
+        with self._lock:
+            if self.live_chunks <= 0:
+                return []
+            avg_length = self.live_length / self.live_chunks
+            scores: Dict[int, float] = {}
+            for term in query_terms:
+                posting = self.postings.get(term)
+                if not posting:
+                    continue
+                doc_freq = len(posting)
+                if self.tombstones:
+                    doc_freq -= len(self.tombstones.intersection(posting))
+                if doc_freq <= 0:
+                    continue
+                idf = math.log(1 + (self.live_chunks - doc_freq + 0.5) / (doc_freq + 0.5))
+                for chunk_id, term_freq in posting.items():
+                    if chunk_id in self.tombstones:
+                        continue
+                    norm = self.k1 * (1 - self.b + self.b * self.chunk_lengths[chunk_id] / avg_length)
+                    scores[chunk_id] = scores.get(chunk_id, 0.0) + idf * term_freq * (self.k1 + 1) / (term_freq + norm)
+        return heapq.nlargest(top_k, scores.items(), key=lambda item: item[1])
+
+
+_user_indexes: Dict[int, LexicalIndex] = {}
+_registry_lock = threading.Lock()
+
+
+def get_user_index(user_id: int) -> LexicalIndex:
+    with _registry_lock:
+        index = _user_indexes.get(user_id)
+        if index is None:
+            index = LexicalIndex()
+            _user_indexes[user_id] = index
+        return index
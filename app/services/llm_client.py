@@ -0,0 +1,231 @@
+import asyncio
+import hashlib
+import queue
+import threading
+import time
+import logging
+from typing import Any, AsyncIterator, Dict, Iterator, Optional
+
+from app.core.config import (LLM_BACKEND, LLM_MODEL, LLM_TIMEOUT_SECONDS, LLM_MAX_CONCURRENCY,
+                             LLM_FAKE_LATENCY_MS)
+
+logger = logging.getLogger(__name__)
+
+
+class LLMError(Exception):
+    pass
+
+
+class LLMTimeoutError(LLMError):
+    pass
+
+
+class LLMBackend:
+    name: str = "base"
+
+    async def generate_async(self, prompt: str, generation_config: Dict[str, Any]) -> str:
+        raise NotImplementedError
+
+    async def stream_async(self, prompt: str, generation_config: Dict[str, Any]) -> AsyncIterator[str]:
+        yield await self.generate_async(prompt, generation_config)
+
+
+class VertexBackend(LLMBackend):
+    """Gemini on Vertex AI; ``vertexai.init`` and the model are set up once per process."""
+
+    def __init__(self, model_name: str = LLM_MODEL):
+        import vertexai
+        from vertexai.generative_models import GenerativeModel, GenerationConfig
+        from app.services.document_processor import PROJECT_ID, LOCATION
+
+        vertexai.init(project=PROJECT_ID, location=LOCATION)
+        self.model = GenerativeModel(model_name)
+        self.config_class = GenerationConfig
+        self.name = f"vertex-{model_name}"
+
+    async def generate_async(self, prompt: str, generation_config: Dict[str, Any]) -> str:
+        response = await self.model.generate_content_async(
+            prompt, generation_config=self.config_class(**generation_config)
+        )
+        return response.text
+
+    async def stream_async(self, prompt: str, generation_config: Dict[str, Any]) -> AsyncIterator[str]:
+        responses = await self.model.generate_content_async(
+            prompt, generation_config=self.config_class(**generation_config), stream=True
+        )
+        async for response in responses:
+            if response.candidates and response.candidates[0].content.parts:
+                yield response.text
+
+
+class FakeBackend(LLMBackend):
+    """Deterministic offline backend: same prompt, same answer, after ``latency_ms``."""
+
+    def __init__(self, latency_ms: float = LLM_FAKE_LATENCY_MS):
+        self.latency_ms = latency_ms
+        self.name = f"fake-{latency_ms:g}ms"
+
+    async def generate_async(self, prompt: str, generation_config: Dict[str, Any]) -> str:
+        await asyncio.sleep(self.latency_ms / 1000)
+        digest = hashlib.sha256(prompt.encode("utf-8")).hexdigest()[:12]
+        return (f"Great question! This is a simulated answer ({digest}) generated offline from a "
+                f"{len(prompt)}-character prompt. Let me know if you need anything else.")
+
+    async def stream_async(self, prompt: str, generation_config: Dict[str, Any]) -> AsyncIterator[str]:
+        text = await self.generate_async(prompt, generation_config)
+        for word in text.split(' '):
+            await asyncio.sleep(self.latency_ms / 1000 / 10)
+            yield word + ' '
+
+
+class LLMClient:
+    """Process-wide LLM client.
+
+    Generation runs as coroutines on one background event loop, so sync endpoints can call
+    ``generate`` from the threadpool while the concurrency semaphore and per-call deadline
+    apply to every request in the process.
+    """
+
+    def __init__(self, backend: LLMBackend, max_concurrency: int = LLM_MAX_CONCURRENCY,
+                 timeout_seconds: float = LLM_TIMEOUT_SECONDS):
+        self.backend = backend
+        self.max_concurrency = max_concurrency
+        self.timeout_seconds = timeout_seconds
+        self._loop = asyncio.new_event_loop()
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._thread = threading.Thread(target=self._run_loop, name="llm-client-loop", daemon=True)
+        self._thread.start()
+        self._stats_lock = threading.Lock()
+        self._stats = {"calls": 0, "completed": 0, "timeouts": 0, "errors": 0, "in_flight": 0, "waiting": 0,
+                       "total_latency_ms": 0.0}
+
+    def _run_loop(self):
+        asyncio.set_event_loop(self._loop)
+        self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        self._loop.run_forever()
+
+    def _count(self, **deltas: float):
+        with self._stats_lock:
+            for key, delta in deltas.items():
+                self._stats[key] += delta
+
+    async def generate_async(self, prompt: str, timeout: Optional[float] = None, **generation_config: Any) -> str:
+        """Generate on the client's loop; the deadline covers waiting for a slot as well as the call."""
+        timeout = timeout or self.timeout_seconds
+        deadline = time.monotonic() + timeout
+        await self._acquire(deadline, timeout)
+        started = time.perf_counter()
+        try:
+            text = await asyncio.wait_for(self.backend.generate_async(prompt, generation_config),
+                                          max(deadline - time.monotonic(), 0))
+        except asyncio.TimeoutError:
+            self._count(timeouts=1)
+            raise LLMTimeoutError(f"LLM call exceeded {timeout}s deadline")
+        except Exception:
+            self._count(errors=1)
+            raise
+        finally:
+            self._semaphore.release()
+            self._count(in_flight=-1)
+        self._count(completed=1, total_latency_ms=(time.perf_counter() - started) * 1000)
+        return text
+
+    async def _acquire(self, deadline: float, timeout: float):
+        self._count(calls=1, waiting=1)
+        try:
+            await asyncio.wait_for(self._semaphore.acquire(), max(deadline - time.monotonic(), 0))
+        except asyncio.TimeoutError:
+            self._count(waiting=-1, timeouts=1)
+            raise LLMTimeoutError(f"No LLM slot free within {timeout}s")
+        self._count(waiting=-1, in_flight=1)
+
+    async def _stream_into(self, chunks: "queue.Queue", prompt: str, timeout: float,
+                           generation_config: Dict[str, Any]):
+        deadline = time.monotonic() + timeout
+        await self._acquire(deadline, timeout)
+        started = time.perf_counter()
+        stream = self.backend.stream_async(prompt, generation_config)
+        try:
+            while True:
+                try:
+                    chunk = await asyncio.wait_for(stream.__anext__(), max(deadline - time.monotonic(), 0))
+                except StopAsyncIteration:
+                    break
+                chunks.put(chunk)
+        except asyncio.TimeoutError:
+            self._count(timeouts=1)
+            raise LLMTimeoutError(f"LLM stream exceeded {timeout}s deadline")
+        except Exception:
+            self._count(errors=1)
+            raise
+        finally:
+            await stream.aclose()
+            self._semaphore.release()
+            self._count(in_flight=-1)
+        self._count(completed=1, total_latency_ms=(time.perf_counter() - started) * 1000)
+
+    def stream(self, prompt: str, timeout: Optional[float] = None, **generation_config: Any) -> Iterator[str]:
+        """Yield text chunks as the model produces them; the deadline covers the whole stream.
+
+        Chunks are handed over from the event loop through a queue, so this can be consumed
+        from a sync generator (e.g. a StreamingResponse body).
+        """
+        chunks: "queue.Queue" = queue.Queue()
+        done = object()
+        future = asyncio.run_coroutine_threadsafe(
+            self._stream_into(chunks, prompt, timeout or self.timeout_seconds, generation_config), self._loop
+        )
+        future.add_done_callback(lambda _: chunks.put(done))
+        try:
+            while True:
+                chunk = chunks.get()
+                if chunk is done:
+                    break
+                yield chunk
+            future.result()
+        finally:
+            future.cancel()
+
+    def generate(self, prompt: str, timeout: Optional[float] = None, **generation_config: Any) -> str:
+        """Blocking wrapper for sync callers."""
+        future = asyncio.run_coroutine_threadsafe(
+            self.generate_async(prompt, timeout=timeout, **generation_config), self._loop
+        )
+        return future.result()
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._stats_lock:
+            stats = dict(self._stats)
+        total_latency_ms = stats.pop("total_latency_ms")
+        return {
+            "backend": self.backend.name,
+            "max_concurrency": self.max_concurrency,
+            "timeout_seconds": self.timeout_seconds,
+            "avg_latency_ms": round(total_latency_ms / stats["completed"], 3) if stats["completed"] else 0.0,
+            **stats
+        }
+
+
+_client: Optional[LLMClient] = None
+_client_lock = threading.Lock()
+
+
+def create_backend(name: str = LLM_BACKEND) -> LLMBackend:
+    if name == "fake":
+        return FakeBackend()
+    return VertexBackend()
+
+
+def get_llm_client() -> LLMClient:
+    global _client
+    with _client_lock:
+        if _client is None:
+            _client = LLMClient(create_backend())
+            logger.info(f"Initialized LLM client with {_client.backend.name} backend")
+        return _client
+
+
+def get_llm_stats() -> Dict[str, Any]:
+    with _client_lock:
+        client = _client
+    return client.get_stats() if client is not None else {"backend": LLM_BACKEND, "initialized": False}
@@ -0,0 +1,152 @@
+import re
+import time
+import threading
+import logging
+from dataclasses import dataclass
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+from app.core.config import PATTERN_SAFE_MODE, PATTERN_WINDOW_CHARS, PATTERN_MATCH_CAP, PATTERN_SCAN_BUDGET_MS
+
+logger = logging.getLogger(__name__)
+
+WINDOW_OVERLAP_CHARS = 1024
+
+
+@dataclass(frozen=True)
+class PatternMatch:
+    label: str
+    value: str
+    start: int
+    end: int
+    groups: Tuple[Optional[str], ...]
+
+
+class PatternGroup:
+    """Several labelled alternatives compiled into one regex, scanned in a single pass.
+
+    Each alternative keeps its own match cap, and its capture groups are reported relative
+    to the alternative, as if it had been matched on its own. Every alternative must use
+    bounded quantifiers so that the work per start position is bounded and a scan stays
+    linear in the text length.
+    """
+
+    def __init__(self, name: str, alternatives: Sequence[Tuple[str, str]], flags: int = 0,
+                 match_cap: int = PATTERN_MATCH_CAP):
+        self.name = name
+        self.labels = [label for label, _ in alternatives]
+        self.match_cap = match_cap
+        self.pattern = re.compile('|'.join(f"(?P<alt{i}>{regex})" for i, (_, regex) in enumerate(alternatives)),
+                                  flags)
+        self.group_spans: List[Tuple[int, int]] = []
+        offset = 1
+        for _, regex in alternatives:
+            inner = re.compile(regex, flags).groups
+            self.group_spans.append((offset + 1, offset + 1 + inner))
+            offset += 1 + inner
+
+    def scan(self, text: str, match_cap: Optional[int] = None, safe: bool = PATTERN_SAFE_MODE) -> List[PatternMatch]:
+        cap = self.match_cap if match_cap is None else match_cap
+        counts = [0] * len(self.labels)
+        matches: List[PatternMatch] = []
+        iterator = iter_windowed(self.pattern, text) if safe else self.pattern.finditer(text)
+        for match in iterator:
+            index = int(match.lastgroup[3:])
+            if counts[index] >= cap:
+                if all(count >= cap for count in counts):
+                    _record("capped")
+                    break
+                continue
+            counts[index] += 1
+            first, last = self.group_spans[index]
+            matches.append(PatternMatch(label=self.labels[index], value=match.group(0), start=match.start(),
+                                        end=match.end(), groups=tuple(match.group(g) for g in range(first, last))))
+        _record("scans")
+        return matches
+
+
+def iter_windowed(pattern: re.Pattern, text: str, window: int = PATTERN_WINDOW_CHARS,
+                  overlap: int = WINDOW_OVERLAP_CHARS,
+                  budget_ms: float = PATTERN_SCAN_BUDGET_MS) -> Iterator[re.Match]:
+    """``finditer`` over bounded windows of ``text``, stopping once ``budget_ms`` is spent.
+
+    Each window is searched ``overlap`` characters past its end, but only matches starting
+    inside the window are yielded, so matches shorter than ``overlap`` are never cut at a
+    boundary. Positions are absolute and lookbehind and ``\\b`` still see the real text.
+    """
+    started = time.perf_counter()
+    position = 0
+    while position < len(text):
+        window_end = min(position + window, len(text))
+        next_position = window_end
+        for match in pattern.finditer(text, position, min(window_end + overlap, len(text))):
+            if match.start() >= window_end:
+                break
+            yield match
+            next_position = max(next_position, match.end())
+        position = next_position
+        _record("windows")
+        if position < len(text) and (time.perf_counter() - started) * 1000 > budget_ms:
+            logger.warning(f"Pattern scan stopped at {position}/{len(text)} chars after {budget_ms:.0f}ms budget")
+            _record("budget_exceeded")
+            return
+
+
+PATTERNS: Dict[str, PatternGroup] = {
+    "entities": PatternGroup("entities", [
+        ("DATE", r"\b\d{1,2}[-/]\d{1,2}[-/]\d{2,4}\b"),
+        ("DATE", r"\b\d{4}[-/]\d{1,2}[-/]\d{1,2}\b"),
+        ("DATE", r"(?i:\b(?:Jan|Feb|Mar|Apr|May|Jun|Jul|Aug|Sep|Oct|Nov|Dec)[a-z]{0,6} \d{1,2},? \d{4}\b)"),
+        ("MONEY", r"\$\d{1,15}(?:,\d{3}){0,5}(?:\.\d{2})?"),
+        ("MONEY", r"₹\d{1,15}(?:,\d{3}){0,5}(?:\.\d{2})?"),
+        ("MONEY", r"(?i:\b\d{1,15}(?:,\d{3}){0,5}(?:\.\d{2})?[ \t]{0,3}(?:USD|INR|EUR|GBP)\b)"),
+        ("ORG", r"\b[A-Z][a-z]{1,40} (?:Inc|Corp|LLC|Ltd|Company|Corporation|Limited)\b"),
+        ("ORG", r"\b[A-Z]{2,40}\b")
+    ], match_cap=5),
+    "cross_references": PatternGroup("cross_references", [
+        ("reference", r"(?:see|refer to|as per|according to)\s{1,5}(?:section|chapter|table|figure|appendix)"
+                      r"\s{1,5}(\w{1,40})"),
+        ("reference", r"(?:section|chapter|table|figure|appendix)\s{1,5}(\w{1,40})\s{1,5}"
+                      r"(?:shows|indicates|describes)"),
+        ("reference", r"(?:above|below|following|preceding)\s{1,5}(?:section|table|figure)")
+    ], flags=re.IGNORECASE),
+    "rates": PatternGroup("rates", [
+        # Possessive quantifiers: a shorter item can never be followed by the separator, so
+        # giving words back on a failed match only burns time.
+        ("rate_pricing", r"\b(\w{1,40}+(?:[ \t]{1,5}+\w{1,40}+){0,5}+)[ \t]{0,5}+[:\-][ \t]{0,5}+"
+                         r"(?:₹|Rs\.?|\$|USD|INR)?[ \t]{0,5}+(\d{1,15}+(?:,\d{3}){0,5}+(?:\.\d{2})?)")
+    ], flags=re.IGNORECASE),
+    "grades": PatternGroup("grades", [
+        ("grade_level", r"(L\d{1,3}|Level\s{1,3}\d{1,3}|Grade\s{1,3}\d{1,3}|Tier\s{1,3}\d{1,3})")
+    ], flags=re.IGNORECASE),
+    "conditional": PatternGroup("conditional", [
+        ("conditional", r"\bif\s{1,5}(.{1,200}?)\s{1,5}then\s{1,5}(.{1,200}?)(?:\.|,)"),
+        ("conditional", r"provided\s{1,5}that\s{1,5}(.{1,200}?)(?:\.|,)"),
+        ("conditional", r"subject\s{1,5}to\s{1,5}(.{1,200}?)(?:\.|,)")
+    ], flags=re.IGNORECASE | re.DOTALL),
+    "causal": PatternGroup("causal", [
+        ("causal", r"because\s{1,5}(.{1,200}?)(?:\.|,)"),
+        ("causal", r"due\s{1,5}to\s{1,5}(.{1,200}?)(?:\.|,)"),
+        ("causal", r"as\s{1,5}a\s{1,5}result\s{1,5}of\s{1,5}(.{1,200}?)(?:\.|,)")
+    ], flags=re.IGNORECASE)
+}
+
+
+def scan(name: str, text: str, match_cap: Optional[int] = None, safe: bool = PATTERN_SAFE_MODE) -> List[PatternMatch]:
+    if not text:
+        return []
+    return PATTERNS[name].scan(text, match_cap=match_cap, safe=safe)
+
+
+_stats_lock = threading.Lock()
+_stats = {"scans": 0, "windows": 0, "capped": 0, "budget_exceeded": 0}
+
+
+def _record(counter: str):
+    with _stats_lock:
+        _stats[counter] += 1
+
+
+def get_pattern_stats() -> Dict[str, object]:
+    with _stats_lock:
+        return {"safe_mode": PATTERN_SAFE_MODE, "window_chars": PATTERN_WINDOW_CHARS,
+                "match_cap": PATTERN_MATCH_CAP, **_stats}
@@ -0,0 +1,198 @@
+import hashlib
+import logging
+import tempfile
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Set, Union
+
+import fitz
+
+from app.core.config import PDF_PARALLEL_MIN_PAGES, PDF_EXTRACTION_PROCESSES, PDF_PAGES_PER_TASK
+
+logger = logging.getLogger(__name__)
+
+# Kept free of the GCS, Vertex and database imports: pool workers are spawned and import
+# this module, not document_processor, to unpickle the page tasks.
+
+
+@dataclass
+class PdfPageResult:
+    text: str
+    fonts: Set[str]
+    non_latin: bool
+    headers: List[str]
+    has_table: bool
+    images: int
+    fingerprint: str = ""
+    reused: bool = False
+
+
+def page_fingerprint(page: "fitz.Page") -> str:
+    """SHA-256 of what a page's text is drawn from, without laying any text out.
+
+    Covers the content streams, the form XObjects they paint, the fonts (by name and
+    encoding) and the page geometry, so a re-issued document can be compared page by page
+    at a tenth of the cost of extracting it. Re-saving can change the bytes of an unchanged
+    page, which only costs a needless extraction; the reverse would need identical
+    streams and fonts drawing different text.
+    """
+    hasher = hashlib.sha256(page.read_contents())
+    for xref, *_ in page.get_xobjects():
+        hasher.update(page.parent.xref_stream(xref) or b"")
+    fonts = sorted((basefont, name, encoding) for _, _, _, basefont, name, encoding, *_ in page.get_fonts())
+    hasher.update(repr((fonts, tuple(page.rect), page.rotation)).encode())
+    return hasher.hexdigest()
+
+
+def extract_pdf_page(page: "fitz.Page") -> PdfPageResult:
+    """Everything the extractor needs from one page, from a single ``dict`` text pass.
+
+    Lines are rebuilt from the spans exactly as ``page.get_text()`` prints them, and the
+    table hint is a case-insensitive substring test, like ``search_for``. Image data is
+    left out of the pass; ``get_images`` only reads the page's resource dictionary.
+    """
+    fonts = set()
+    non_latin = False
+    page_lines = []
+    for block in page.get_text("dict", flags=fitz.TEXTFLAGS_TEXT)["blocks"]:
+        for line in block.get("lines", ()):
+            span_texts = []
+            for span in line["spans"]:
+                fonts.add(f"{span.get('font', 'unknown')}_{span.get('size', 0)}")
+                text_content = span.get("text", "")
+                if not non_latin and not text_content.isascii():
+                    non_latin = True
+                span_texts.append(text_content)
+            page_lines.append(''.join(span_texts))
+    # get_text() ends every line with a newline, so its split has a trailing empty line.
+    lines = page_lines + [''] if page_lines else ['']
+    has_table = any('table' in line.lower() for line in page_lines)
+    processed_lines = []
+    headers = []
+    for i, line in enumerate(lines):
+        cleaned_line = ' '.join(line.split())
+        if not cleaned_line:
+            continue
+        if (len(cleaned_line) < 100 and
+                cleaned_line.isupper() or
+                (i < len(lines) - 1 and not lines[i + 1].strip())):
+            processed_lines.append(f"\n## {cleaned_line}\n")
+            headers.append(f"header:{cleaned_line}")
+        else:
+            processed_lines.append(cleaned_line)
+    return PdfPageResult(
+        text='\n'.join(processed_lines),
+        fonts=fonts,
+        non_latin=non_latin,
+        headers=headers,
+        has_table=has_table,
+        images=len(page.get_images()),
+        fingerprint=page_fingerprint(page)
+    )
+
+
+def extract_pdf_page_list(path: str, page_numbers: List[int]) -> List[PdfPageResult]:
+    """Extract the given pages; runs in a PDF extraction worker process."""
+    with open_pdf(path) as doc:
+        return [extract_pdf_page(doc[page_num]) for page_num in page_numbers]
+
+
+_pdf_pool: Optional[ProcessPoolExecutor] = None
+_pdf_pool_lock = threading.Lock()
+# Spawned by default, since the processes that extract PDFs run threads, which fork does not survive.
+_pdf_pool_start_method = "spawn"
+
+
+def use_forked_pool():
+    """Fork page workers from this process instead of spawning fresh interpreters.
+
+    Only for a single-threaded process that has the extraction code imported already,
+    such as an extraction sandbox; its workers then start without importing it all again.
+    """
+    global _pdf_pool_start_method
+    _pdf_pool_start_method = "fork"
+
+
+def get_pdf_pool() -> ProcessPoolExecutor:
+    global _pdf_pool
+    with _pdf_pool_lock:
+        if _pdf_pool is None:
+            _pdf_pool = ProcessPoolExecutor(max_workers=PDF_EXTRACTION_PROCESSES,
+                                            mp_context=multiprocessing.get_context(_pdf_pool_start_method))
+        return _pdf_pool
+
+
+def _reset_pdf_pool():
+    global _pdf_pool
+    with _pdf_pool_lock:
+        if _pdf_pool is not None:
+            _pdf_pool.shutdown(wait=False, cancel_futures=True)
+            _pdf_pool = None
+
+
+def open_pdf(source: Union[bytes, str]) -> "fitz.Document":
+    """Open PDF bytes, or a path so MuPDF reads the file itself instead of a Python copy."""
+    if isinstance(source, str):
+        try:
+            return fitz.open(source, filetype="pdf")
+        except fitz.FileDataError:
+            # MuPDF names the file; the spool path means nothing to the uploader.
+            raise fitz.FileDataError("Failed to open PDF file") from None
+    return fitz.open(stream=source, filetype="pdf")
+
+
+def extract_pdf_pages_parallel(source: Union[bytes, str], page_numbers: List[int]) -> List[PdfPageResult]:
+    """Split the pages across the PDF process pool and return them in the order given.
+
+    Every worker opens the file itself, so only a path and page numbers are pickled per
+    task; bytes are first written to a temp file.
+    """
+    if isinstance(source, str):
+        return _extract_pdf_file_parallel(source, page_numbers)
+    with tempfile.NamedTemporaryFile(suffix=".pdf") as pdf_file:
+        pdf_file.write(source)
+        pdf_file.flush()
+        return _extract_pdf_file_parallel(pdf_file.name, page_numbers)
+
+
+def _extract_pdf_file_parallel(path: str, page_numbers: List[int]) -> List[PdfPageResult]:
+    tasks = [page_numbers[start:start + PDF_PAGES_PER_TASK]
+             for start in range(0, len(page_numbers), PDF_PAGES_PER_TASK)]
+    pool = get_pdf_pool()
+    try:
+        futures = [pool.submit(extract_pdf_page_list, path, task) for task in tasks]
+        return [page for future in futures for page in future.result()]
+    except BrokenProcessPool:
+        _reset_pdf_pool()
+        raise
+
+
+def extract_pdf_pages(source: Union[bytes, str],
+                      known_pages: Optional[Dict[str, PdfPageResult]] = None) -> List[PdfPageResult]:
+    """Every page of the PDF, in order.
+
+    Pages whose fingerprint is a key of ``known_pages`` (the pages of an earlier version of
+    the document) are taken from it instead of being extracted again.
+    """
+    known_pages = known_pages or {}
+    with open_pdf(source) as doc:
+        page_count = len(doc)
+        fingerprints: List[Optional[str]] = [None] * page_count
+        if known_pages:
+            fingerprints = [page_fingerprint(page) for page in doc]
+        pending = [page_num for page_num in range(page_count) if fingerprints[page_num] not in known_pages]
+        extracted: Dict[int, PdfPageResult] = {}
+        if len(pending) < PDF_PARALLEL_MIN_PAGES or PDF_EXTRACTION_PROCESSES <= 1:
+            extracted = {page_num: extract_pdf_page(doc[page_num]) for page_num in pending}
+    if len(extracted) < len(pending):
+        try:
+            extracted = dict(zip(pending, extract_pdf_pages_parallel(source, pending)))
+        except BrokenProcessPool as e:
+            logger.warning(f"PDF extraction pool failed, extracting {len(pending)} pages in-process: {e}")
+            with open_pdf(source) as doc:
+                extracted = {page_num: extract_pdf_page(doc[page_num]) for page_num in pending}
+    return [extracted[page_num] if page_num in extracted else known_pages[fingerprints[page_num]]
+            for page_num in range(page_count)]
@@ -0,0 +1,60 @@
+import re
+from enum import Enum
+from typing import Iterable
+
+GREETINGS = {'hi', 'hello', 'hey', 'good morning', 'good afternoon', 'good evening'}
+OFF_TOPIC_KEYWORDS = [
+    'program', 'code', 'function', 'algorithm', 'script', 'software',
+    'python', 'java', 'javascript', 'write', 'create', 'develop',
+    'weather', 'news', 'sports', 'cooking', 'recipe', 'movie',
+    'music', 'game', 'joke', 'story', 'math', 'calculate', 'c++', 'typescript', 'sql', 'nosql'
+]
+TRAVEL_KEYWORDS = ['travel', 'trip', 'flight', 'hotel', 'accommodation', 'per diem', 'allowance', 'policy',
+                   'booking']
+VAGUE_QUESTIONS = {
+    'help', 'what can you do', 'tell me', 'explain', 'info', 'information',
+    'about', 'details', 'more', 'anything', 'everything',
+    'what', 'how', 'why', 'when', 'where'
+}
+VAGUE_MAX_WORDS = 3
+
+
+class QuestionRoute(str, Enum):
+    GREETING = "greeting"
+    OFF_TOPIC = "off_topic"
+    VAGUE = "vague"
+    DOCUMENT = "document"
+
+
+def compile_keyword_pattern(keywords: Iterable[str]) -> re.Pattern:
+    """One alternation matching any keyword that starts at a word boundary (so 'trip' still matches 'trips')."""
+    alternatives = sorted((re.escape(keyword) for keyword in keywords), key=len, reverse=True)
+    return re.compile(rf"(?<!\w)(?:{'|'.join(alternatives)})")
+
+
+OFF_TOPIC_PATTERN = re.compile(rf"{compile_keyword_pattern(OFF_TOPIC_KEYWORDS).pattern}|(?<![\w+])c(?![\w+])")
+TRAVEL_PATTERN = compile_keyword_pattern(TRAVEL_KEYWORDS)
+
+
+def normalize_question(question: str) -> str:
+    return question.lower().strip()
+
+
+def is_off_topic(question_lower: str) -> bool:
+    return OFF_TOPIC_PATTERN.search(question_lower) is not None and TRAVEL_PATTERN.search(question_lower) is None
+
+
+def is_vague(question_lower: str) -> bool:
+    return len(question_lower.split()) <= VAGUE_MAX_WORDS or question_lower in VAGUE_QUESTIONS
+
+
+def route_question(question: str) -> QuestionRoute:
+    """Classify a question before any retrieval, analysis or LLM work is done for it."""
+    question_lower = normalize_question(question)
+    if question_lower in GREETINGS:
+        return QuestionRoute.GREETING
+    if is_off_topic(question_lower):
+        return QuestionRoute.OFF_TOPIC
+    if is_vague(question_lower):
+        return QuestionRoute.VAGUE
+    return QuestionRoute.DOCUMENT
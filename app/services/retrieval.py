@@ -0,0 +1,475 @@
+import logging
+import math
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+import numpy as np
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from app.core.config import (RAG_TOP_K, CHUNK_MAX_CHARS, RETRIEVAL_BUDGET_MS, RETRIEVAL_VECTOR_PROBE_INTERVAL, RRF_K,
+                             RRF_CANDIDATE_MULTIPLIER)
+from app.db import models
+from app.services import context_packer, document_processor, lexical_index, vector_index
+
+logger = logging.getLogger(__name__)
+
+# Pages with less text than the chunker keeps of a section (a title page, a blank page) get no chunks.
+MIN_SEGMENT_CHARS = 50
+
+
+def _build_chunk_rows(text: str, metadata: Optional[document_processor.DocumentMetadata],
+                      user_id: int) -> List[models.DocumentChunk]:
+    semantic_chunks = document_processor.create_semantic_chunks(text, metadata)
+    if not semantic_chunks and text and text.strip():
+        semantic_chunks = [document_processor.SemanticChunk(
+            content=window,
+            chunk_type="document",
+            importance_score=0.5,
+            topic_tags=document_processor.extract_chunk_topics(window),
+            entities=[],
+            relationships=[],
+            context_window=window[:100]
+        ) for window in document_processor.split_section_into_windows(text.strip(), CHUNK_MAX_CHARS)]
+    return [models.DocumentChunk(
+        chunk_index=index,
+        user_id=user_id,
+        content=chunk.content,
+        chunk_type=chunk.chunk_type,
+        importance_score=chunk.importance_score,
+        topic_tags=chunk.topic_tags,
+        context_window=chunk.context_window
+    ) for index, chunk in enumerate(semantic_chunks)]
+
+
+def store_document_chunks(document: models.Document, text: str,
+                          metadata: Optional[document_processor.DocumentMetadata]) -> List[models.DocumentChunk]:
+    """Split a document into semantic chunks and attach them to the (unflushed) document row."""
+    user_id = document.owner.id if document.owner is not None else document.user_id
+    rows = _build_chunk_rows(text, metadata, user_id)
+    embed_chunks(rows)
+    document.chunks = rows
+    logger.info(f"Created {len(rows)} chunks for {document.filename}")
+    return rows
+
+
+def store_segment_chunks(document: models.Document, segments: List[document_processor.ExtractedSegment],
+                         metadata: Optional[document_processor.DocumentMetadata],
+                         previous: Optional[models.Document] = None) -> int:
+    """Chunk a document one segment at a time and attach chunks and segments to the (unflushed) row.
+
+    Chunks never span two segments, so when ``previous`` is an earlier version of the
+    document, the chunk rows of every segment it shares with it are moved over as they are,
+    embeddings included, and only new or changed segments are chunked and embedded. The
+    rows left on ``previous`` go when it is deleted. Returns the number of chunks reused.
+    """
+    user_id = document.owner.id if document.owner is not None else document.user_id
+    reusable: Dict[str, List[List[models.DocumentChunk]]] = {}
+    if previous is not None:
+        chunks_by_segment: Dict[int, List[models.DocumentChunk]] = {}
+        for chunk in previous.chunks:
+            if chunk.segment_index is not None:
+                chunks_by_segment.setdefault(chunk.segment_index, []).append(chunk)
+        for segment in previous.segments:
+            reusable.setdefault(segment.fingerprint, []).append(chunks_by_segment.get(segment.segment_index, []))
+
+    rows: List[models.DocumentChunk] = []
+    created: List[models.DocumentChunk] = []
+    for segment_index, segment in enumerate(segments):
+        matches = reusable.get(segment.fingerprint)
+        text = document_processor.preprocess_text(segment.content)
+        if matches:
+            segment_rows = matches.pop()
+        elif len(text) < MIN_SEGMENT_CHARS:
+            segment_rows = []
+        else:
+            segment_rows = _build_chunk_rows(text, metadata, user_id)
+            created.extend(segment_rows)
+        for row in segment_rows:
+            row.segment_index = segment_index
+        rows.extend(segment_rows)
+    for index, row in enumerate(rows):
+        row.chunk_index = index
+    embed_chunks(created)
+    document.chunks = rows
+    document.segments = [models.DocumentSegment(
+        segment_index=segment_index,
+        fingerprint=segment.fingerprint,
+        content=segment.content,
+        details=segment.details
+    ) for segment_index, segment in enumerate(segments)]
+    reused = len(rows) - len(created)
+    logger.info(f"Created {len(created)} chunks and reused {reused} for {document.filename} "
+                f"({len(segments)} segments)")
+    return reused
+
+
+def copy_document_chunks(document: models.Document, source: models.Document) -> List[models.DocumentChunk]:
+    """Attach copies of ``source``'s chunks, embeddings included, to the (unflushed) document row."""
+    user_id = document.owner.id if document.owner is not None else document.user_id
+    rows = [models.DocumentChunk(
+        chunk_index=chunk.chunk_index,
+        segment_index=chunk.segment_index,
+        user_id=user_id,
+        content=chunk.content,
+        chunk_type=chunk.chunk_type,
+        importance_score=chunk.importance_score,
+        topic_tags=chunk.topic_tags,
+        context_window=chunk.context_window,
+        embedding=chunk.embedding,
+        embedding_model=chunk.embedding_model
+    ) for chunk in source.chunks]
+    document.chunks = rows
+    document.segments = [models.DocumentSegment(
+        segment_index=segment.segment_index,
+        fingerprint=segment.fingerprint,
+        content=segment.content,
+        details=segment.details
+    ) for segment in source.segments]
+    logger.info(f"Copied {len(rows)} chunks for {document.filename} from document {source.id}")
+    return rows
+
+
+def ensure_document_chunks(db: Session, documents: List[models.Document]) -> int:
+    """Backfill chunks for documents uploaded before chunking existed."""
+    backfilled = 0
+    for document in documents:
+        if document.chunks or not document.content:
+            continue
+        store_document_chunks(document, document.content, None)
+        db.add(document)
+        backfilled += 1
+    if backfilled:
+        db.commit()
+        logger.info(f"Backfilled chunks for {backfilled} legacy documents")
+    return backfilled
+
+
+def embed_chunks(chunks: List[models.DocumentChunk]) -> int:
+    """Embed chunk rows in batches and store the vectors on the rows; failures leave them for a later sync."""
+    if not chunks:
+        return 0
+    try:
+        embedder = vector_index.get_embedder()
+        vectors = embedder.embed([chunk.content for chunk in chunks])
+    except Exception as e:
+        logger.warning(f"Chunk embedding failed, vectors will be filled on next query: {e}")
+        return 0
+    for chunk, vector in zip(chunks, vectors):
+        chunk.embedding = vector_index.vector_to_bytes(vector)
+        chunk.embedding_model = embedder.name
+    return len(chunks)
+
+
+def get_corpus_tokens(db: Session, user_id: int) -> int:
+    """Token estimate for sending every document in full, the baseline the context packer is measured against."""
+    total_chars = db.query(func.coalesce(func.sum(func.length(models.Document.content)), 0)) \
+        .filter(models.Document.user_id == user_id).scalar()
+    return math.ceil(int(total_chars) / context_packer.CHARS_PER_TOKEN)
+
+
+def get_user_document_ids(db: Session, user_id: int) -> Set[int]:
+    return {doc_id for (doc_id,) in db.query(models.Document.id).filter(models.Document.user_id == user_id).all()}
+
+
+def sync_lexical_index(db: Session, user_id: int, current_ids: Set[int]) -> lexical_index.LexicalIndex:
+    """Bring the in-process index in line with the user's documents in the database.
+
+    Each worker process keeps its own index, so documents uploaded or deleted through
+    another worker are picked up here before searching.
+    """
+    index = lexical_index.get_user_index(user_id)
+    indexed_ids = index.document_ids
+    for doc_id in indexed_ids - current_ids:
+        index.remove_document(doc_id)
+    missing_ids = current_ids - indexed_ids
+    if missing_ids:
+        rows = db.query(models.DocumentChunk.document_id, models.DocumentChunk.id, models.DocumentChunk.content) \
+            .filter(models.DocumentChunk.document_id.in_(missing_ids)).all()
+        chunks_by_document: Dict[int, List[Tuple[int, str]]] = {doc_id: [] for doc_id in missing_ids}
+        for doc_id, chunk_id, content in rows:
+            chunks_by_document[doc_id].append((chunk_id, content))
+        for doc_id, chunks in chunks_by_document.items():
+            if chunks:
+                index.add_document(doc_id, chunks)
+        logger.info(f"Loaded {len(missing_ids)} documents into lexical index for user {user_id}")
+    return index
+
+
+def sync_vector_index(db: Session, user_id: int, current_ids: Set[int]) -> vector_index.VectorIndex:
+    embedder = vector_index.get_embedder()
+    index = vector_index.get_user_index(user_id, embedder.dimension)
+    indexed_ids = index.document_ids
+    for doc_id in indexed_ids - current_ids:
+        index.remove_document(doc_id)
+    missing_ids = current_ids - indexed_ids
+    if missing_ids:
+        chunks = db.query(models.DocumentChunk).filter(models.DocumentChunk.document_id.in_(missing_ids)) \
+            .order_by(models.DocumentChunk.document_id, models.DocumentChunk.chunk_index).all()
+        stale = [chunk for chunk in chunks if chunk.embedding is None or chunk.embedding_model != embedder.name]
+        if stale and embed_chunks(stale):
+            db.commit()
+            logger.info(f"Embedded {len(stale)} chunks missing vectors for user {user_id}")
+        chunks_by_document: Dict[int, List[models.DocumentChunk]] = {}
+        for chunk in chunks:
+            if chunk.embedding is not None and chunk.embedding_model == embedder.name:
+                chunks_by_document.setdefault(chunk.document_id, []).append(chunk)
+        for doc_id, doc_chunks in chunks_by_document.items():
+            index.add_document(doc_id, [chunk.id for chunk in doc_chunks], _stack_embeddings(doc_chunks))
+    return index
+
+
+def _stack_embeddings(chunks: List[models.DocumentChunk]) -> np.ndarray:
+    return np.vstack([vector_index.vector_from_bytes(chunk.embedding) for chunk in chunks])
+
+
+def index_document(user_id: int, document: models.Document):
+    chunks = list(document.chunks)
+    lexical_index.get_user_index(user_id).add_document(
+        document.id, [(chunk.id, chunk.content) for chunk in chunks]
+    )
+    embedder = vector_index.get_embedder()
+    if chunks and all(chunk.embedding is not None and chunk.embedding_model == embedder.name for chunk in chunks):
+        vector_index.get_user_index(user_id, embedder.dimension).add_document(
+            document.id, [chunk.id for chunk in chunks], _stack_embeddings(chunks)
+        )
+
+
+def remove_document_from_index(user_id: int, document_id: int):
+    lexical_index.get_user_index(user_id).remove_document(document_id)
+    vector_index.get_user_index(user_id, vector_index.get_embedder().dimension).remove_document(document_id)
+
+
+def search_vector_index(index: vector_index.VectorIndex, question: str, top_k: int) -> List[Tuple[int, float]]:
+    query_vector = vector_index.get_embedder().embed([question])[0]
+    return index.search(query_vector, top_k)
+
+
+@dataclass
+class RetrievalResult:
+    passages: List[document_processor.RetrievedPassage]
+    strategy: str
+    timings_ms: Dict[str, float] = field(default_factory=dict)
+
+    @property
+    def sources(self) -> List[str]:
+        return list(dict.fromkeys(passage.source for passage in self.passages))
+
+
+_stats_lock = threading.Lock()
+_stage_totals_ms: Dict[str, float] = {}
+_stage_counts: Dict[str, int] = {}
+_strategy_counts: Dict[str, int] = {}
+_vector_cost_estimate_ms: Dict[int, float] = {}
+_vector_skips: Dict[int, int] = {}
+
+
+def reciprocal_rank_fusion(rankings: List[List[int]], k: int = RRF_K) -> List[Tuple[int, float]]:
+    scores: Dict[int, float] = {}
+    for ranking in rankings:
+        for rank, chunk_id in enumerate(ranking):
+            scores[chunk_id] = scores.get(chunk_id, 0.0) + 1.0 / (k + rank + 1)
+    return sorted(scores.items(), key=lambda item: item[1], reverse=True)
+
+
+def fuse_rankings(lexical_ranking: List[int], vector_ranking: List[int],
+                  top_k: int) -> Tuple[str, List[Tuple[int, float]]]:
+    if lexical_ranking and vector_ranking:
+        return "hybrid", reciprocal_rank_fusion([lexical_ranking, vector_ranking])[:top_k]
+    if lexical_ranking or vector_ranking:
+        strategy = "lexical_only" if lexical_ranking else "vector_only"
+        return strategy, [(chunk_id, 1.0 / (RRF_K + rank + 1))
+                          for rank, chunk_id in enumerate((lexical_ranking or vector_ranking)[:top_k])]
+    return "importance_fallback", []
+
+
+def _to_passage(chunk: models.DocumentChunk, score: float) -> document_processor.RetrievedPassage:
+    return document_processor.RetrievedPassage(
+        content=chunk.content,
+        source=chunk.document.filename if chunk.document else "document",
+        score=score,
+        document_id=chunk.document_id,
+        chunk_index=chunk.chunk_index,
+        importance_score=chunk.importance_score if chunk.importance_score is not None else 0.5
+    )
+
+
+def load_passages(db: Session, user_id: int, fused_lists: List[List[Tuple[int, float]]],
+                  top_k: int) -> List[List[document_processor.RetrievedPassage]]:
+    """Load the chunks for several fused rankings with one query; empty rankings get the most important chunks."""
+    wanted_ids = {chunk_id for fused in fused_lists for chunk_id, _ in fused}
+    chunks_by_id = {chunk.id: chunk for chunk in
+                    db.query(models.DocumentChunk).filter(models.DocumentChunk.id.in_(wanted_ids)).all()} \
+        if wanted_ids else {}
+    fallback: Optional[List[models.DocumentChunk]] = None
+    results = []
+    for fused in fused_lists:
+        if fused:
+            results.append([_to_passage(chunks_by_id[chunk_id], score)
+                            for chunk_id, score in sorted(fused, key=lambda item: item[1], reverse=True)
+                            if chunk_id in chunks_by_id])
+            continue
+        if fallback is None:
+            fallback = db.query(models.DocumentChunk).filter(models.DocumentChunk.user_id == user_id) \
+                .order_by(models.DocumentChunk.importance_score.desc()).limit(top_k).all()
+        results.append([_to_passage(chunk, 0.0) for chunk in fallback])
+    return results
+
+
+def _record_stats(result: RetrievalResult):
+    with _stats_lock:
+        for stage, elapsed in result.timings_ms.items():
+            _stage_totals_ms[stage] = _stage_totals_ms.get(stage, 0.0) + elapsed
+            _stage_counts[stage] = _stage_counts.get(stage, 0) + 1
+        _strategy_counts[result.strategy] = _strategy_counts.get(result.strategy, 0) + 1
+
+
+def get_retrieval_stats() -> Dict[str, Any]:
+    with _stats_lock:
+        return {
+            "budget_ms": RETRIEVAL_BUDGET_MS,
+            "avg_stage_ms": {stage: round(total / _stage_counts[stage], 3) for stage, total in _stage_totals_ms.items()},
+            "strategies": dict(_strategy_counts)
+        }
+
+
+def _plan_vector_stage(user_id: int, elapsed_ms: float, budget_ms: float) -> Tuple[bool, bool]:
+    """``(run, probe)`` for the vector stage of a retrieval that has spent ``elapsed_ms`` so far.
+
+    The stage is skipped while the user's estimate says it would blow the budget, except
+    every ``RETRIEVAL_VECTOR_PROBE_INTERVAL`` skips, when it runs to measure the cost again.
+    """
+    with _stats_lock:
+        estimate_ms = _vector_cost_estimate_ms.get(user_id, 0.0)
+        if elapsed_ms + estimate_ms <= budget_ms:
+            return True, False
+        skips = _vector_skips.get(user_id, 0) + 1
+        _vector_skips[user_id] = skips
+        if skips >= RETRIEVAL_VECTOR_PROBE_INTERVAL:
+            return True, True
+    logger.info(f"Skipping vector stage for user {user_id}: {elapsed_ms:.1f}ms spent, "
+                f"~{estimate_ms:.1f}ms estimated, {budget_ms}ms budget")
+    return False, False
+
+
+def _record_vector_cost(user_id: int, search_ms: float, probe: bool):
+    """Fold a vector search time into the user's estimate; a probe replaces it outright."""
+    with _stats_lock:
+        previous = _vector_cost_estimate_ms.get(user_id)
+        _vector_cost_estimate_ms[user_id] = search_ms if previous is None or probe \
+            else 0.8 * previous + 0.2 * search_ms
+        _vector_skips[user_id] = 0
+
+
+def hybrid_retrieve(db: Session, user_id: int, question: str, top_k: int = RAG_TOP_K,
+                    budget_ms: float = RETRIEVAL_BUDGET_MS) -> RetrievalResult:
+    """Fuse lexical and vector rankings with RRF, skipping the vector stage when it would blow the budget."""
+    timings: Dict[str, float] = {}
+    started = time.perf_counter()
+    depth = top_k * RRF_CANDIDATE_MULTIPLIER
+
+    stage_start = time.perf_counter()
+    current_ids = get_user_document_ids(db, user_id)
+    lexical = sync_lexical_index(db, user_id, current_ids)
+    timings["sync"] = (time.perf_counter() - stage_start) * 1000
+
+    stage_start = time.perf_counter()
+    lexical_ranking = [chunk_id for chunk_id, _ in lexical.search(question, depth)]
+    timings["lexical"] = (time.perf_counter() - stage_start) * 1000
+
+    vector_ranking: List[int] = []
+    run_vector, probe = _plan_vector_stage(user_id, (time.perf_counter() - started) * 1000, budget_ms) \
+        if lexical_ranking else (True, False)
+    if run_vector:
+        # Only the search feeds the estimate: syncing the index may embed a backlog of chunks,
+        # which says nothing about what the next query will cost.
+        search_start = None
+        stage_start = time.perf_counter()
+        try:
+            index = sync_vector_index(db, user_id, current_ids)
+            timings["vector_sync"] = (time.perf_counter() - stage_start) * 1000
+            search_start = time.perf_counter()
+            vector_ranking = [chunk_id for chunk_id, _ in search_vector_index(index, question, depth)]
+        except Exception as e:
+            logger.warning(f"Vector retrieval failed, using lexical results only: {e}")
+        if search_start is not None:
+            timings["vector"] = (time.perf_counter() - search_start) * 1000
+            _record_vector_cost(user_id, timings["vector"], probe)
+
+    stage_start = time.perf_counter()
+    strategy, fused = fuse_rankings(lexical_ranking, vector_ranking, top_k)
+    timings["fusion"] = (time.perf_counter() - stage_start) * 1000
+
+    stage_start = time.perf_counter()
+    passages = load_passages(db, user_id, [fused], top_k)[0]
+    timings["load"] = (time.perf_counter() - stage_start) * 1000
+    timings["total"] = (time.perf_counter() - started) * 1000
+
+    result = RetrievalResult(passages=passages, strategy=strategy,
+                             timings_ms={stage: round(value, 3) for stage, value in timings.items()})
+    _record_stats(result)
+    return result
+
+
+def hybrid_retrieve_batch(db: Session, user_id: int, questions: List[str], top_k: int = RAG_TOP_K,
+                          budget_ms: float = RETRIEVAL_BUDGET_MS) -> List[RetrievalResult]:
+    """``hybrid_retrieve`` for several questions sharing one index sync, one embedding call,
+    one matrix product for vector scoring and one chunk load.
+
+    Shared stage timings are reported per question as their share of the batch, and the
+    vector stage is run or skipped for the whole batch by comparing each question's share
+    against the same budget and estimate as a single question.
+    """
+    if not questions:
+        return []
+    timings: Dict[str, float] = {}
+    started = time.perf_counter()
+    depth = top_k * RRF_CANDIDATE_MULTIPLIER
+
+    stage_start = time.perf_counter()
+    current_ids = get_user_document_ids(db, user_id)
+    lexical = sync_lexical_index(db, user_id, current_ids)
+    timings["sync"] = (time.perf_counter() - stage_start) * 1000
+
+    stage_start = time.perf_counter()
+    lexical_rankings = [[chunk_id for chunk_id, _ in lexical.search(question, depth)] for question in questions]
+    timings["lexical"] = (time.perf_counter() - stage_start) * 1000
+
+    vector_rankings: List[List[int]] = [[] for _ in questions]
+    elapsed_share_ms = (time.perf_counter() - started) * 1000 / len(questions)
+    run_vector, probe = _plan_vector_stage(user_id, elapsed_share_ms, budget_ms) \
+        if any(lexical_rankings) else (True, False)
+    if run_vector:
+        search_start = None
+        stage_start = time.perf_counter()
+        try:
+            index = sync_vector_index(db, user_id, current_ids)
+            timings["vector_sync"] = (time.perf_counter() - stage_start) * 1000
+            search_start = time.perf_counter()
+            query_matrix = vector_index.get_embedder().embed(questions)
+            vector_rankings = [[chunk_id for chunk_id, _ in hits]
+                               for hits in index.search_batch(query_matrix, depth)]
+        except Exception as e:
+            logger.warning(f"Batched vector retrieval failed, using lexical results only: {e}")
+        if search_start is not None:
+            timings["vector"] = (time.perf_counter() - search_start) * 1000
+            _record_vector_cost(user_id, timings["vector"] / len(questions), probe)
+
+    stage_start = time.perf_counter()
+    fused_results = [fuse_rankings(lexical_ranking, vector_ranking, top_k)
+                     for lexical_ranking, vector_ranking in zip(lexical_rankings, vector_rankings)]
+    timings["fusion"] = (time.perf_counter() - stage_start) * 1000
+
+    stage_start = time.perf_counter()
+    passage_lists = load_passages(db, user_id, [fused for _, fused in fused_results], top_k)
+    timings["load"] = (time.perf_counter() - stage_start) * 1000
+    timings["total"] = (time.perf_counter() - started) * 1000
+
+    per_question = {stage: round(value / len(questions), 3) for stage, value in timings.items()}
+    results = [RetrievalResult(passages=passages, strategy=strategy, timings_ms=dict(per_question))
+               for (strategy, _), passages in zip(fused_results, passage_lists)]
+    for result in results:
+        _record_stats(result)
+    return results
@@ -0,0 +1,70 @@
+import threading
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple, TypeVar
+
+T = TypeVar("T")
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result: Any = None
+        self.error: Optional[BaseException] = None
+        self.followers = 0
+
+
+class SingleFlight:
+    """Run a function at most once per key at a time.
+
+    The first caller for a key (the leader) runs the function. Anyone who calls with the same
+    key while it is still running waits for the leader and receives the same result or
+    exception. The key is forgotten as soon as the leader finishes, so this only shares
+    work that overlaps in time; use the answer cache for later repeats.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self._calls: Dict[Hashable, _Call] = {}
+        self._lock = threading.Lock()
+        self.stats = {"executions": 0, "calls_saved": 0, "shared_errors": 0}
+
+    def do(self, key: Hashable, fn: Callable[[], T]) -> Tuple[T, bool]:
+        """Return ``(result, shared)``; ``shared`` is True when another caller's run was reused."""
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+                self.stats["executions"] += 1
+            else:
+                call.followers += 1
+                self.stats["calls_saved"] += 1
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result, True
+
+        try:
+            call.result = fn()
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+                if call.error is not None:
+                    self.stats["shared_errors"] += call.followers
+            call.done.set()
+        return call.result, False
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {"in_flight": len(self._calls), **self.stats}
+
+
+answer_flights = SingleFlight("answers")
+
+
+def get_single_flight_stats() -> Dict[str, Any]:
+    return answer_flights.get_stats()
@@ -0,0 +1,206 @@
+import re
+import threading
+from collections import Counter
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+DOCUMENT_TYPE_TERMS = {
+    "academic_paper": ['abstract', 'methodology', 'literature review', 'hypothesis', 'conclusion', 'references',
+                       'citation'],
+    "legal_contract": ['whereas', 'party', 'agreement', 'contract', 'terms and conditions', 'liability',
+                       'jurisdiction'],
+    "financial_report": ['revenue', 'profit', 'loss', 'balance sheet', 'cash flow', 'assets', 'liabilities',
+                         'equity'],
+    "technical_manual": ['procedure', 'specification', 'installation', 'configuration', 'troubleshooting',
+                         'manual'],
+    "policy_document": ['policy', 'guideline', 'procedure', 'compliance', 'regulation', 'requirement',
+                        'entitlement'],
+    "medical_record": ['patient', 'diagnosis', 'treatment', 'medication', 'symptoms', 'medical history',
+                       'prescription']
+}
+TECHNICAL_TERMS = ['algorithm', 'methodology', 'implementation', 'specification', 'configuration',
+                   'optimization', 'analysis', 'framework', 'architecture', 'infrastructure']
+SPECIALIZED_TERMS = ['pursuant', 'heretofore', 'notwithstanding', 'aforementioned', 'whereby',
+                     'coefficient', 'derivative', 'integral', 'hypothesis', 'paradigm']
+KNOWLEDGE_DOMAIN_INDICATORS = {
+    "Human Resources": ["hr", "employee", "salary", "benefits", "leave", "performance", "recruitment"],
+    "Finance": ["budget", "cost", "revenue", "profit", "expense", "financial", "accounting"],
+    "Legal": ["contract", "agreement", "legal", "compliance", "regulation", "law", "terms"],
+    "Technology": ["system", "software", "hardware", "network", "database", "application", "technical"],
+    "Healthcare": ["medical", "health", "patient", "treatment", "diagnosis", "clinical", "healthcare"],
+    "Travel": ["travel", "trip", "accommodation", "transport", "per diem", "allowance", "lodging"],
+    "Operations": ["process", "procedure", "workflow", "operation", "management", "quality", "standard"],
+    "Research": ["research", "study", "analysis", "methodology", "findings", "data", "results"]
+}
+TABLE_INDICATORS = ["rate", "cost", "zone", "tier", "level", "grade", "$", "₹", "allowance",
+                    "amount", "price", "fee", "charge", "expense", "budget"]
+POLICY_INDICATORS = ["policy", "procedure", "guideline", "rule", "entitlement", "shall",
+                     "must", "required", "mandatory", "compliance", "regulation"]
+LOCATION_INDICATORS = ["zone", "region", "city", "country", "state", "province",
+                       "new york", "delhi", "london", "mumbai", "bangalore", "chennai"]
+HINDI_INDICATORS = ['के लिए', 'में', 'क्या', 'है', 'दर', 'और', 'का', 'की', 'से', 'पर']
+LANGUAGE_INDICATORS = {
+    "Hindi/Hinglish": ['के', 'का', 'की', 'में', 'से', 'को', 'और', 'है', 'हैं', 'आवास', 'दर'],
+    "Spanish": ['el', 'la', 'los', 'las', 'de', 'en', 'y', 'que', 'para', 'con'],
+    "French": ['le', 'la', 'les', 'de', 'et', 'en', 'un', 'une', 'pour', 'avec'],
+    "German": ['der', 'die', 'das', 'und', 'in', 'zu', 'den', 'von', 'mit', 'für']
+}
+LANGUAGE_SAMPLE_CHARS = 1000
+
+WORD_RUN_PATTERN = re.compile(r'\w+')
+
+
+class KeywordMatcher:
+    """Substring matcher for many keyword groups at once.
+
+    Keywords made only of word characters can never span whitespace, so the text is first
+    reduced to its distinct whitespace-delimited tokens and one compiled trie (wrapped in a
+    lookahead so overlapping hits are reported) is run over that much smaller vocabulary.
+    Keywords containing spaces or symbols are checked directly.
+    Matching is plain substring containment, the same as ``keyword in text``.
+    """
+
+    def __init__(self, groups: Dict[str, Iterable[str]]):
+        self.groups: Dict[str, List[str]] = {name: list(keywords) for name, keywords in groups.items()}
+        self.keyword_groups: Dict[str, List[str]] = {}
+        for name, keywords in self.groups.items():
+            for keyword in keywords:
+                self.keyword_groups.setdefault(keyword, []).append(name)
+        word_keywords = [keyword for keyword in self.keyword_groups if WORD_RUN_PATTERN.fullmatch(keyword)]
+        self.literal_keywords = [keyword for keyword in self.keyword_groups if keyword not in word_keywords]
+        # Only the longest keyword at each start position is captured; every keyword that is
+        # a prefix of it matched at the same position too.
+        self.prefix_closure: Dict[str, List[str]] = {
+            keyword: [other for other in word_keywords if keyword.startswith(other)] for keyword in word_keywords
+        }
+        self.pattern = re.compile(f"(?=({build_trie_pattern(word_keywords)}))") if word_keywords else None
+
+    def match(self, text_lower: str, vocabulary: Optional[str] = None) -> Dict[str, Set[str]]:
+        """Return the matched keywords per group; ``vocabulary`` is the joined distinct tokens, if precomputed."""
+        found: Set[str] = set()
+        if self.pattern is not None:
+            if vocabulary is None:
+                vocabulary = build_vocabulary(text_lower)
+            for longest in set(self.pattern.findall(vocabulary)):
+                found.update(self.prefix_closure[longest])
+        found.update(keyword for keyword in self.literal_keywords if keyword in text_lower)
+        hits: Dict[str, Set[str]] = {name: set() for name in self.groups}
+        for keyword in found:
+            for name in self.keyword_groups[keyword]:
+                hits[name].add(keyword)
+        return hits
+
+
+def build_trie_pattern(keywords: Iterable[str]) -> str:
+    trie: Dict[str, dict] = {}
+    for keyword in keywords:
+        node = trie
+        for char in keyword:
+            node = node.setdefault(char, {})
+        node[''] = {}
+
+    def render(node: Dict[str, dict]) -> str:
+        branches = [re.escape(char) + render(child) for char, child in sorted(node.items()) if char]
+        if not branches:
+            return ''
+        body = branches[0] if len(branches) == 1 else f"(?:{'|'.join(branches)})"
+        return f"(?:{body})?" if '' in node else body
+
+    return render(trie)
+
+
+def build_vocabulary(text_lower: str) -> str:
+    return '\n'.join(set(text_lower.split()))
+
+
+def _group_names(prefix: str, names: Iterable[str]) -> Dict[str, str]:
+    return {name: f"{prefix}:{name}" for name in names}
+
+
+DOCUMENT_TYPE_GROUPS = _group_names("type", DOCUMENT_TYPE_TERMS)
+DOMAIN_GROUPS = _group_names("domain", KNOWLEDGE_DOMAIN_INDICATORS)
+LANGUAGE_GROUPS = _group_names("language", LANGUAGE_INDICATORS)
+
+DOCUMENT_MATCHER = KeywordMatcher({
+    **{DOCUMENT_TYPE_GROUPS[name]: terms for name, terms in DOCUMENT_TYPE_TERMS.items()},
+    **{DOMAIN_GROUPS[name]: terms for name, terms in KNOWLEDGE_DOMAIN_INDICATORS.items()},
+    "complexity:technical": TECHNICAL_TERMS,
+    "complexity:specialized": SPECIALIZED_TERMS,
+    "structure:tables": TABLE_INDICATORS,
+    "structure:policies": POLICY_INDICATORS,
+    "structure:locations": LOCATION_INDICATORS,
+    "structure:hindi": HINDI_INDICATORS
+})
+LANGUAGE_MATCHER = KeywordMatcher({LANGUAGE_GROUPS[name]: terms for name, terms in LANGUAGE_INDICATORS.items()})
+
+
+@dataclass
+class TextAnalysis:
+    """Every keyword score the document_processor classifiers need, from one pass over the text."""
+
+    word_count: int
+    sentence_count: int
+    sentence_word_count: int
+    hits: Dict[str, Set[str]] = field(default_factory=dict)
+    language_hits: Dict[str, Set[str]] = field(default_factory=dict)
+
+    @property
+    def document_type_scores(self) -> Dict[str, int]:
+        return {name: len(self.hits[group]) for name, group in DOCUMENT_TYPE_GROUPS.items()}
+
+    @property
+    def technical_count(self) -> int:
+        return len(self.hits["complexity:technical"])
+
+    @property
+    def specialized_count(self) -> int:
+        return len(self.hits["complexity:specialized"])
+
+    @property
+    def avg_sentence_length(self) -> float:
+        return self.sentence_word_count / self.sentence_count if self.sentence_count else 0
+
+    @property
+    def domain_hits(self) -> Dict[str, List[str]]:
+        return {name: [indicator for indicator in KNOWLEDGE_DOMAIN_INDICATORS[name] if indicator in self.hits[group]]
+                for name, group in DOMAIN_GROUPS.items()}
+
+    @property
+    def language_scores(self) -> Dict[str, int]:
+        return {name: len(self.language_hits[group]) for name, group in LANGUAGE_GROUPS.items()}
+
+    def has(self, structure_group: str) -> bool:
+        return bool(self.hits[f"structure:{structure_group}"])
+
+
+_cache_lock = threading.Lock()
+_last_analysis: Tuple[Optional[str], Optional[TextAnalysis]] = (None, None)
+
+
+def analyze_text(text: str) -> TextAnalysis:
+    """Lowercase and scan ``text`` once for every keyword dictionary.
+
+    The classifiers are usually called back to back on the same string object, so the most
+    recent result is memoised by identity and each later classifier call is free.
+    """
+    global _last_analysis
+    cached_text, cached_analysis = _last_analysis
+    if cached_text is text and cached_analysis is not None:
+        return cached_analysis
+    text_lower = text.lower()
+    token_counts = Counter(text_lower.split())
+    # Words per '.'-separated sentence, counted without materialising the split sentences.
+    sentence_word_count = sum(
+        count * (sum(1 for part in token.split('.') if part) if '.' in token else 1)
+        for token, count in token_counts.items()
+    )
+    analysis = TextAnalysis(
+        word_count=sum(token_counts.values()),
+        sentence_count=text.count('.') + 1,
+        sentence_word_count=sentence_word_count,
+        hits=DOCUMENT_MATCHER.match(text_lower, '\n'.join(token_counts)),
+        language_hits=LANGUAGE_MATCHER.match(text[:LANGUAGE_SAMPLE_CHARS].lower())
+    )
+    with _cache_lock:
+        _last_analysis = (text, analysis)
+    return analysis
@@ -0,0 +1,115 @@
+import os
+import hashlib
+import logging
+import tempfile
+from dataclasses import dataclass
+from typing import BinaryIO, Callable, Optional, Tuple
+
+from app.core.config import MAX_UPLOAD_BYTES, UPLOAD_CHUNK_BYTES, UPLOAD_SPOOL_DIR
+
+logger = logging.getLogger(__name__)
+
+FILE_TYPES_BY_EXTENSION = {".pdf": "PDF", ".docx": "DOCX"}
+# A PDF header may follow a little leading junk; DOCX is a zip whose first entry starts the file.
+PDF_MAGIC = b"%PDF-"
+PDF_MAGIC_WINDOW = 1024
+ZIP_MAGIC = b"PK\x03\x04"
+
+
+class UploadRejected(ValueError):
+    def __init__(self, message: str, status_code: int = 400):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+@dataclass
+class SpooledUpload:
+    path: str
+    filename: str
+    content_type: str
+    file_type: str
+    size: int
+    sha256: str
+
+    def discard(self):
+        discard_spool_file(self.path)
+
+
+def discard_spool_file(path: Optional[str]):
+    if not path:
+        return
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+def file_type_from_name(filename: Optional[str]) -> Optional[str]:
+    if not filename:
+        return None
+    return FILE_TYPES_BY_EXTENSION.get(os.path.splitext(filename.lower())[1])
+
+
+def sniff_matches(file_type: str, head: bytes) -> bool:
+    if file_type == "PDF":
+        return PDF_MAGIC in head[:PDF_MAGIC_WINDOW]
+    if file_type == "DOCX":
+        return head.startswith(ZIP_MAGIC)
+    return False
+
+
+def spool_upload(source: BinaryIO, filename: Optional[str], content_type: str,
+                 declared_size: Optional[int] = None, max_bytes: int = MAX_UPLOAD_BYTES,
+                 chunk_bytes: int = UPLOAD_CHUNK_BYTES, spool_dir: str = UPLOAD_SPOOL_DIR) -> SpooledUpload:
+    """Copy an upload to a spool file chunk by chunk, checking it on the way.
+
+    The size limit is enforced while reading (and up front when the size is declared), the
+    first chunk must carry the magic bytes of the type the extension claims, and the
+    SHA-256 is computed in the same pass. At most one chunk is held in memory. Raises
+    ``UploadRejected`` with the HTTP status to return; nothing is left on disk in that case.
+    """
+    if not filename:
+        raise UploadRejected("No filename provided")
+    file_type = file_type_from_name(filename)
+    if file_type is None:
+        raise UploadRejected("Unsupported file format. Only PDF and DOCX files are allowed.")
+    if declared_size is not None and declared_size > max_bytes:
+        raise UploadRejected(f"File size exceeds {max_bytes / (1024 * 1024):g}MB limit", status_code=413)
+    path, size, sha256 = copy_to_spool(source, os.path.splitext(filename.lower())[1],
+                                       lambda head: sniff_matches(file_type, head), file_type, "File size",
+                                       max_bytes, chunk_bytes, spool_dir)
+    return SpooledUpload(path=path, filename=filename, content_type=content_type, file_type=file_type,
+                         size=size, sha256=sha256)
+
+
+def copy_to_spool(source: BinaryIO, extension: str, head_matches: Callable[[bytes], bool], kind: str, label: str,
+                  max_bytes: int, chunk_bytes: int = UPLOAD_CHUNK_BYTES,
+                  spool_dir: str = UPLOAD_SPOOL_DIR) -> Tuple[str, int, str]:
+    """Copy a stream to a new spool file and return its ``(path, size, sha256)``.
+
+    Stops with ``UploadRejected`` as soon as more than ``max_bytes`` have been read or
+    the first chunk fails ``head_matches``, removing the partial file.
+    """
+    os.makedirs(spool_dir, exist_ok=True)
+    fd, path = tempfile.mkstemp(prefix="upload-", suffix=extension, dir=spool_dir)
+    hasher = hashlib.sha256()
+    size = 0
+    try:
+        with os.fdopen(fd, "wb") as spool:
+            while True:
+                chunk = source.read(chunk_bytes)
+                if not chunk:
+                    break
+                if size == 0 and not head_matches(chunk):
+                    raise UploadRejected(f"File content does not look like a {kind} file")
+                size += len(chunk)
+                if size > max_bytes:
+                    raise UploadRejected(f"{label} exceeds {max_bytes / (1024 * 1024):g}MB limit", status_code=413)
+                hasher.update(chunk)
+                spool.write(chunk)
+        if size == 0:
+            raise UploadRejected("File is empty")
+    except BaseException:
+        discard_spool_file(path)
+        raise
+    return path, size, hasher.hexdigest()
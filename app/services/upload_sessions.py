@@ -0,0 +1,223 @@
+import os
+import re
+import socket
+import hashlib
+import logging
+import uuid
+from datetime import datetime, timedelta
+from enum import Enum
+from typing import List, Optional, Tuple
+
+from sqlalchemy.orm import Session
+
+from app.db import models
+from app.core.config import (MAX_UPLOAD_BYTES, UPLOAD_CHUNK_BYTES, UPLOAD_SPOOL_DIR, UPLOAD_SESSION_CHUNK_BYTES,
+                             UPLOAD_SESSION_TTL_SECONDS, UPLOAD_SESSION_MAX_OPEN)
+from app.services.upload_intake import (PDF_MAGIC_WINDOW, SpooledUpload, UploadRejected, discard_spool_file,
+                                        file_type_from_name, sniff_matches)
+
+logger = logging.getLogger(__name__)
+
+CONTENT_RANGE_PATTERN = re.compile(r"^bytes (\d+)-(\d+)/(\d+)$")
+SHA256_PATTERN = re.compile(r"^[0-9a-f]{64}$")
+
+
+class SessionStatus(str, Enum):
+    OPEN = "open"
+    FINALIZED = "finalized"
+    ABORTED = "aborted"
+    EXPIRED = "expired"
+
+
+def create_session(db: Session, user: models.User, filename: Optional[str], total_size: int,
+                   content_type: Optional[str] = None, sha256: Optional[str] = None) -> models.UploadSession:
+    """Open an upload session and reserve its spool file; the caller commits.
+
+    The file is created at its final size up front, so every range can be written in
+    place as it arrives and in any order.
+    """
+    if not filename:
+        raise UploadRejected("No filename provided")
+    file_type = file_type_from_name(filename)
+    if file_type is None:
+        raise UploadRejected("Unsupported file format. Only PDF and DOCX files are allowed.")
+    if total_size <= 0:
+        raise UploadRejected("File is empty")
+    if total_size > MAX_UPLOAD_BYTES:
+        raise UploadRejected(f"File size exceeds {MAX_UPLOAD_BYTES / (1024 * 1024):g}MB limit", status_code=413)
+    if sha256 is not None:
+        sha256 = sha256.lower()
+        if not SHA256_PATTERN.match(sha256):
+            raise UploadRejected("sha256 must be 64 hexadecimal characters")
+    open_sessions = db.query(models.UploadSession) \
+        .filter(models.UploadSession.user_id == user.id,
+                models.UploadSession.status == SessionStatus.OPEN.value) \
+        .count()
+    if open_sessions >= UPLOAD_SESSION_MAX_OPEN:
+        raise UploadRejected("Too many unfinished uploads. Finish or cancel one first.", status_code=429)
+
+    session_id = uuid.uuid4().hex
+    os.makedirs(UPLOAD_SPOOL_DIR, exist_ok=True)
+    path = os.path.join(UPLOAD_SPOOL_DIR, f"session-{session_id}{os.path.splitext(filename.lower())[1]}")
+    with open(path, "wb") as spool:
+        spool.truncate(total_size)
+    now = datetime.utcnow()
+    session = models.UploadSession(
+        id=session_id,
+        user_id=user.id,
+        filename=filename,
+        content_type=content_type or "application/octet-stream",
+        file_type=file_type,
+        total_size=total_size,
+        chunk_size=UPLOAD_SESSION_CHUNK_BYTES,
+        sha256=sha256,
+        spool_path=path,
+        spool_host=socket.gethostname(),
+        received=[],
+        received_bytes=0,
+        status=SessionStatus.OPEN.value,
+        created_at=now,
+        updated_at=now,
+        expires_at=now + timedelta(seconds=UPLOAD_SESSION_TTL_SECONDS)
+    )
+    db.add(session)
+    return session
+
+
+def parse_content_range(header: Optional[str], total_size: int) -> Tuple[int, int]:
+    """Half-open ``(start, end)`` for a ``Content-Range: bytes first-last/total`` header."""
+    match = CONTENT_RANGE_PATTERN.match((header or "").strip())
+    if not match:
+        raise UploadRejected("Content-Range must look like 'bytes first-last/total'")
+    first, last, total = (int(value) for value in match.groups())
+    if total != total_size:
+        raise UploadRejected(f"Content-Range total {total} does not match the session size {total_size}")
+    if first > last or last >= total_size:
+        raise UploadRejected(f"Content-Range {first}-{last} is outside the file", status_code=416)
+    return first, last + 1
+
+
+def merge_range(ranges: List[List[int]], start: int, end: int) -> List[List[int]]:
+    """Add ``[start, end)`` to sorted, non-overlapping ranges, joining any it touches."""
+    merged = []
+    for range_start, range_end in sorted(ranges + [[start, end]]):
+        if merged and range_start <= merged[-1][1]:
+            merged[-1][1] = max(merged[-1][1], range_end)
+        else:
+            merged.append([range_start, range_end])
+    return merged
+
+
+def _require_local(session: models.UploadSession):
+    if session.spool_host != socket.gethostname():
+        raise UploadRejected("This upload is held by another server. Please start the upload again.",
+                             status_code=409)
+
+
+def _require_open(session: models.UploadSession):
+    if session.status != SessionStatus.OPEN.value:
+        raise UploadRejected(f"Upload session is {session.status}", status_code=409)
+
+
+def write_range(db: Session, session: models.UploadSession, content_range: Optional[str], data: bytes,
+                chunk_sha256: Optional[str]) -> models.UploadSession:
+    """Verify one range against its checksum, write it in place and record it; commits.
+
+    Ranges may arrive in any order and may be sent again; a range that fails its checksum
+    is not recorded, so the client only has to resend that range.
+    """
+    _require_open(session)
+    _require_local(session)
+    start, end = parse_content_range(content_range, session.total_size)
+    if end - start != len(data):
+        raise UploadRejected(f"Content-Range covers {end - start} bytes but {len(data)} were sent")
+    if len(data) > session.chunk_size:
+        raise UploadRejected(f"Ranges may be at most {session.chunk_size} bytes", status_code=413)
+    if hashlib.sha256(data).hexdigest() != (chunk_sha256 or "").lower():
+        raise UploadRejected("Range checksum does not match; please send this range again")
+
+    try:
+        with open(session.spool_path, "r+b") as spool:
+            spool.seek(start)
+            spool.write(data)
+    except FileNotFoundError:
+        raise UploadRejected("Upload session is no longer available", status_code=409)
+
+    # Lock the row so concurrent ranges for the same session do not lose each other's update, and
+    # reload it: the caller's copy was read before the lock and may miss a range written since.
+    session = db.query(models.UploadSession) \
+        .filter(models.UploadSession.id == session.id) \
+        .with_for_update() \
+        .populate_existing() \
+        .one()
+    _require_open(session)
+    session.received = merge_range([list(r) for r in session.received or []], start, end)
+    session.received_bytes = sum(range_end - range_start for range_start, range_end in session.received)
+    now = datetime.utcnow()
+    session.updated_at = now
+    session.expires_at = now + timedelta(seconds=UPLOAD_SESSION_TTL_SECONDS)
+    db.commit()
+    return session
+
+
+def finalize_session(db: Session, session: models.UploadSession) -> SpooledUpload:
+    """Check the assembled file and hand it over as a spooled upload; the caller commits.
+
+    The whole file is read once to compute its SHA-256, which must match the one declared
+    when the session was opened, if any. From here on the spool file belongs to the
+    ingestion job the caller creates; the session only keeps its id.
+    """
+    # Reloaded under the lock, so a concurrent or retried finalize sees this one's outcome.
+    session = db.query(models.UploadSession) \
+        .filter(models.UploadSession.id == session.id) \
+        .with_for_update() \
+        .populate_existing() \
+        .one()
+    _require_open(session)
+    _require_local(session)
+    if session.received_bytes != session.total_size:
+        missing = session.total_size - session.received_bytes
+        raise UploadRejected(f"Upload is incomplete: {missing} bytes have not been received", status_code=409)
+
+    hasher = hashlib.sha256()
+    with open(session.spool_path, "rb") as spool:
+        head = spool.read(PDF_MAGIC_WINDOW)
+        hasher.update(head)
+        for chunk in iter(lambda: spool.read(UPLOAD_CHUNK_BYTES), b""):
+            hasher.update(chunk)
+    if not sniff_matches(session.file_type, head):
+        abort_session(session)
+        raise UploadRejected(f"File content does not look like a {session.file_type} file")
+    digest = hasher.hexdigest()
+    if session.sha256 and digest != session.sha256:
+        abort_session(session)
+        raise UploadRejected("The assembled file does not match its SHA-256; please upload it again")
+
+    session.status = SessionStatus.FINALIZED.value
+    session.updated_at = datetime.utcnow()
+    return SpooledUpload(path=session.spool_path, filename=session.filename, content_type=session.content_type,
+                         file_type=session.file_type, size=session.total_size, sha256=digest)
+
+
+def abort_session(session: models.UploadSession, status: SessionStatus = SessionStatus.ABORTED):
+    """Drop the session's spool file and close it; the caller commits."""
+    if session.spool_host == socket.gethostname():
+        discard_spool_file(session.spool_path)
+    session.status = status.value
+    session.updated_at = datetime.utcnow()
+
+
+def expire_sessions(db: Session, host: str) -> int:
+    """Remove the spool files of this host's sessions that have not been touched in time; commits."""
+    expired = db.query(models.UploadSession) \
+        .filter(models.UploadSession.status == SessionStatus.OPEN.value,
+                models.UploadSession.spool_host == host,
+                models.UploadSession.expires_at < datetime.utcnow()) \
+        .with_for_update(skip_locked=True) \
+        .all()
+    for session in expired:
+        abort_session(session, SessionStatus.EXPIRED)
+        logger.info(f"Expired upload session {session.id} ({session.received_bytes}/{session.total_size} bytes)")
+    if expired:
+        db.commit()
+    return len(expired)
@@ -0,0 +1,221 @@
+import threading
+import logging
+import zlib
+from abc import ABC, abstractmethod
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from app.core.config import EMBEDDING_BACKEND, EMBEDDING_MODEL, EMBEDDING_DIMENSION, EMBEDDING_BATCH_SIZE
+from app.services.lexical_index import tokenize
+
+logger = logging.getLogger(__name__)
+
+
+class Embedder(ABC):
+    """Turns a batch of texts into an L2-normalised float32 matrix, one row per text."""
+
+    name: str = "base"
+    dimension: int = 0
+
+    @abstractmethod
+    def embed(self, texts: Sequence[str]) -> np.ndarray:
+        ...
+
+
+class HashingEmbedder(Embedder):
+    """Deterministic feature-hashing embedder for offline use and tests.
+
+    Unigrams and bigrams are hashed with crc32 (stable across processes, unlike ``hash``)
+    into a signed bag-of-words vector.
+    """
+
+    def __init__(self, dimension: int = EMBEDDING_DIMENSION):
+        self.dimension = dimension
+        self.name = f"hashing-{dimension}"
+
+    def embed(self, texts: Sequence[str]) -> np.ndarray:
+        matrix = np.zeros((len(texts), self.dimension), dtype=np.float32)
+        for row, text in enumerate(texts):
+            tokens = tokenize(text)
+            features = tokens + [f"{a}_{b}" for a, b in zip(tokens, tokens[1:])]
+            for feature in features:
+                digest = zlib.crc32(feature.encode("utf-8"))
+                sign = 1.0 if digest & 0x80000000 else -1.0
+                matrix[row, digest % self.dimension] += sign
+        return normalize_rows(matrix)
+
+
+class VertexEmbedder(Embedder):
+    def __init__(self, model_name: str = EMBEDDING_MODEL, dimension: int = EMBEDDING_DIMENSION,
+                 batch_size: int = EMBEDDING_BATCH_SIZE):
+        import vertexai
+        from vertexai.language_models import TextEmbeddingModel
+        from app.services.document_processor import PROJECT_ID, LOCATION
+
+        vertexai.init(project=PROJECT_ID, location=LOCATION)
+        self.model = TextEmbeddingModel.from_pretrained(model_name)
+        self.batch_size = batch_size
+        self.name = f"vertex-{model_name}-{dimension}"
+        self.dimension = dimension
+
+    def embed(self, texts: Sequence[str]) -> np.ndarray:
+        rows = []
+        for start in range(0, len(texts), self.batch_size):
+            batch = list(texts[start:start + self.batch_size])
+            embeddings = self.model.get_embeddings(batch, output_dimensionality=self.dimension)
+            rows.extend(embedding.values for embedding in embeddings)
+        if not rows:
+            return np.zeros((0, self.dimension), dtype=np.float32)
+        return normalize_rows(np.asarray(rows, dtype=np.float32))
+
+
+def normalize_rows(matrix: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return np.ascontiguousarray(matrix / norms, dtype=np.float32)
+
+
+class VectorIndex:
+    """Contiguous float32 matrix of chunk embeddings for one user.
+
+    Rows are appended into a doubling buffer; removed documents are masked out and the
+    buffer is compacted once dead rows pass ``compaction_ratio``.
+    """
+
+    def __init__(self, dimension: int, compaction_ratio: float = 0.25):
+        self.dimension = dimension
+        self.compaction_ratio = compaction_ratio
+        self.matrix = np.zeros((0, dimension), dtype=np.float32)
+        self.chunk_ids = np.zeros(0, dtype=np.int64)
+        self.alive = np.zeros(0, dtype=bool)
+        self.size = 0
+        self.document_rows: Dict[int, Tuple[int, int]] = {}
+        self._lock = threading.RLock()
+
+    @property
+    def document_ids(self):
+        with self._lock:
+            return set(self.document_rows)
+
+    def _reserve(self, extra: int):
+        capacity = self.matrix.shape[0]
+        if self.size + extra <= capacity:
+            return
+        new_capacity = max(self.size + extra, capacity * 2, 64)
+        matrix = np.zeros((new_capacity, self.dimension), dtype=np.float32)
+        matrix[:self.size] = self.matrix[:self.size]
+        chunk_ids = np.zeros(new_capacity, dtype=np.int64)
+        chunk_ids[:self.size] = self.chunk_ids[:self.size]
+        alive = np.zeros(new_capacity, dtype=bool)
+        alive[:self.size] = self.alive[:self.size]
+        self.matrix, self.chunk_ids, self.alive = matrix, chunk_ids, alive
+
+    def add_document(self, document_id: int, chunk_ids: Sequence[int], vectors: np.ndarray):
+        if len(chunk_ids) != len(vectors):
+            raise ValueError("chunk_ids and vectors must have the same length")
+        with self._lock:
+            if document_id in self.document_rows:
+                self.remove_document(document_id)
+            count = len(chunk_ids)
+            self._reserve(count)
+            start = self.size
+            self.matrix[start:start + count] = vectors
+            self.chunk_ids[start:start + count] = chunk_ids
+            self.alive[start:start + count] = True
+            self.size += count
+            self.document_rows[document_id] = (start, start + count)
+
+    def remove_document(self, document_id: int) -> bool:
+        with self._lock:
+            rows = self.document_rows.pop(document_id, None)
+            if rows is None:
+                return False
+            self.alive[rows[0]:rows[1]] = False
+            dead = self.size - int(self.alive[:self.size].sum())
+            if dead > self.compaction_ratio * max(self.size, 1):
+                self.compact()
+            return True
+
+    def compact(self):
+        with self._lock:
+            keep = np.flatnonzero(self.alive[:self.size])
+            remap = np.full(self.size, -1, dtype=np.int64)
+            remap[keep] = np.arange(len(keep))
+            self.matrix = np.ascontiguousarray(self.matrix[keep])
+            self.chunk_ids = self.chunk_ids[keep]
+            self.alive = np.ones(len(keep), dtype=bool)
+            self.size = len(keep)
+            self.document_rows = {
+                doc_id: (int(remap[start]), int(remap[start]) + (end - start))
+                for doc_id, (start, end) in self.document_rows.items()
+            }
+
+    def search(self, query_vector: np.ndarray, top_k: int = 10) -> List[Tuple[int, float]]:
+        with self._lock:
+            if self.size == 0:
+                return []
+            scores = self.matrix[:self.size] @ query_vector
+            scores[~self.alive[:self.size]] = -np.inf
+            chunk_ids = self.chunk_ids[:self.size]
+        k = min(top_k, len(scores))
+        if k <= 0:
+            return []
+        candidates = np.argpartition(-scores, k - 1)[:k]
+        candidates = candidates[np.argsort(-scores[candidates])]
+        return [(int(chunk_ids[i]), float(scores[i])) for i in candidates if np.isfinite(scores[i])]
+
+    def search_batch(self, query_matrix: np.ndarray, top_k: int = 10) -> List[List[Tuple[int, float]]]:
+        """Score several queries with one matrix product; returns one ranking per query row."""
+        with self._lock:
+            if self.size == 0:
+                return [[] for _ in range(len(query_matrix))]
+            scores = self.matrix[:self.size] @ np.asarray(query_matrix, dtype=np.float32).T
+            scores[~self.alive[:self.size]] = -np.inf
+            chunk_ids = self.chunk_ids[:self.size]
+        k = min(top_k, scores.shape[0])
+        if k <= 0:
+            return [[] for _ in range(len(query_matrix))]
+        candidates = np.argpartition(-scores, k - 1, axis=0)[:k]
+        rankings = []
+        for column in range(scores.shape[1]):
+            column_scores = scores[:, column]
+            top = candidates[:, column]
+            top = top[np.argsort(-column_scores[top])]
+            rankings.append([(int(chunk_ids[i]), float(column_scores[i]))
+                             for i in top if np.isfinite(column_scores[i])])
+        return rankings
+
+
+_embedder: Optional[Embedder] = None
+_user_indexes: Dict[int, VectorIndex] = {}
+_registry_lock = threading.Lock()
+
+
+def get_embedder() -> Embedder:
+    global _embedder
+    with _registry_lock:
+        if _embedder is None:
+            if EMBEDDING_BACKEND == "vertex":
+                _embedder = VertexEmbedder()
+            else:
+                _embedder = HashingEmbedder()
+            logger.info(f"Initialized {_embedder.name} embedder")
+        return _embedder
+
+
+def get_user_index(user_id: int, dimension: int) -> VectorIndex:
+    with _registry_lock:
+        index = _user_indexes.get(user_id)
+        if index is None or index.dimension != dimension:
+            index = VectorIndex(dimension)
+            _user_indexes[user_id] = index
+        return index
+
+
+def vector_to_bytes(vector: np.ndarray) -> bytes:
+    return np.asarray(vector, dtype=np.float32).tobytes()
+
+
+def vector_from_bytes(data: bytes) -> np.ndarray:
+    return np.frombuffer(data, dtype=np.float32)
@@ -0,0 +1,59 @@
+"""Measure LLM client throughput offline against the fake backend.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_llm_client --requests 200 --threads 32 --latency-ms 200 --concurrency 4 8 16
+
+Sync callers (one per worker thread, as in the FastAPI threadpool) share one client, so
+throughput is bounded by ``concurrency / latency`` regardless of the number of threads.
+"""
+import argparse
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from app.services.llm_client import FakeBackend, LLMClient, LLMTimeoutError
+
+
+def run(client: LLMClient, requests: int, threads: int):
+    latencies = []
+    timeouts = 0
+
+    def call(i: int):
+        started = time.perf_counter()
+        try:
+            client.generate(f"question {i}")
+        except LLMTimeoutError:
+            return None
+        return (time.perf_counter() - started) * 1000
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        for latency in pool.map(call, range(requests)):
+            if latency is None:
+                timeouts += 1
+            else:
+                latencies.append(latency)
+    return time.perf_counter() - started, latencies, timeouts
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--threads", type=int, default=32)
+    parser.add_argument("--latency-ms", type=float, default=200)
+    parser.add_argument("--timeout", type=float, default=30)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[4, 8, 16])
+    args = parser.parse_args()
+
+    print(f"{'limit':>6} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'timeouts':>9}")
+    for limit in args.concurrency:
+        client = LLMClient(FakeBackend(args.latency_ms), max_concurrency=limit, timeout_seconds=args.timeout)
+        elapsed, latencies, timeouts = run(client, args.requests, args.threads)
+        p95 = statistics.quantiles(latencies, n=20)[-1] if len(latencies) > 1 else 0.0
+        print(f"{limit:>6} {args.requests / elapsed:>8.1f} {statistics.median(latencies) if latencies else 0:>8.1f} "
+              f"{p95:>8.1f} {timeouts:>9}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,141 @@
+"""Pages per second of the single-pass PDF page walker against the multi-call loop it replaced.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_pdf_extraction --pages 50 200 500
+    python -m benchmarks.bench_pdf_extraction --pdf some.pdf other.pdf
+
+``legacy_extract`` is a verbatim copy of the page loop of ``extract_text_from_pdf_advanced``
+before it moved onto ``pdf_extraction.extract_pdf_page``: four parses per page
+(``dict``, plain text and two ``search_for`` calls) and ``text +=`` accumulation. The script
+checks that both produce the same text and structure metadata. Parallel extraction is
+disabled here so that the numbers are per-core.
+"""
+import argparse
+import time
+
+import fitz
+
+from app.services import pdf_extraction
+
+PARAGRAPH = ("Employees travelling to zone {zone} are entitled to a hotel rate of {rate} per night. "
+             "The per diem allowance covers meals and local transport, subject to the approval of the "
+             "reporting manager. Receipts must be submitted within 14 days of return. ")
+
+
+def make_pdf(pages: int) -> bytes:
+    doc = fitz.open()
+    for page_num in range(pages):
+        page = doc.new_page()
+        body = f"SECTION {page_num + 1}\n" + "".join(
+            PARAGRAPH.format(zone=page_num % 4, rate=2000 + 100 * i) for i in range(8)
+        )
+        if page_num % 5 == 0:
+            body += "\nTable 1: Café and lodging rates (₹)\n"
+        page.insert_textbox(fitz.Rect(50, 50, 550, 800), body)
+    data = doc.tobytes()
+    doc.close()
+    return data
+
+
+def legacy_extract(file_contents: bytes):
+    text = ""
+    metadata_info = {"pages": 0, "images": 0, "tables": 0, "fonts": set(), "languages": set(),
+                     "structure_elements": []}
+    with fitz.open(stream=file_contents, filetype="pdf") as doc:
+        metadata_info["pages"] = len(doc)
+        for page_num, page in enumerate(doc):
+            text_dict = page.get_text("dict")
+            blocks = text_dict.get("blocks", [])
+            for block in blocks:
+                if "lines" in block:
+                    for line in block["lines"]:
+                        for span in line.get("spans", []):
+                            font_info = f"{span.get('font', 'unknown')}_{span.get('size', 0)}"
+                            metadata_info["fonts"].add(font_info)
+                            text_content = span.get("text", "")
+                            if any(ord(char) > 127 for char in text_content):
+                                metadata_info["languages"].add("non_latin")
+            page_text = page.get_text()
+            if page_num > 0:
+                text += f"\n\n{'=' * 50}\n📄 PAGE {page_num + 1}\n{'=' * 50}\n\n"
+            lines = page_text.split('\n')
+            processed_lines = []
+            for i, line in enumerate(lines):
+                cleaned_line = ' '.join(line.split())
+                if not cleaned_line:
+                    continue
+                if (len(cleaned_line) < 100 and
+                        cleaned_line.isupper() or
+                        (i < len(lines) - 1 and not lines[i + 1].strip())):
+                    processed_lines.append(f"\n## {cleaned_line}\n")
+                    metadata_info["structure_elements"].append(f"header:{cleaned_line}")
+                else:
+                    processed_lines.append(cleaned_line)
+
+            text += '\n'.join(processed_lines)
+            if page.search_for("table") or page.search_for("Table"):
+                metadata_info["tables"] += 1
+
+            image_list = page.get_images()
+            metadata_info["images"] += len(image_list)
+    return text.strip(), metadata_info
+
+
+def single_pass_extract(file_contents: bytes):
+    metadata_info = {"pages": 0, "images": 0, "tables": 0, "fonts": set(), "languages": set(),
+                     "structure_elements": []}
+    with fitz.open(stream=file_contents, filetype="pdf") as doc:
+        pages = [pdf_extraction.extract_pdf_page(page) for page in doc]
+    metadata_info["pages"] = len(pages)
+    page_texts = []
+    for page_num, page in enumerate(pages):
+        if page_num > 0:
+            page_texts.append(f"\n\n{'=' * 50}\n📄 PAGE {page_num + 1}\n{'=' * 50}\n\n")
+        page_texts.append(page.text)
+        metadata_info["fonts"].update(page.fonts)
+        if page.non_latin:
+            metadata_info["languages"].add("non_latin")
+        metadata_info["structure_elements"].extend(page.headers)
+        if page.has_table:
+            metadata_info["tables"] += 1
+        metadata_info["images"] += page.images
+    return ''.join(page_texts).strip(), metadata_info
+
+
+def best_of(fn, data: bytes, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn(data)
+        best = min(best, time.perf_counter() - started)
+    return best
+
+
+def bench(label: str, data: bytes, repeat: int):
+    legacy_result = legacy_extract(data)
+    new_result = single_pass_extract(data)
+    assert legacy_result == new_result, f"{label}: single-pass output differs from legacy"
+    pages = new_result[1]["pages"]
+    legacy_seconds = best_of(legacy_extract, data, repeat)
+    new_seconds = best_of(single_pass_extract, data, repeat)
+    print(f"{label:>24} {pages:>6} pages  legacy {pages / legacy_seconds:8.1f} pages/s  "
+          f"single-pass {pages / new_seconds:8.1f} pages/s  speedup {legacy_seconds / new_seconds:5.2f}x")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--pages", type=int, nargs="*", default=[50, 200, 500])
+    parser.add_argument("--pdf", nargs="*", default=[], help="real PDF files to benchmark as well")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    for pages in args.pages:
+        bench(f"synthetic-{pages}", make_pdf(pages), args.repeat)
+    for path in args.pdf:
+        with open(path, "rb") as pdf_file:
+            bench(path.rsplit("/", 1)[-1][-24:], pdf_file.read(), args.repeat)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+"""Compare the single-pass text analyzer with the per-function keyword scans it replaced.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_text_analyzer --megabytes 2 5 10
+
+The legacy implementations below are verbatim copies of the document_processor functions
+before they were moved onto ``text_analyzer.analyze_text``; the script also checks that both
+produce the same scores.
+"""
+import argparse
+import random
+import time
+
+from app.services import text_analyzer
+from app.services.text_analyzer import (DOCUMENT_TYPE_TERMS, TECHNICAL_TERMS, SPECIALIZED_TERMS,
+                                        KNOWLEDGE_DOMAIN_INDICATORS, TABLE_INDICATORS, POLICY_INDICATORS,
+                                        LOCATION_INDICATORS, HINDI_INDICATORS, LANGUAGE_INDICATORS)
+
+VOCABULARY = ("the policy employee travel allowance rate hotel zone grade level procedure must shall cost budget "
+              "revenue system network data research analysis methodology contract agreement patient treatment "
+              "mumbai delhi london city region abstract hypothesis conclusion pursuant whereby coefficient "
+              "algorithm optimization framework architecture per diem lorem ipsum dolor sit amet consectetur "
+              "adipiscing elit sed do eiusmod tempor incididunt ut labore et dolore magna aliqua").split()
+
+
+def make_document(megabytes: float, seed: int = 0) -> str:
+    rng = random.Random(seed)
+    sentences = []
+    size = 0
+    while size < megabytes * 1024 * 1024:
+        sentence = ' '.join(rng.choices(VOCABULARY, k=rng.randint(8, 30))).capitalize() + '. '
+        sentences.append(sentence)
+        size += len(sentence)
+    return ''.join(sentences)
+
+
+def legacy_detect_primary_language(text):
+    text_sample = text[:1000].lower()
+    return {name: sum(1 for word in words if word in text_sample) for name, words in LANGUAGE_INDICATORS.items()}
+
+
+def legacy_classify_document_type(text):
+    text_lower = text.lower()
+    return {name: sum(1 for term in terms if term in text_lower) for name, terms in DOCUMENT_TYPE_TERMS.items()}
+
+
+def legacy_assess_content_complexity(text):
+    sentences = text.split('.')
+    avg_sentence_length = sum(len(s.split()) for s in sentences) / len(sentences) if sentences else 0
+    technical_count = sum(1 for term in TECHNICAL_TERMS if term.lower() in text.lower())
+    specialized_count = sum(1 for term in SPECIALIZED_TERMS if term.lower() in text.lower())
+    return avg_sentence_length, technical_count, specialized_count
+
+
+def legacy_identify_knowledge_domains(text):
+    text_lower = text.lower()
+    return {domain: [indicator for indicator in indicators if indicator in text_lower]
+            for domain, indicators in KNOWLEDGE_DOMAIN_INDICATORS.items()}
+
+
+def legacy_analyze_document_structure(context):
+    context_lower = context.lower()
+    return {
+        "has_tables": any(indicator in context_lower for indicator in TABLE_INDICATORS),
+        "has_policies": any(indicator in context_lower for indicator in POLICY_INDICATORS),
+        "has_locations": any(indicator in context_lower for indicator in LOCATION_INDICATORS),
+        "is_multilingual": any(indicator in context for indicator in HINDI_INDICATORS),
+        "language": legacy_detect_primary_language(context),
+        "types": legacy_classify_document_type(context)
+    }
+
+
+def run_legacy(text):
+    return (legacy_detect_primary_language(text), legacy_classify_document_type(text),
+            legacy_assess_content_complexity(text), legacy_identify_knowledge_domains(text),
+            legacy_analyze_document_structure(text))
+
+
+def run_single_pass(text):
+    analysis = text_analyzer.analyze_text(text)
+    return (analysis.language_scores, analysis.document_type_scores,
+            (analysis.avg_sentence_length, analysis.technical_count, analysis.specialized_count),
+            analysis.domain_hits,
+            {"has_tables": analysis.has("tables"), "has_policies": analysis.has("policies"),
+             "has_locations": analysis.has("locations"), "is_multilingual": analysis.has("hindi"),
+             "language": analysis.language_scores, "types": analysis.document_type_scores})
+
+
+def best_of(function, text, repeat):
+    timings = []
+    for _ in range(repeat):
+        text_analyzer._last_analysis = (None, None)
+        started = time.perf_counter()
+        result = function(text)
+        timings.append(time.perf_counter() - started)
+    return min(timings), result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--megabytes", type=float, nargs="+", default=[1, 5, 10])
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    print(f"{'size':>8} {'legacy s':>10} {'single-pass s':>14} {'speedup':>8}  same scores")
+    for megabytes in args.megabytes:
+        text = make_document(megabytes)
+        legacy_time, legacy_result = best_of(run_legacy, text, args.repeat)
+        new_time, new_result = best_of(run_single_pass, text, args.repeat)
+        print(f"{megabytes:>6.1f}MB {legacy_time:>10.3f} {new_time:>14.3f} {legacy_time / new_time:>7.1f}x  "
+              f"{legacy_result == new_result}")
+
+
+if __name__ == "__main__":
+    main()
@@ -4,6 +4,9 @@ import axios from 'axios'
 import router from '@/router'
 
 const API_URL = 'backend url'
+// Files above this size go through a resumable upload session instead of one multipart POST.
+const RESUMABLE_UPLOAD_THRESHOLD = 8 * 1024 * 1024
+const UPLOAD_RANGE_ATTEMPTS = 5
 const setAuthHeader = (token) => {
   axios.defaults.headers.common['Authorization'] = `Bearer ${token}`
 }
@@ -18,6 +21,7 @@ export const useAuthStore = defineStore('auth', {
     chatHistory: [],
     error: null,
     loading: false,
+    streaming: false,
     snackbar: {
       show: false,
       text: '',
@@ -70,10 +74,19 @@ export const useAuthStore = defineStore('auth', {
     },
     async uploadDocument(file) {
         this.loading = true; this.error = null;
-        const formData = new FormData();
-        formData.append('file', file);
         try {
-            await axios.post(`${API_URL}/documents/upload`, formData);
+            let queued;
+            if (file.size > RESUMABLE_UPLOAD_THRESHOLD) {
+                queued = await this.uploadResumable(file);
+            } else {
+                const formData = new FormData();
+                formData.append('file', file);
+                queued = (await axios.post(`${API_URL}/documents/upload`, formData)).data;
+            }
+            const job = await this.waitForIngestionJob(queued.id);
+            if (job.status === 'failed') {
+                throw { response: { data: { detail: job.error || 'File processing failed.' } } };
+            }
             this.snackbar.show = true;
             this.snackbar.text = 'File uploaded successfully!';
             this.snackbar.color = 'success';
@@ -88,6 +101,68 @@ export const useAuthStore = defineStore('auth', {
             this.loading = false;
         }
     },
+    async uploadResumable(file) {
+        // The session id is remembered per file, so picking the same file again after a
+        // failure or a page reload only sends the ranges the server does not have yet.
+        const sessionKey = `upload-session:${file.name}:${file.size}:${file.lastModified}`;
+        let session = null;
+        const savedId = localStorage.getItem(sessionKey);
+        if (savedId) {
+            try {
+                session = (await axios.get(`${API_URL}/documents/upload-sessions/${savedId}`)).data;
+            } catch (err) {
+                session = null;
+            }
+            if (session && session.status !== 'open' && !session.job_id) session = null;
+        }
+        if (!session) {
+            session = (await axios.post(`${API_URL}/documents/upload-sessions`, {
+                filename: file.name, size: file.size, content_type: file.type || null,
+            })).data;
+            localStorage.setItem(sessionKey, session.id);
+        }
+        if (!session.job_id) {
+            for (let start = 0; start < file.size; start += session.chunk_size) {
+                const end = Math.min(start + session.chunk_size, file.size);
+                if (session.received.some(([from, to]) => from <= start && end <= to)) continue;
+                await this.uploadRange(session.id, file, start, end);
+            }
+        }
+        const job = (await axios.post(`${API_URL}/documents/upload-sessions/${session.id}/finalize`)).data;
+        localStorage.removeItem(sessionKey);
+        return job;
+    },
+    async uploadRange(sessionId, file, start, end) {
+        const body = await file.slice(start, end).arrayBuffer();
+        const digest = await crypto.subtle.digest('SHA-256', body);
+        const checksum = Array.from(new Uint8Array(digest), (b) => b.toString(16).padStart(2, '0')).join('');
+        for (let attempt = 1; ; attempt++) {
+            try {
+                await axios.put(`${API_URL}/documents/upload-sessions/${sessionId}`, body, {
+                    headers: {
+                        'Content-Type': 'application/octet-stream',
+                        'Content-Range': `bytes ${start}-${end - 1}/${file.size}`,
+                        'X-Chunk-SHA256': checksum,
+                    },
+                });
+                return;
+            } catch (err) {
+                const status = err.response?.status;
+                // Only network failures, server errors and checksum mismatches are worth retrying.
+                if (attempt >= UPLOAD_RANGE_ATTEMPTS || (status && status < 500 && status !== 400)) throw err;
+                await new Promise((resolve) => setTimeout(resolve, 1000 * 2 ** (attempt - 1)));
+            }
+        }
+    },
+    async waitForIngestionJob(jobId, intervalMs = 1000) {
+        while (true) {
+            const response = await axios.get(`${API_URL}/documents/jobs/${jobId}`);
+            if (response.data.status === 'succeeded' || response.data.status === 'failed') {
+                return response.data;
+            }
+            await new Promise((resolve) => setTimeout(resolve, intervalMs));
+        }
+    },
     async askQuery(question) {
         this.loading = true; this.error = null;
         this.chatHistory.push({ author: 'user', content: question });
@@ -107,6 +182,56 @@ export const useAuthStore = defineStore('auth', {
             this.loading = false;
         }
     },
+    async askQueryStream(question) {
+        this.streaming = true; this.error = null;
+        this.chatHistory.push({ author: 'user', content: question });
+        this.chatHistory.push({ author: 'ai', content: '', sources: null, streaming: true });
+        const message = this.chatHistory[this.chatHistory.length - 1];
+        try {
+            const response = await fetch(`${API_URL}/query/stream`, {
+                method: 'POST',
+                headers: { 'Content-Type': 'application/json', 'Authorization': `Bearer ${this.token}` },
+                body: JSON.stringify({ question }),
+            });
+            if (!response.ok) {
+                const body = await response.json().catch(() => ({}));
+                throw new Error(body.detail || 'Failed to get an answer.');
+            }
+            const reader = response.body.getReader();
+            const decoder = new TextDecoder();
+            let buffer = '';
+            while (true) {
+                const { value, done } = await reader.read();
+                if (done) break;
+                buffer += decoder.decode(value, { stream: true });
+                const events = buffer.split('\n\n');
+                buffer = events.pop();
+                for (const rawEvent of events) {
+                    const eventName = rawEvent.match(/^event: (.*)$/m)?.[1];
+                    const data = JSON.parse(rawEvent.match(/^data: (.*)$/m)?.[1] || '{}');
+                    if (eventName === 'metadata') {
+                        message.sources = data.source_documents;
+                    } else if (eventName === 'token') {
+                        message.content += data.text;
+                        this.scrollToChatBottom();
+                    }
+                }
+            }
+            await this.fetchUserProfile();
+        } catch (err) {
+            const errorContent = err.message || 'Failed to get an answer.';
+            if (!message.content) {
+                message.content = `Sorry, an error occurred: ${errorContent}`;
+            }
+            this.error = errorContent;
+            this.snackbar.show = true;
+            this.snackbar.text = errorContent;
+            this.snackbar.color = 'error';
+        } finally {
+            message.streaming = false;
+            this.streaming = false;
+        }
+    },
     scrollToChatBottom() {
         if (chatContainerRef.value) {
             setTimeout(() => {
@@ -0,0 +1,4 @@
+import os
+
+# Read at import time by the services; the tests never reach Cloud SQL or Cloud Storage.
+os.environ.setdefault("INSTANCE_CONNECTION_NAME", "test-project:test-region:test-instance")
@@ -0,0 +1,37 @@
+from app.services.answer_cache import AnswerCache
+
+USER_ID = 1
+CORPUS_VERSION = 3
+
+
+def _cache_with(question: str, threshold: float = 0.9) -> AnswerCache:
+    cache = AnswerCache(similarity_threshold=threshold)
+    cache.put(USER_ID, CORPUS_VERSION, question, "cached answer", ["policy.pdf"])
+    return cache
+
+
+def test_near_duplicate_lookup_is_off_by_default():
+    cache = AnswerCache()
+    cache.put(USER_ID, CORPUS_VERSION, "What is the hotel rate in Delhi for officers?", "cached answer", [])
+    assert cache.get(USER_ID, CORPUS_VERSION, "what is the hotel rate in delhi for officers please")[0] is None
+    assert cache.get(USER_ID, CORPUS_VERSION, "What's the hotel rate in Delhi for officers")[1] is None
+
+
+def test_numeric_variants_do_not_collide():
+    cache = _cache_with("Is a 3 star hotel allowed for travel?", threshold=0.1)
+    assert cache.get(USER_ID, CORPUS_VERSION, "Is a 5 star hotel allowed for travel?") == (None, None)
+
+
+def test_word_order_variants_do_not_collide():
+    cache = _cache_with("What is the fare from Delhi to London?")
+    assert cache.get(USER_ID, CORPUS_VERSION, "What is the fare from London to Delhi?") == (None, None)
+
+
+def test_near_duplicate_still_matches_a_rephrasing():
+    cache = _cache_with("what is the daily allowance for a trip to mumbai for grade 2 staff")
+    entry, match = cache.get(USER_ID, CORPUS_VERSION, "what is the daily allowance for a trip to mumbai for grade 2 staff?!")
+    assert match == "exact"
+    entry, match = cache.get(USER_ID, CORPUS_VERSION,
+                             "so what is the daily allowance for a trip to mumbai for grade 2 staff")
+    assert match == "near_duplicate"
+    assert entry.answer == "cached answer"
@@ -0,0 +1,50 @@
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.db import models
+from app.db.base import Base
+from app.services import corpus_profile
+
+
+def _stats(word_count: int, term: str, file_type: str):
+    return {"document_count": 1, "word_count": word_count, "section_count": 1,
+            "confidence_weighted": 0.8 * word_count, "confidence_weight": word_count,
+            "terms": {term: 3}, "file_types": {file_type: 1}}
+
+
+@pytest.fixture
+def session_factory(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'profiles.db'}")
+    Base.metadata.create_all(engine)
+    # As the app's sessions: nothing is flushed until asked.
+    return sessionmaker(bind=engine, autoflush=False)
+
+
+def test_first_reupload_without_a_profile_row_drops_the_old_version(session_factory):
+    with session_factory() as db:
+        user = models.User(username="uploader", hashed_password="x")
+        previous = models.Document(filename="policy.pdf", content="old", owner=user,
+                                   analysis={"stats": _stats(100, "allowance", "pdf")})
+        db.add_all([user, previous])
+        db.commit()
+        assert db.query(models.CorpusProfile).count() == 0
+
+        # The order the ingestion worker uses when a new version replaces an old one.
+        corpus_profile.remove_document_stats(db, user.id, previous)
+        corpus_profile.add_document_stats(db, user.id, _stats(40, "reimbursement", "docx"))
+        db.add(models.Document(filename="policy.docx", content="new", owner=user,
+                               analysis={"stats": _stats(40, "reimbursement", "docx")}))
+        db.delete(previous)
+        db.commit()
+
+        rows = db.query(models.CorpusProfile).filter(models.CorpusProfile.user_id == user.id).all()
+        assert len(rows) == 1
+        profile = rows[0].profile
+        assert profile["document_count"] == 1
+        assert profile["word_count"] == 40
+        assert profile["terms"] == {"reimbursement": 3}
+        assert profile["file_types"] == {"docx": 1}
+        rebuilt = corpus_profile.rebuild_profile(db, user.id).profile
+        assert {key: rebuilt[key] for key in ("document_count", "word_count", "terms", "file_types")} == \
+               {key: profile[key] for key in ("document_count", "word_count", "terms", "file_types")}
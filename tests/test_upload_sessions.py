@@ -0,0 +1,69 @@
+import hashlib
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.db import models
+from app.db.base import Base
+from app.services import upload_sessions
+from app.services.upload_intake import UploadRejected
+
+CONTENT = b"%PDF-1.4\n" + b"x" * 55
+
+
+@pytest.fixture
+def session_factory(tmp_path, monkeypatch):
+    monkeypatch.setattr(upload_sessions, "UPLOAD_SPOOL_DIR", str(tmp_path))
+    engine = create_engine(f"sqlite:///{tmp_path / 'sessions.db'}")
+    Base.metadata.create_all(engine)
+    return sessionmaker(bind=engine)
+
+
+@pytest.fixture
+def session_id(session_factory):
+    with session_factory() as db:
+        user = models.User(username="uploader", hashed_password="x")
+        db.add(user)
+        db.flush()
+        upload_session = upload_sessions.create_session(db, user, "report.pdf", len(CONTENT))
+        db.commit()
+        return upload_session.id
+
+
+def _write(db, upload_session, start, end):
+    data = CONTENT[start:end]
+    return upload_sessions.write_range(db, upload_session, f"bytes {start}-{end - 1}/{len(CONTENT)}", data,
+                                       hashlib.sha256(data).hexdigest())
+
+
+def test_write_range_keeps_ranges_written_by_another_session(session_factory, session_id):
+    first, second = session_factory(), session_factory()
+    try:
+        # Both requests load the session before either has recorded its range.
+        first_copy = first.get(models.UploadSession, session_id)
+        second_copy = second.get(models.UploadSession, session_id)
+        _write(first, first_copy, 0, 32)
+        updated = _write(second, second_copy, 32, len(CONTENT))
+        assert updated.received == [[0, len(CONTENT)]]
+        assert updated.received_bytes == len(CONTENT)
+    finally:
+        first.close()
+        second.close()
+
+
+def test_finalize_sees_a_finalize_from_another_session(session_factory, session_id):
+    with session_factory() as db:
+        _write(db, db.get(models.UploadSession, session_id), 0, len(CONTENT))
+    first, second = session_factory(), session_factory()
+    try:
+        second_copy = second.get(models.UploadSession, session_id)
+        upload = upload_sessions.finalize_session(first, first.get(models.UploadSession, session_id))
+        first.commit()
+        assert upload.sha256 == hashlib.sha256(CONTENT).hexdigest()
+        with pytest.raises(UploadRejected) as rejected:
+            upload_sessions.finalize_session(second, second_copy)
+        assert rejected.value.status_code == 409
+    finally:
+        first.close()
+        second.close()